@@ -0,0 +1,284 @@
+"""
+ASGI serving mode.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Uploads (POST /upload/) are handled by coroutines: window requests go out on an
+async HTTP client, the S3 upload and CPU-bound parsing run on worker threads, and
+documents are recorded through an async SQLAlchemy session. A single process can
+keep hundreds of uploads in flight, bounded by ASGI_INFERENCE_CONCURRENCY window
+requests rather than by one blocked thread per upload. Every other route is
+served by the Flask app on a thread pool, so all responses are the ones the WSGI
+mode (`gunicorn app:app`) returns.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+from app import app as flask_app
+from async_classifier import AsyncDocumentClassifier
+from config import settings
+from database import configure_engine, db, engine_options
+import metrics
+import routes
+import search
+import services
+import uploads
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Async drivers for the database backends the app supports
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+# The Flask routes and job workers share this classifier, so caches, the circuit
+# breaker and the rate limiter are shared between both request paths
+services.classifier = services.Lazy(functools.partial(services.create_classifier, AsyncDocumentClassifier))
+
+# Blocking work of async requests: parsing, S3 transfers and result cache lookups
+offload_executor = ThreadPoolExecutor(max_workers=settings.ASGI_OFFLOAD_WORKERS, thread_name_prefix='offload')
+
+
+def async_database_url():
+    """ASGI_DATABASE_URL, or the Flask app's database URL with its async driver."""
+    if settings.ASGI_DATABASE_URL:
+        return make_url(settings.ASGI_DATABASE_URL)
+    with flask_app.app_context():
+        # The engine's URL has relative SQLite paths resolved against the instance folder
+        url = db.engine.url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend}; set ASGI_DATABASE_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+database_url = async_database_url()
+engine = create_async_engine(database_url, **engine_options(database_url))
+configure_engine(engine.sync_engine)
+async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def _in_app_context(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+
+async def offload(fn, *args):
+    """Run fn(*args) on offload_executor inside an application context, with the caller's context variables."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        offload_executor, context.run, _in_app_context, fn, *args
+    )
+
+
+def json_response(data, status_code, headers=None):
+    """Render like Flask's jsonify, so both serving modes send identical bodies."""
+    rendered = flask_app.json.response(data)
+    return Response(rendered.get_data(), status_code=status_code, headers=headers, media_type=rendered.mimetype)
+
+
+def error_response(error, status_code):
+    """The JSON body the Flask app's HTTP error handler sends for a werkzeug exception."""
+    return json_response({'error': error.description, 'status_code': status_code}, status_code)
+
+
+async def upload_document(request):
+    """POST /upload/: the Flask route's contract, with non-blocking I/O."""
+    started = time.perf_counter()
+    response = await _upload_document(request)
+    # What Flask-CORS adds with CORS(app)'s defaults
+    origin = request.headers.get('origin')
+    if origin:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers.append('Vary', 'Origin')
+    metrics.HTTP_REQUESTS.inc(endpoint='/upload/', method='POST', status=response.status_code)
+    metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='/upload/')
+    return response
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+def _limit_body(receive, limit):
+    """Wrap an ASGI receive callable to fail once more than limit body bytes have arrived."""
+    received = 0
+
+    async def limited_receive():
+        nonlocal received
+        message = await receive()
+        received += len(message.get('body', b''))
+        if received > limit:
+            raise _BodyTooLarge()
+        return message
+
+    return limited_receive
+
+
+async def _upload_document(request):
+    if settings.REQUEST_MAX_BYTES:
+        declared = request.headers.get('content-length')
+        if declared and declared.isdigit() and int(declared) > settings.REQUEST_MAX_BYTES:
+            return error_response(RequestEntityTooLarge, 413)
+        # Chunked bodies declare no length
+        request = Request(request.scope, _limit_body(request.receive, settings.REQUEST_MAX_BYTES))
+    try:
+        # Parts larger than 1 MB are spooled to temporary files while the body streams in
+        form = await request.form()
+    except _BodyTooLarge:
+        return error_response(RequestEntityTooLarge, 413)
+    except MultiPartException:
+        return error_response(BadRequest, 400)
+
+    try:
+        file = form.get('file')
+        if not isinstance(file, UploadFile):
+            return json_response({'error': 'No file provided'}, 400)
+        error = routes.upload_file_error(file.filename)
+        if error:
+            return json_response({'error': error}, 400)
+        file_ext = os.path.splitext(file.filename)[1].lower()
+
+        try:
+            # Spooled parts may be on disk, so measuring and mapping them is blocking I/O
+            size = await offload(uploads.stream_size, file.file)
+            uploads.check_size(size)
+
+            async with offloaded(uploads.load_upload(file.file, size)) as file_content:
+                if await offload(uploads.is_blank, file_content):
+                    return json_response({'error': routes.EMPTY_FILE_ERROR}, 400)
+
+                filename = secure_filename(file.filename)
+                run_async, include_timings = routes.upload_options(request.query_params)
+
+                if run_async:
+                    response_data, headers = await offload(routes.enqueue_upload, filename, file_ext, file_content)
+                    return json_response(response_data, 202, headers)
+
+                response_data = await process_upload(filename, file_ext, file_content, include_timings=include_timings)
+                return json_response(response_data, 201)
+
+        except Exception as e:
+            return json_response(*routes.upload_error_response(e))
+    finally:
+        await form.close()
+
+
+@asynccontextmanager
+async def offloaded(context_manager):
+    """Enter and exit a blocking context manager on offload_executor."""
+    value = await offload(context_manager.__enter__)
+    try:
+        yield value
+    except BaseException as e:
+        if not await offload(context_manager.__exit__, type(e), e, e.__traceback__):
+            raise
+    else:
+        await offload(context_manager.__exit__, None, None, None)
+
+
+async def process_upload(filename, file_ext, file_content, include_timings=False):
+    """routes.process_upload for coroutines."""
+    with metrics.collect_timings() as timings:
+        s3_key, s3_url, classification, extracted_text = await store_and_classify(filename, file_ext, file_content)
+        try:
+            document_data = (await save_documents([(filename, s3_key, s3_url, classification, extracted_text)]))[0]
+        except routes.UNRECORDED_ERRORS:
+            # Don't leave an original in S3 that no document points to
+            await offload(routes.delete_s3_object, s3_key)
+            raise
+        response_data = routes.upload_response(document_data, classification)
+        if include_timings:
+            response_data['timings'] = timings.as_milliseconds()
+    return response_data
+
+
+async def store_and_classify(filename, file_ext, file_content):
+    """
+    routes.store_and_classify for coroutines: the S3 upload runs on a worker thread
+    while the document is classified, and either is undone if the other fails.
+
+    Returns:
+        Tuple of (S3 key, S3 URL, classification result, compressed extracted text)
+    """
+    s3_key = routes.begin_upload(filename)
+    upload = asyncio.ensure_future(offload(_upload_original, uploads.open_content(file_content), s3_key))
+
+    # Extracted text is compressed as the classifier parses it, for storage and search
+    text_compressor = search.TextCompressor()
+    try:
+        classification = await services.get_classifier().process_document_async(
+            file_content,
+            file_ext,
+            offload,
+            text_sink=text_compressor
+        )
+    except BaseException:
+        await asyncio.wait([upload])
+        upload_error = None if upload.cancelled() else upload.exception()
+        await offload(routes.discard_upload, s3_key, upload_error)
+        raise
+
+    # Raises the upload error, if any; the classification is simply dropped
+    await upload
+    return routes.stored_upload(s3_key, classification, text_compressor)
+
+
+def _upload_original(fileobj, s3_key):
+    routes.upload_original(fileobj, settings.AWS_BUCKET_NAME, s3_key, Config=services.get_s3_transfer_config())
+
+
+async def save_documents(entries):
+    """
+    routes.save_documents for coroutines: the same rows, rollups, text and
+    signatures in one commit. With DB_WRITE_BATCHING the coroutine awaits the
+    write buffer's batched commit; otherwise it commits on an async session.
+    """
+    started = time.perf_counter()
+    try:
+        if settings.DB_WRITE_BATCHING:
+            document_data = await asyncio.wrap_future(flask_app.extensions['write_buffer'].submit(entries))
+        else:
+            async with async_session() as session:
+                document_data = await session.run_sync(routes.add_documents, entries)
+                await session.commit()
+    finally:
+        metrics.record_stage('db_commit', time.perf_counter() - started)
+    routes.document_count_cache.clear()
+    return document_data
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build the classifier (and import its libraries) before the first upload needs it
+    classifier = await offload(services.get_classifier)
+    yield
+    await classifier.aclose()
+    await engine.dispose()
+    offload_executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/upload/', upload_document, methods=['POST']),
+        Mount('', app=WSGIMiddleware(flask_app, workers=settings.ASGI_WSGI_WORKERS))
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,368 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import time
+
+import httpx
+import requests
+from requests.exceptions import ConnectionError, RequestException, Timeout
+
+from config import settings
+from inference_client import RETRYABLE_STATUSES, CircuitBreaker, CircuitOpenError, InferenceClient
+from ml_classifier import DocumentClassifier
+from similarity import MinHasher, Signature
+import metrics
+import uploads
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Runs a blocking callable on a worker thread: offload(fn, *args) -> awaitable of fn(*args)
+Offload = Callable[..., Awaitable[Any]]
+
+
+class AsyncInferenceClient(InferenceClient):
+    """
+    InferenceClient over an httpx.AsyncClient, with an awaitable post().
+
+    Timeouts, retries, backoff, the retry budget, rate limiting and the circuit
+    breaker behave as in InferenceClient; waits sleep without blocking the event
+    loop. Transport and status errors are raised as their requests counterparts, so
+    callers handle both clients alike.
+    """
+
+    async def post(self, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        POST a JSON payload, retrying transient failures.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.HTTPError: If the endpoint answers with a non-retryable error, or
+                with a retryable one after retries are exhausted
+            RequestException: If the endpoint can't be reached or keeps timing out
+        """
+        connect_timeout, read_timeout = self.timeout
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        while True:
+            self._check_circuit()
+            # Anything raised before the attempt has an outcome releases a claimed trial slot
+            try:
+                if self.rate_limiter is not None and not await self.rate_limiter.acquire_async(deadline - time.monotonic()):
+                    raise RequestException("Rate limit wait exceeded the retry budget")
+                response = await self.session.post(
+                    self.url, json=payload, timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+                )
+            except httpx.TimeoutException as e:
+                error, reason, retry_hint = Timeout(str(e)), 'timeout', None
+            except httpx.TransportError as e:
+                error, reason, retry_hint = ConnectionError(str(e)), 'connection', None
+            except BaseException:
+                self._release_trial()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return self._accept(response)
+                error, reason, retry_hint = self._retryable_status(response)
+
+            await asyncio.sleep(self._retry_delay(error, reason, retry_hint, attempt, deadline))
+            attempt += 1
+
+    def _accept(self, response: httpx.Response) -> httpx.Response:
+        try:
+            return super()._accept(response)
+        except httpx.HTTPStatusError as e:
+            raise requests.HTTPError(str(e), response=response) from e
+
+
+class _PreparedDocument:
+    """A document read up to classification: either a finished result or its windows."""
+
+    def __init__(self, raw_key: str, result: Optional[Dict[str, Any]] = None,
+                 windows: Optional[List[Tuple[str, int, int]]] = None, text_hasher: Any = None,
+                 signature: Optional[Signature] = None):
+        self.raw_key = raw_key
+        self.result = result
+        self.windows = windows
+        self.text_hasher = text_hasher
+        self.signature = signature
+
+
+class AsyncDocumentClassifier(DocumentClassifier):
+    """
+    DocumentClassifier with an awaitable process_document_async() for the ASGI app.
+
+    Window requests go out on an httpx.AsyncClient sharing the synchronous client's
+    rate limiter and circuit breaker, so one event loop keeps the requests of many
+    documents in flight without a thread per document. Extraction, preprocessing,
+    local inference and cache lookups are CPU-bound or touch the database and run
+    through the caller's offload function instead. The synchronous methods keep
+    working for the Flask routes and job workers sharing the instance.
+    """
+
+    def __init__(self, *args, async_max_concurrency: Optional[int] = None, **kwargs):
+        """
+        Initialize the classifier; takes DocumentClassifier's arguments plus:
+
+        Args:
+            async_max_concurrency: Maximum window requests in flight at once from
+                process_document_async, across all documents. If not provided, will use
+                ASGI_INFERENCE_CONCURRENCY from settings
+        """
+        super().__init__(*args, **kwargs)
+        self.async_max_concurrency = max(1, async_max_concurrency or settings.ASGI_INFERENCE_CONCURRENCY)
+        limits = httpx.Limits(
+            max_connections=self.async_max_concurrency,
+            max_keepalive_connections=self.async_max_concurrency
+        )
+        self.async_client = AsyncInferenceClient(
+            httpx.AsyncClient(headers=self.headers, limits=limits),
+            self.api_url,
+            timeout=self.client.timeout,
+            max_retries=self.client.max_retries,
+            backoff_base=self.client.backoff_base,
+            backoff_max=self.client.backoff_max,
+            retry_budget=self.client.retry_budget,
+            rate_limiter=self.client.rate_limiter,
+            breaker=self.client.breaker
+        )
+        self._async_slots = asyncio.Semaphore(self.async_max_concurrency)
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client's connections."""
+        await self.async_client.session.aclose()
+
+    async def process_document_async(self, file_content: uploads.UploadContent, file_type: str, offload: Offload,
+                                     text_sink: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        process_document() for coroutines.
+
+        The text is read whole on a worker thread before any window is sent, rather
+        than streamed into classification; the result and cache behaviour are the same.
+
+        Args:
+            file_content: Raw bytes of the file, or a memory-mapped file (see uploads.py)
+            file_type: File extension
+            offload: Coroutine function running a blocking callable on a worker thread
+                (inside an application context, for the result cache)
+            text_sink: Optional object whose write(piece) receives the extracted text
+
+        Returns:
+            Dictionary containing classification results
+        """
+        with metrics.collect_timings():
+            try:
+                prepared = await offload(self._prepare_document, file_content, file_type, text_sink)
+                if prepared.result is not None:
+                    return prepared.result
+                results = await self._classify_windows_async(prepared.windows, offload)
+                return await offload(self._store_results, prepared.raw_key, prepared.text_hasher, results, prepared.signature)
+            except Exception as e:
+                logger.error(f"Error processing document: {str(e)}")
+                raise
+
+    def _prepare_document(self, file_content: uploads.UploadContent, file_type: str,
+                          text_sink: Optional[Any]) -> _PreparedDocument:
+        """Everything process_document does before classifying: cache and near-duplicate lookups, windowing."""
+        raw_key, cached = self._cached_raw_result(file_content, file_type, text_sink)
+        if cached is not None:
+            return _PreparedDocument(raw_key, result=cached)
+
+        text_hasher = hashlib.sha256()
+        min_hasher = MinHasher() if self.similarity_index is not None else None
+        pieces = list(self._normalized_pieces(file_content, file_type, text_sink, text_hasher, min_hasher))
+        cached = self._cached_text_result(raw_key, text_hasher)
+        if cached is not None:
+            return _PreparedDocument(raw_key, result=cached)
+
+        signature = None
+        if min_hasher is not None:
+            signature, similar = self._near_duplicate(min_hasher)
+            if similar is not None:
+                return _PreparedDocument(raw_key, result=similar)
+        windows = list(metrics.timed_iter(self.iter_sliding_windows(pieces), 'window'))
+        return _PreparedDocument(raw_key, windows=windows, text_hasher=text_hasher, signature=signature)
+
+    async def _classify_windows_async(self, windows: List[Tuple[str, int, int]], offload: Offload) -> Dict[str, Any]:
+        """_classify_windows() for coroutines; the local engine runs on a worker thread."""
+        if self.backend == 'remote':
+            return await self._classify_remote_with_fallback_async(windows, offload)
+
+        local_result = await offload(self._classify_local, windows)
+        if self.backend == 'local':
+            return local_result
+
+        margin = self._top_margin(local_result['all_scores'])
+        if margin >= self.cascade_margin:
+            logger.info(f"Local engine margin {margin:.3f} >= {self.cascade_margin}, skipping remote model")
+            return local_result
+
+        logger.info(f"Local engine margin {margin:.3f} < {self.cascade_margin}, falling back to remote model")
+        try:
+            return await self._classify_remote_async(windows, offload)
+        except RequestException as e:
+            if self.fallback != 'local':
+                raise
+            logger.warning(f"Inference endpoint unavailable ({str(e)}), keeping the local result")
+            metrics.INFERENCE_FALLBACKS.inc()
+            local_result['fallback'] = True
+            return local_result
+
+    async def _classify_remote_with_fallback_async(self, windows: List[Tuple[str, int, int]],
+                                                   offload: Offload) -> Dict[str, Any]:
+        if self.fallback != 'local':
+            return await self._classify_remote_async(windows, offload)
+        if self.client.breaker.state == CircuitBreaker.OPEN:
+            return await offload(self._classify_fallback, windows, "circuit open")
+        try:
+            return await self._classify_remote_async(windows, offload)
+        except RequestException as e:
+            return await offload(self._classify_fallback, windows, str(e))
+
+    async def _classify_remote_async(self, windows: List[Tuple[str, int, int]], offload: Offload) -> Dict[str, Any]:
+        if self.adaptive_sampling:
+            window_results = await self._query_windows_adaptive_async(windows, offload)
+            document_length = windows[-1][2] if windows else 0
+            with metrics.timed('aggregate'):
+                final_result = self.aggregate_results(window_results, document_length=document_length or None)
+        else:
+            texts = [text for text, _, _ in windows]
+            results = await self._query_texts_async(texts, offload)
+            window_results = [(result, start, end) for result, (_, start, end) in zip(results, windows)]
+            with metrics.timed('aggregate'):
+                final_result = self.aggregate_results(window_results)
+        return self._remote_result(final_result, len(window_results), len(windows))
+
+    async def _query_windows_adaptive_async(self, windows: List[Tuple[str, int, int]],
+                                            offload: Offload) -> List[Tuple[Dict[str, Any], int, int]]:
+        """query_windows_adaptive() for coroutines: the same rounds and stopping rule."""
+        if not windows:
+            return []
+        scored = {}
+        for round_indices in self._adaptive_rounds(windows):
+            round_results = await self._query_texts_async([windows[i][0] for i in round_indices], offload)
+            scored.update(zip(round_indices, round_results))
+            if self._adaptive_done(scored, windows):
+                break
+        return [(scored[i], windows[i][1], windows[i][2]) for i in sorted(scored)]
+
+    async def _query_texts_async(self, texts: List[str], offload: Offload) -> List[Dict[str, Any]]:
+        """
+        Classify texts concurrently, in batches if batch_size > 1.
+
+        Cached windows are looked up (and new results stored) in one worker thread
+        call per document or round, since the window cache may be on disk.
+        """
+        keys = None
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        if self.window_cache is not None:
+            keys, results = await offload(self._cached_windows, texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        if self.batch_size > 1:
+            batches = list(self._batches((texts[i], i, i) for i in missing))
+            fetched = await _gather(self._call_api_batch_async([text for text, _, _ in batch]) for batch in batches)
+            for batch, batch_results in zip(batches, fetched):
+                for (_, i, _), result in zip(batch, batch_results):
+                    results[i] = result
+        else:
+            fetched = await _gather(self._call_api_async(texts[i]) for i in missing)
+            for i, result in zip(missing, fetched):
+                results[i] = result
+
+        if keys is not None:
+            await offload(self._store_windows, [(keys[i], results[i]) for i in missing])
+        return results
+
+    def _cached_windows(self, texts: List[str]) -> Tuple[List[str], List[Optional[Dict[str, Any]]]]:
+        keys = [self.window_cache.make_key(text, self._categories, self.model_name) for text in texts]
+        return keys, [self.window_cache.get(key) for key in keys]
+
+    def _store_windows(self, entries: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        for key, result in entries:
+            self.window_cache.set(key, result)
+
+    async def _call_api_async(self, text: str) -> Dict[str, Any]:
+        """_call_api() for coroutines."""
+        started = time.perf_counter()
+        try:
+            async with self._async_slots:
+                result = await self.query_api_async(text)
+        except CircuitOpenError:
+            metrics.INFERENCE_REQUESTS.inc(outcome='circuit_open')
+            raise
+        except Exception:
+            metrics.INFERENCE_REQUESTS.inc(outcome='error')
+            raise
+        finally:
+            metrics.record_stage('query_api', time.perf_counter() - started)
+        metrics.INFERENCE_REQUESTS.inc(outcome='success')
+        metrics.INFERENCE_BATCH_WINDOWS.observe(1)
+        return result
+
+    async def _call_api_batch_async(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """_call_api_batch() for coroutines, with the same one-by-one retry of a failed batch."""
+        if len(texts) == 1:
+            return [await self._call_api_async(texts[0])]
+
+        started = time.perf_counter()
+        try:
+            async with self._async_slots:
+                results = await self.query_api_batch_async(texts)
+        except CircuitOpenError:
+            metrics.INFERENCE_REQUESTS.inc(outcome='circuit_open')
+            raise
+        except (RequestException, ValueError) as e:
+            metrics.INFERENCE_REQUESTS.inc(outcome='error')
+            logger.warning(f"Batched request of {len(texts)} windows failed, retrying one by one: {str(e)}")
+            results = None
+        finally:
+            metrics.record_stage('query_api', time.perf_counter() - started)
+        if results is None:
+            return await _gather(self._call_api_async(text) for text in texts)
+        metrics.INFERENCE_REQUESTS.inc(outcome='success')
+        metrics.INFERENCE_BATCH_WINDOWS.observe(len(texts))
+        return results
+
+    async def query_api_async(self, text: str) -> Dict[str, Any]:
+        """query_api() for coroutines."""
+        try:
+            payload = self._api_payload(text)
+            logger.info(f"Making request to Hugging Face API for text of length {len(text)}")
+            response = await self.async_client.post(payload)
+            logger.info(f"Received response with status code: {response.status_code}")
+            return self._parse_api_response(response)
+        except CircuitOpenError:
+            raise
+        except (ConnectionError, requests.exceptions.HTTPError) as e:
+            logger.error(f"Hugging Face API error: {str(e)}")
+            raise RequestException("Issue with Hugging Face API. Please try again.")
+        except Exception as e:
+            logger.error(f"Unexpected error while querying Hugging Face API: {str(e)}")
+            raise RequestException("Issue with Hugging Face API. Please try again.")
+
+    async def query_api_batch_async(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """query_api_batch() for coroutines."""
+        payload = self._api_batch_payload(texts)
+        logger.info(f"Making batched request to Hugging Face API for {len(texts)} texts")
+        try:
+            response = await self.async_client.post(payload)
+            logger.info(f"Received response with status code: {response.status_code}")
+        except (ConnectionError, requests.exceptions.HTTPError) as e:
+            logger.error(f"Hugging Face API error: {str(e)}")
+            raise RequestException("Issue with Hugging Face API. Please try again.")
+        return self._parse_api_batch_response(response, len(texts))
+
+
+async def _gather(coroutines: Iterable[Awaitable[Any]]) -> List[Any]:
+    """asyncio.gather, cancelling the remaining requests as soon as one fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark of DocumentClassifier.aggregate_results.
+
+Compares the vectorized implementation with the previous per-category list
+implementation (kept below as a reference) at 10, 100 and 1,000 windows, and
+checks that both produce identical output.
+
+Usage:
+    python benchmarks/bench_aggregate.py
+"""
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION', 'HUGGINGFACE_API_TOKEN'):
+    os.environ.setdefault(name, 'benchmark')
+
+from ml_classifier import DocumentClassifier  # noqa: E402
+
+
+def legacy_aggregate_results(categories, window_results):
+    """The list-based aggregation this benchmark measures against."""
+    category_scores = {category: [] for category in categories}
+    category_weights = {category: [] for category in categories}
+    document_length = window_results[-1][2]
+
+    for result, start_pos, end_pos in window_results:
+        window_length = end_pos - start_pos
+        position_weight = 1.0 - abs(start_pos - (document_length / 2)) / (document_length / 2)
+        length_weight = window_length / max(r[2] - r[1] for r in window_results)
+        window_weight = (position_weight + length_weight) / 2
+        for label, score in zip(result['labels'], result['scores']):
+            category_scores[label].append(score)
+            category_weights[label].append(window_weight)
+
+    category_stats = {}
+    for category in categories:
+        scores = np.array(category_scores[category])
+        weights = np.array(category_weights[category])
+        weighted_mean = np.average(scores, weights=weights)
+        sorted_idx = np.argsort(scores)
+        cumsum = np.cumsum(weights[sorted_idx])
+        median_idx = np.searchsorted(cumsum, cumsum[-1] / 2)
+        q25 = scores[sorted_idx[np.searchsorted(cumsum, cumsum[-1] * 0.25)]]
+        q75 = scores[sorted_idx[np.searchsorted(cumsum, cumsum[-1] * 0.75)]]
+        category_stats[category] = {
+            'weighted_mean': weighted_mean,
+            'weighted_median': scores[sorted_idx[median_idx]],
+            'confidence_interval': {'lower': q25, 'upper': q75, 'range': q75 - q25},
+            'num_windows': len(scores),
+            'std_dev': np.std(scores) if len(scores) > 1 else 0
+        }
+
+    best_category = max(category_stats.items(), key=lambda x: x[1]['weighted_median'])
+    return {
+        'category': best_category[0],
+        'confidence': best_category[1]['weighted_median'],
+        'all_scores': {cat: stats['weighted_median'] for cat, stats in category_stats.items()},
+        'statistics': category_stats,
+        'raw_result': window_results
+    }
+
+
+def make_window_results(categories, num_windows, seed=0):
+    rng = random.Random(seed)
+    window_results = []
+    start = 0
+    for _ in range(num_windows):
+        length = rng.randint(600, 1024)
+        scores = [rng.random() for _ in categories]
+        total = sum(scores)
+        labels = categories[:]
+        rng.shuffle(labels)
+        window_results.append(({'labels': labels, 'scores': [s / total for s in scores]}, start, start + length))
+        start += length - rng.randint(0, 200)
+    return window_results
+
+
+def main():
+    classifier = DocumentClassifier.__new__(DocumentClassifier)
+    classifier._categories = [
+        "Technical Documentation", "Business Proposal", "Legal Document",
+        "Academic Paper", "General Article", "Other"
+    ]
+
+    print(f"{'windows':>8} {'legacy ms':>10} {'vectorized ms':>14} {'speedup':>8}")
+    for num_windows in (10, 100, 1000):
+        window_results = make_window_results(classifier._categories, num_windows)
+        assert classifier.aggregate_results(window_results) == legacy_aggregate_results(classifier._categories, window_results)
+
+        repeat = max(3, 2000 // num_windows)
+        legacy = min(timeit.repeat(lambda: legacy_aggregate_results(classifier._categories, window_results), number=1, repeat=repeat))
+        vectorized = min(timeit.repeat(lambda: classifier.aggregate_results(window_results), number=1, repeat=repeat))
+        print(f"{num_windows:>8} {legacy * 1000:>10.3f} {vectorized * 1000:>14.3f} {legacy / vectorized:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Upload throughput of the WSGI and ASGI serving modes under many concurrent clients.
+
+Starts the backend in a child process, either under gunicorn with one gthread
+worker of --threads threads (WSGI: every upload holds a thread while it waits
+on inference) or under uvicorn (ASGI: uploads are coroutines), and posts
+--uploads distinct text documents from --concurrency client threads. The
+routes run for real: multipart parsing, the S3 upload (to a stand-in that
+reads and discards the file), classification against the stub inference
+server with --latency seconds per request, and the database commit.
+
+Reports uploads per second, latency percentiles and the status codes seen.
+
+Usage:
+    python benchmarks/bench_async_uploads.py --concurrency 200 --uploads 400 --latency 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARAGRAPH = (
+    "This agreement is entered into by the parties named below. The supplier shall "
+    "deliver the services described in the statement of work, and the customer shall "
+    "pay the fees within thirty days of each invoice. "
+)
+
+
+class DrainingS3Client:
+    """S3 stand-in: reads uploaded originals to the end and discards them."""
+
+    def upload_fileobj(self, fileobj, bucket, key, Config=None):
+        for _ in iter(lambda: fileobj.read(8 * 1024 * 1024), b''):
+            pass
+
+    def delete_object(self, Bucket, Key):
+        pass
+
+
+def prepare_child(workdir, latency):
+    """Point the backend at a fresh database and an in-process stub inference server."""
+    sys.path.insert(0, BACKEND_DIR)
+    from benchmarks.stub_inference_server import start_server
+
+    inference = start_server(latency=latency)
+    os.environ['HUGGINGFACE_API_URL'] = f"http://127.0.0.1:{inference.server_port}/"
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['CLASSIFIER_BACKEND'] = 'remote'
+
+    import app as app_module
+    import services
+    from database import db
+
+    services.s3_client = services.Lazy(DrainingS3Client)
+    with app_module.app.app_context():
+        db.create_all()
+    return app_module.app
+
+
+def run_wsgi(port, threads, workdir, latency):
+    from gunicorn.app.base import BaseApplication
+
+    app = prepare_child(workdir, latency)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"127.0.0.1:{port}")
+            self.cfg.set('workers', 1)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', threads)
+            self.cfg.set('timeout', 300)
+            self.cfg.set('loglevel', 'warning')
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def run_asgi(port, workdir, latency):
+    import uvicorn
+
+    prepare_child(workdir, latency)
+    import asgi
+
+    uvicorn.run(asgi.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, process, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with status {process.returncode}")
+        try:
+            requests.get(f"{base_url}/categories/", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    sys.exit("Server did not start")
+
+
+def upload(session, base_url, i, paragraphs):
+    body = (f"Document {i}. " + PARAGRAPH * paragraphs).encode()
+    started = time.perf_counter()
+    try:
+        status = session.post(f"{base_url}/upload/", files={'file': (f"doc_{i}.txt", body)}, timeout=300).status_code
+    except requests.RequestException:
+        status = None
+    return status, time.perf_counter() - started
+
+
+def run_load(mode, args, workdir):
+    port = free_port()
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode, '--port', str(port),
+               '--workdir', workdir, '--threads', str(args.threads), '--latency', str(args.latency)]
+    env = dict(os.environ)
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION', 'HUGGINGFACE_API_TOKEN'):
+        env.setdefault(name, 'benchmark')
+    process = subprocess.Popen(command, env=env, cwd=BACKEND_DIR)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url, process)
+        # One session per client thread, so connections are reused like a browser's
+        sessions = {}
+
+        def client(i):
+            session = sessions.setdefault(i % args.concurrency, requests.Session())
+            return upload(session, base_url, i, args.paragraphs)
+
+        # Warm up: the classifier and the parsers are created on first use
+        upload(requests.Session(), base_url, -1, args.paragraphs)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(client, range(args.uploads)))
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies = [seconds for status, seconds in results if status == 201]
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'mode': mode,
+        'seconds': round(elapsed, 2),
+        'uploads_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)) * 1000, 1) if latencies else 0.0,
+            'p95': round(float(np.percentile(latencies, 95)) * 1000, 1) if latencies else 0.0
+        },
+        'statuses': statuses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare upload throughput of the WSGI and ASGI serving modes")
+    parser.add_argument('--modes', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+    parser.add_argument('--concurrency', type=int, default=200, help="Client threads posting uploads")
+    parser.add_argument('--uploads', type=int, default=400, help="Uploads per mode")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn gthread threads for the WSGI mode")
+    parser.add_argument('--latency', type=float, default=0.2, help="Stub inference latency in seconds")
+    parser.add_argument('--paragraphs', type=int, default=20, help="Paragraphs of text per document")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this path")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'wsgi':
+        run_wsgi(args.port, args.threads, args.workdir, args.latency)
+        return
+    if args.child == 'asgi':
+        run_asgi(args.port, args.workdir, args.latency)
+        return
+
+    runs = []
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as workdir:
+            result = run_load(mode, args, workdir)
+        runs.append(result)
+        print(f"{mode}: {result['uploads_per_second']} uploads/s, p50 {result['latency_ms']['p50']} ms, "
+              f"p95 {result['latency_ms']['p95']} ms, statuses {result['statuses']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'concurrency': args.concurrency,
+                'uploads': args.uploads,
+                'wsgi_threads': args.threads,
+                'latency': args.latency,
+                'runs': runs
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
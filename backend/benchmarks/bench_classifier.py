@@ -0,0 +1,193 @@
+"""
+End-to-end classifier benchmark over the bundled Dataset/ corpus.
+
+Runs DocumentClassifier.process_document on every .txt, .docx and .pdf file in
+the dataset against the stub inference server (started in-process unless --url
+is given) and reports per-stage timings, windows per document, throughput and
+latency percentiles. Caches are disabled so every run does the full work.
+The stub's fault injection (--error-rate, --throttle-rate, --stall-rate) measures
+the inference client's retries and timeouts; failed documents are counted.
+
+Usage:
+    python benchmarks/bench_classifier.py --latency 0.05 --output results.json
+
+Compare two commits by running the same command on each and diffing the JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION', 'HUGGINGFACE_API_TOKEN'):
+    os.environ.setdefault(name, 'benchmark')
+
+import metrics  # noqa: E402
+from benchmarks.stub_inference_server import start_server  # noqa: E402
+from ml_classifier import DocumentClassifier  # noqa: E402
+
+SUPPORTED = ('.txt', '.docx', '.pdf')
+
+
+def load_corpus(dataset):
+    corpus = []
+    for filename in sorted(os.listdir(dataset)):
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext in SUPPORTED:
+            with open(os.path.join(dataset, filename), 'rb') as f:
+                corpus.append((filename, file_ext, f.read()))
+    return corpus
+
+
+def run_document(classifier, filename, file_ext, content):
+    with metrics.collect_timings() as timings:
+        started = time.perf_counter()
+        try:
+            result = classifier.process_document(content, file_ext)
+            error = None
+        except Exception as e:
+            result, error = {}, str(e)
+        elapsed = time.perf_counter() - started
+    return {
+        'file': filename,
+        'bytes': len(content),
+        'seconds': elapsed,
+        'windows': result.get('sampling', {}).get('windows_total'),
+        'category': result.get('category'),
+        'error': error,
+        'stages': timings.totals()
+    }
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DocumentClassifier over the Dataset corpus")
+    parser.add_argument('--dataset', default=os.path.join(BACKEND_DIR, '..', 'Dataset'))
+    parser.add_argument('--url', default=None, help="Use a running inference server instead of the in-process stub")
+    parser.add_argument('--latency', type=float, default=0.05, help="Stub latency per window request, seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Stub latency jitter, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Stub: fraction of requests answered with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Stub: fraction of requests answered with 429")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="Stub: fraction of requests held for --stall seconds")
+    parser.add_argument('--stall', type=float, default=30.0, help="Stub: seconds a stalled request is held")
+    parser.add_argument('--concurrency', type=int, default=None, help="Window requests in flight per document")
+    parser.add_argument('--batch-size', type=int, default=1, help="Windows per inference request")
+    parser.add_argument('--batch-bytes', type=int, default=None, help="Maximum window text per batched request")
+    parser.add_argument('--documents', type=int, default=1, help="Documents processed in parallel")
+    parser.add_argument('--repeat', type=int, default=3, help="Passes over the corpus")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_server(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                              throttle_rate=args.throttle_rate, stall_rate=args.stall_rate, stall=args.stall,
+                              retry_after=0.1, estimated_time=0.1)
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+    classifier = DocumentClassifier(backend='remote', api_url=url, max_concurrency=args.concurrency,
+                                    adaptive_sampling=False, batch_size=args.batch_size,
+                                    batch_max_bytes=args.batch_bytes)
+    corpus = load_corpus(args.dataset)
+    if not corpus:
+        sys.exit(f"No {', '.join(SUPPORTED)} files found in {args.dataset}")
+
+    runs = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.documents) as pool:
+        for _ in range(args.repeat):
+            runs.extend(pool.map(lambda doc: run_document(classifier, *doc), corpus))
+    wall = time.perf_counter() - started
+    if server is not None:
+        server.shutdown()
+
+    latencies = [run['seconds'] for run in runs]
+    windows = [run['windows'] for run in runs if run['windows'] is not None]
+    stage_names = sorted({stage for run in runs for stage in run['stages']})
+    summary = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'url': args.url or 'stub',
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'error_rate': args.error_rate,
+            'throttle_rate': args.throttle_rate,
+            'stall_rate': args.stall_rate,
+            'concurrency': classifier.max_concurrency,
+            'batch_size': classifier.batch_size,
+            'batch_max_bytes': classifier.batch_max_bytes,
+            'documents_in_parallel': args.documents,
+            'repeat': args.repeat
+        },
+        'documents': len(runs),
+        'failed': sum(1 for run in runs if run['error']),
+        'inference_requests': server.request_count if server is not None else None,
+        'wall_seconds': round(wall, 4),
+        'documents_per_second': round(len(runs) / wall, 3),
+        'latency_ms': {
+            'mean': round(float(np.mean(latencies)) * 1000, 2),
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2)
+        },
+        'windows_per_document': {
+            'mean': round(float(np.mean(windows)), 2) if windows else 0,
+            'max': max(windows) if windows else 0,
+            'total': sum(windows)
+        },
+        # Mean milliseconds per document; query_api is summed over concurrent requests
+        'stages_ms': {
+            stage: round(float(np.mean([run['stages'].get(stage, 0.0) for run in runs])) * 1000, 3)
+            for stage in stage_names
+        },
+        'per_file': [
+            {
+                'file': run['file'],
+                'bytes': run['bytes'],
+                'windows': run['windows'],
+                'category': run['category'],
+                'error': run['error'],
+                'ms': round(run['seconds'] * 1000, 2)
+            }
+            for run in runs[:len(corpus)]
+        ]
+    }
+
+    print(f"{summary['documents']} documents in {summary['wall_seconds']:.2f}s "
+          f"({summary['documents_per_second']:.2f} docs/s, {summary['failed']} failed)")
+    print("latency ms  " + "  ".join(f"{k}={v:.1f}" for k, v in summary['latency_ms'].items()))
+    if summary['inference_requests'] is not None:
+        print(f"inference requests {summary['inference_requests']}")
+    print(f"windows/doc mean={summary['windows_per_document']['mean']} max={summary['windows_per_document']['max']}")
+    for stage, ms in summary['stages_ms'].items():
+        print(f"  {stage:<12} {ms:10.3f} ms/doc")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Document inserts per second under concurrent requests, before and after the
+database tuning.
+
+Each configuration runs in a fresh process against a fresh database initialized
+with `flask init-db`. --threads request threads each save documents one at a time
+through routes.save_documents, the path every upload takes: the document row,
+its stats rollup, its compressed text and its search index entry.
+
+Configurations:
+    baseline   rollback journal, synchronous=FULL, SQLite's 5 s lock wait and
+               one commit per request (the previous behaviour)
+    wal        WAL and the tuned pragmas, still one commit per request
+    batched    WAL and the tuned pragmas, with the write-behind buffer
+
+Usage:
+    python benchmarks/bench_db_writes.py --threads 32 --inserts 4000
+    python benchmarks/bench_db_writes.py --database-url postgresql://localhost/bench --configs wal batched
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'baseline': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT': '5000',
+        'DB_WRITE_BATCHING': 'false'
+    },
+    'wal': {'DB_WRITE_BATCHING': 'false'},
+    'batched': {'DB_WRITE_BATCHING': 'true'}
+}
+
+TEXT = (
+    "This agreement is entered into by the parties named below. The supplier shall "
+    "deliver the services described in the statement of work. "
+) * 20
+
+
+def run_child(threads, inserts):
+    """Save documents from `threads` threads in this process and print the results as JSON."""
+    sys.path.insert(0, BACKEND_DIR)
+    import app as app_module
+    import routes
+    import search
+
+    app = app_module.app
+    app.test_cli_runner().invoke(args=['init-db'])
+
+    def entry(i):
+        compressor = search.TextCompressor()
+        compressor.write(f"Document {i}. {TEXT}")
+        classification = {'category': 'Legal Document', 'confidence': 0.5 + (i % 50) / 100, 'all_scores': {}}
+        s3_key = f"documents/{i}_doc.txt"
+        return (f"doc_{i}.txt", s3_key, f"https://benchmark.s3.amazonaws.com/{s3_key}", classification, compressor.finish())
+
+    per_thread = inserts // threads
+    entries = [[entry(t * per_thread + i) for i in range(per_thread)] for t in range(threads)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def worker(thread_entries):
+        start.wait()
+        for thread_entry in thread_entries:
+            with app.app_context():
+                started = time.perf_counter()
+                try:
+                    routes.save_documents([thread_entry])
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    # Warm up: create the classifier (for its similarity index setting) and the connection pool
+    with app.app_context():
+        routes.save_documents([entry(-1)])
+
+    workers = [threading.Thread(target=worker, args=(thread_entries,)) for thread_entries in entries]
+    for thread in workers:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'inserts': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': round(elapsed, 2),
+        'inserts_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)) * 1000, 2) if latencies else 0.0,
+            'p95': round(float(np.percentile(latencies, 95)) * 1000, 2) if latencies else 0.0,
+            'p99': round(float(np.percentile(latencies, 99)) * 1000, 2) if latencies else 0.0
+        }
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure concurrent document inserts per second")
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--threads', type=int, default=32, help="Concurrent request threads")
+    parser.add_argument('--inserts', type=int, default=4000, help="Documents saved per configuration")
+    parser.add_argument('--database-url', default=None,
+                        help="Database to benchmark instead of a fresh SQLite file; its tables must be empty")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this path")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.threads, args.inserts)
+        return
+
+    runs = []
+    for name in args.configs:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ)
+            for variable in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION',
+                             'HUGGINGFACE_API_TOKEN'):
+                env.setdefault(variable, 'benchmark')
+            env['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            env['CLASSIFIER_BACKEND'] = 'remote'
+            env.update(CONFIGS[name])
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child',
+                 '--threads', str(args.threads), '--inserts', str(args.inserts)],
+                env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['config'] = name
+        runs.append(result)
+        print(f"{name:>9}: {result['inserts_per_second']:>8} inserts/s  p50 {result['latency_ms']['p50']} ms  "
+              f"p95 {result['latency_ms']['p95']} ms  errors {result['errors']}"
+              + (f" ({result['first_error'][:80]})" if result['first_error'] else ''))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'threads': args.threads,
+                'inserts': args.inserts,
+                'database': 'custom' if args.database_url else 'sqlite',
+                'runs': runs
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
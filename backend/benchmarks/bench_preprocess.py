@@ -0,0 +1,123 @@
+"""
+Benchmark of text preprocessing and sliding-window construction.
+
+Compares the fused preprocessing and offset-based windowing with the previous
+multi-pass regex preprocessing and word-list windowing (kept below as a
+reference) on 1 MB and 10 MB inputs, and checks that both produce identical
+text and windows.
+
+Usage:
+    python benchmarks/bench_preprocess.py
+"""
+from collections import deque
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION', 'HUGGINGFACE_API_TOKEN'):
+    os.environ.setdefault(name, 'benchmark')
+
+from ml_classifier import DocumentClassifier  # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Dataset')
+
+
+def legacy_preprocess_text(text):
+    """The six-pass preprocessing this benchmark measures against."""
+    text = text.lower()
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\S+@\S+', '', text)
+    text = re.sub(r'\n+', '\n', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,!?;:()\-\'"]', ' ', text)
+    return text.strip()
+
+
+def legacy_create_sliding_windows(text, window_size=1024, overlap=200):
+    """The word-list windowing this benchmark measures against."""
+    windows = []
+    current_window = []
+    current_length = 0
+    start_pos = 0
+    for word in text.split():
+        word_length = len(word) + 1
+        if current_length + word_length > window_size:
+            window_text = ' '.join(current_window)
+            end_pos = start_pos + len(window_text)
+            windows.append((window_text, start_pos, end_pos))
+            overlap_words = deque()
+            overlap_length = 0
+            overlap_start = len(current_window) - 1
+            while overlap_start >= 0 and overlap_length < overlap:
+                overlap_word = current_window[overlap_start]
+                if overlap_length + len(overlap_word) + 1 > overlap:
+                    break
+                overlap_words.appendleft(overlap_word)
+                overlap_length += len(overlap_word) + 1
+                overlap_start -= 1
+            current_window = list(overlap_words)
+            current_length = overlap_length
+            start_pos = end_pos - overlap_length
+        current_window.append(word)
+        current_length += word_length
+    if current_window:
+        window_text = ' '.join(current_window)
+        windows.append((window_text, start_pos, start_pos + len(window_text)))
+    return windows
+
+
+def build_corpus(size):
+    """Concatenate Dataset/ text files (plus some URLs, e-mails and Unicode) up to size characters."""
+    texts = []
+    for filename in sorted(os.listdir(DATASET)):
+        if filename.endswith('.txt'):
+            with open(os.path.join(DATASET, filename), encoding='utf-8') as f:
+                texts.append(f.read())
+    rng = random.Random(0)
+    extras = ['see https://example.com/docs?id=1 ', 'mail jane.doe@example.org ', 'café naïve — ',
+              'www.example.net ', '  tab\there\n\n']
+    parts, length = [], 0
+    while length < size:
+        part = rng.choice(texts) if rng.random() < 0.9 else rng.choice(extras)
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)[:size]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    classifier = DocumentClassifier(backend='remote')
+
+    for label, size in (('1 MB', 1_000_000), ('10 MB', 10_000_000)):
+        text = build_corpus(size)
+
+        legacy_text, legacy_pre = timed(legacy_preprocess_text, text)
+        new_text, new_pre = timed(classifier.preprocess_text, text)
+        assert legacy_text == new_text, "preprocessed text differs"
+
+        legacy_windows, legacy_win = timed(legacy_create_sliding_windows, legacy_text)
+        single_spaced, new_pre_collapsed = timed(lambda t: classifier.preprocess_text(t, collapse_whitespace=True), text)
+        new_windows, new_win = timed(classifier.create_sliding_windows, single_spaced)
+        assert legacy_windows == new_windows, "windows differ"
+
+        print(f"{label}: {len(legacy_windows)} windows")
+        print(f"  preprocess       legacy {legacy_pre * 1000:8.1f} ms   fused {new_pre * 1000:8.1f} ms   "
+              f"({legacy_pre / new_pre:.1f}x)")
+        print(f"  windows          legacy {legacy_win * 1000:8.1f} ms   offset {new_win * 1000:7.1f} ms   "
+              f"({legacy_win / new_win:.1f}x)")
+        print(f"  preprocess+win   legacy {(legacy_pre + legacy_win) * 1000:8.1f} ms   new {(new_pre_collapsed + new_win) * 1000:10.1f} ms   "
+              f"({(legacy_pre + legacy_win) / (new_pre_collapsed + new_win):.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Peak memory of the upload route as the uploaded file grows.
+
+Generates PDFs of increasing size (the same few pages of text, padded with an
+image stream, like a scanned document) and posts each one to /upload/ in a fresh
+process, so every size gets its own peak RSS. The route runs for real: multipart
+parsing, spooling, PDF parsing, the S3 upload (to a stand-in that reads and
+discards the file) and the database commit. Classification goes to the stub
+inference server.
+
+With the default memory budget, files above it are parsed from a memory-mapped
+file and peak RSS should stay flat as the file grows; --memory-budget larger than
+the biggest file shows the in-memory behaviour for comparison. --check exits with
+status 1 if peak RSS grows by more than --max-growth MB from the smallest file to
+the largest.
+
+Usage:
+    python benchmarks/bench_upload_memory.py --sizes 10 50 100 200 --check
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGE_TEXT = (
+    "Quarterly infrastructure report. The deployment pipeline was migrated to the new "
+    "cluster and the API gateway now terminates TLS. Latency at the 99th percentile fell "
+    "after the database connection pool was resized. Page {page}."
+)
+
+
+def write_pdf(path, size_mb, pages=5):
+    """Write a PDF of roughly size_mb megabytes: `pages` pages of text sharing one padding image."""
+    padding = max(0, size_mb * 1024 * 1024)
+    width = 1024
+    height = max(1, padding // width)
+    offsets = []
+
+    with open(path, 'wb') as f:
+        def start_object(number):
+            offsets.append((number, f.tell()))
+            f.write(f"{number} 0 obj\n".encode())
+
+        f.write(b"%PDF-1.4\n")
+        page_numbers = [5 + 2 * i for i in range(pages)]
+        start_object(1)
+        f.write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        start_object(2)
+        kids = ' '.join(f"{n} 0 R" for n in page_numbers)
+        f.write(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>\nendobj\n".encode())
+        start_object(3)
+        f.write(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\nendobj\n")
+
+        # Incompressible image data, written block by block
+        start_object(4)
+        f.write(
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Length {width * height} >>\nstream\n".encode()
+        )
+        remaining = width * height
+        while remaining:
+            block = min(remaining, 1024 * 1024)
+            f.write(os.urandom(block))
+            remaining -= block
+        f.write(b"\nendstream\nendobj\n")
+
+        for i, number in enumerate(page_numbers):
+            content = f"BT /F1 10 Tf 40 750 Td ({PAGE_TEXT.format(page=i + 1)}) Tj ET".encode()
+            start_object(number)
+            f.write(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {number + 1} 0 R "
+                f"/Resources << /Font << /F1 3 0 R >> /XObject << /Im1 4 0 R >> >> >>\nendobj\n".encode()
+            )
+            start_object(number + 1)
+            f.write(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream\nendobj\n")
+
+        xref = f.tell()
+        count = max(number for number, _ in offsets) + 1
+        f.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for _, offset in sorted(offsets):
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class DrainingS3Client:
+    """S3 stand-in: reads uploaded originals to the end and discards them."""
+
+    def upload_fileobj(self, fileobj, bucket, key, Config=None):
+        for _ in iter(lambda: fileobj.read(8 * 1024 * 1024), b''):
+            pass
+
+    def delete_object(self, Bucket, Key):
+        pass
+
+
+def run_child(path, workdir):
+    """Post one file to /upload/ in this process and print its peak RSS as JSON."""
+    sys.path.insert(0, BACKEND_DIR)
+    from benchmarks.stub_inference_server import start_server
+
+    server = start_server()
+    os.environ['HUGGINGFACE_API_URL'] = f"http://127.0.0.1:{server.server_port}/"
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['CLASSIFIER_BACKEND'] = 'remote'
+
+    import app as app_module
+    import services
+    from database import db
+
+    app = app_module.app
+    services.s3_client = services.Lazy(DrainingS3Client)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    # Warm up: load the PDF parser and the classifier before measuring
+    warmup = os.path.join(workdir, 'warmup.pdf')
+    write_pdf(warmup, 0)
+    with open(warmup, 'rb') as f:
+        client.post('/upload/', data={'file': (f, 'warmup.pdf')})
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/upload/', data={'file': (f, os.path.basename(path))})
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    print(json.dumps({
+        'status': response.status_code,
+        'error': (response.get_json() or {}).get('error'),
+        'seconds': round(elapsed, 2),
+        'baseline_peak_rss_mb': round(baseline, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak RSS of /upload/ as the file size grows")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 200], help="File sizes in MB")
+    parser.add_argument('--memory-budget', type=int, default=None,
+                        help="UPLOAD_MEMORY_BUDGET in bytes for the runs (default: the configured one)")
+    parser.add_argument('--check', action='store_true', help="Fail if peak RSS grows by more than --max-growth MB")
+    parser.add_argument('--max-growth', type=float, default=32.0, help="Allowed peak RSS growth for --check, MB")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this path")
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.workdir)
+        return
+
+    env = dict(os.environ)
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION', 'HUGGINGFACE_API_TOKEN'):
+        env.setdefault(name, 'benchmark')
+    if args.memory_budget is not None:
+        env['UPLOAD_MEMORY_BUDGET'] = str(args.memory_budget)
+    env['UPLOAD_MAX_BYTES'] = '0'
+    env['REQUEST_MAX_BYTES'] = '0'
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sorted(args.sizes):
+            path = os.path.join(workdir, f"upload_{size}mb.pdf")
+            write_pdf(path, size)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', path, '--workdir', workdir],
+                env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result['file_mb'] = round(os.path.getsize(path) / (1024 * 1024), 1)
+            runs.append(result)
+            os.remove(path)
+            print(f"{result['file_mb']:>7} MB  status {result['status']}  peak RSS {result['peak_rss_mb']} MB "
+                  f"(baseline {result['baseline_peak_rss_mb']} MB)  {result['seconds']} s")
+
+    growth = runs[-1]['peak_rss_mb'] - runs[0]['peak_rss_mb']
+    print(f"Peak RSS growth from {runs[0]['file_mb']} MB to {runs[-1]['file_mb']} MB: {growth:.1f} MB")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'memory_budget': args.memory_budget,
+                'runs': runs,
+                'peak_rss_growth_mb': round(growth, 1)
+            }, f, indent=2)
+
+    failed = [run for run in runs if run['status'] != 201]
+    if failed:
+        sys.exit(f"{len(failed)} uploads failed: {failed[0]['error']}")
+    if args.check and growth > args.max_growth:
+        sys.exit(f"Peak RSS grew by {growth:.1f} MB, more than the allowed {args.max_growth} MB")
+
+
+if __name__ == '__main__':
+    main()
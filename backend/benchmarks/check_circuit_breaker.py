@@ -0,0 +1,117 @@
+"""
+Circuit breaker recovery against the stub inference server.
+
+Drives InferenceClient and AsyncInferenceClient through
+open -> half_open -> trial answered 429 -> recovery, switching the stub's fault
+injection between steps:
+
+    1. every request answers 503 until the circuit opens
+    2. after the reset timeout the trial request is answered 429, which must
+       leave the circuit half-open with the trial slot free
+    3. the next request probes again, succeeds and closes the circuit
+
+Exits non-zero if any step sees the wrong outcome or circuit state.
+
+Usage:
+    python benchmarks/check_circuit_breaker.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.stub_inference_server import start_server  # noqa: E402
+
+for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_BUCKET_NAME', 'AWS_REGION', 'HUGGINGFACE_API_TOKEN'):
+    os.environ.setdefault(name, 'benchmark')
+
+from async_classifier import AsyncInferenceClient  # noqa: E402
+from inference_client import CircuitBreaker, CircuitOpenError, InferenceClient  # noqa: E402
+
+FAILURE_THRESHOLD = 2
+RESET_TIMEOUT = 0.3
+PAYLOAD = {'inputs': 'The parties agree to the terms below.',
+           'parameters': {'candidate_labels': ['Legal Document', 'Other']}}
+
+
+def faults(server, error_rate=0.0, throttle_rate=0.0):
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+
+
+def outcome(call):
+    """Run one request; return 'ok', the HTTP status it failed with, or 'circuit open'."""
+    try:
+        call()
+        return 'ok'
+    except CircuitOpenError:
+        return 'circuit open'
+    except requests.HTTPError as e:
+        return str(e.response.status_code)
+
+
+def run_sequence(server, call, breaker):
+    """Return (step, expected, seen) for every step that went wrong."""
+    problems = []
+
+    def expect(step, seen, expected):
+        if seen != expected:
+            problems.append((step, expected, seen))
+
+    faults(server, error_rate=1.0)
+    for _ in range(FAILURE_THRESHOLD):
+        outcome(call)
+    expect('circuit opens after 503s', breaker.state, CircuitBreaker.OPEN)
+    expect('open circuit rejects calls', outcome(call), 'circuit open')
+
+    time.sleep(RESET_TIMEOUT)
+    expect('circuit half-opens after the reset timeout', breaker.state, CircuitBreaker.HALF_OPEN)
+    faults(server, throttle_rate=1.0)
+    expect('trial request is throttled', outcome(call), '429')
+    expect('429 on the trial leaves the circuit half-open', breaker.state, CircuitBreaker.HALF_OPEN)
+
+    faults(server)
+    expect('next request probes again', outcome(call), 'ok')
+    expect('successful probe closes the circuit', breaker.state, CircuitBreaker.CLOSED)
+    return problems
+
+
+def main():
+    # 503 and 429 carry estimated_time / Retry-After; keep waits short and never retry
+    server = start_server(retry_after=0.01, estimated_time=0.01)
+    url = f"http://127.0.0.1:{server.server_port}/"
+    failed = False
+
+    breaker = CircuitBreaker(FAILURE_THRESHOLD, RESET_TIMEOUT)
+    client = InferenceClient(requests.Session(), url, max_retries=0, breaker=breaker)
+    results = {'sync': run_sequence(server, lambda: client.post(PAYLOAD), breaker)}
+
+    async def run_async():
+        async with httpx.AsyncClient() as session:
+            breaker = CircuitBreaker(FAILURE_THRESHOLD, RESET_TIMEOUT)
+            client = AsyncInferenceClient(session, url, max_retries=0, breaker=breaker)
+            loop = asyncio.get_running_loop()
+            # run_sequence is synchronous; each request runs to completion on this loop
+            call = lambda: asyncio.run_coroutine_threadsafe(client.post(PAYLOAD), loop).result()  # noqa: E731
+            return await loop.run_in_executor(None, run_sequence, server, call, breaker)
+
+    results['async'] = asyncio.run(run_async())
+    server.shutdown()
+
+    for client_name, problems in results.items():
+        if not problems:
+            print(f"{client_name}: open -> half_open -> 429 -> closed as expected")
+        for step, expected, seen in problems:
+            failed = True
+            print(f"{client_name}: {step}: expected {expected!r}, got {seen!r}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Local stand-in for the Hugging Face zero-shot inference endpoint.
+
+Answers POSTs in the same shape as facebook/bart-large-mnli after a simulated
+latency. Scores are derived from a hash of the input, so repeated runs over the
+same corpus produce the same classifications. A list of inputs is answered with a
+list of results, like the hosted zero-shot pipeline; --max-batch rejects larger
+batches with 413 to exercise the classifier's fallback to single requests.
+
+Faults can be injected to exercise the classifier's retries, timeouts and circuit
+breaker: --error-rate answers 503 "model loading" with estimated_time,
+--throttle-rate answers 429 with Retry-After, and --stall-rate holds the request
+for --stall seconds before answering.
+
+Usage:
+    python benchmarks/stub_inference_server.py --port 8765 --latency 0.2 --jitter 0.05
+
+Then point the backend at it with HUGGINGFACE_API_URL=http://127.0.0.1:8765/
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    """Request handler; latency settings are read from the server object."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid the delayed-ACK stall on keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+            inputs = payload['inputs']
+            labels = payload['parameters']['candidate_labels']
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {'error': 'Invalid request'})
+            return
+
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if isinstance(inputs, list) and server.max_batch and len(inputs) > server.max_batch:
+            self._send(413, {'error': f'At most {server.max_batch} inputs per request'})
+            return
+
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if server.stall_rate and random.random() < server.stall_rate:
+            delay = server.stall
+        if delay > 0:
+            time.sleep(delay)
+
+        if server.throttle_rate and random.random() < server.throttle_rate:
+            self._send(429, {'error': 'Rate limit reached'}, {'Retry-After': f"{server.retry_after:g}"})
+            return
+        if server.error_rate and random.random() < server.error_rate:
+            self._send(503, {'error': 'Model is currently loading', 'estimated_time': server.estimated_time})
+            return
+
+        if isinstance(inputs, list):
+            self._send(200, [score(text, labels) for text in inputs])
+        else:
+            self._send(200, score(inputs, labels))
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def score(text, labels):
+    """Deterministic zero-shot style response for a text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
+    rng = random.Random(seed)
+    raw = [rng.random() ** 3 for _ in labels]
+    total = sum(raw) or 1.0
+    ranked = sorted(zip(labels, (value / total for value in raw)), key=lambda pair: -pair[1])
+    return {
+        'sequence': text,
+        'labels': [label for label, _ in ranked],
+        'scores': [value for _, value in ranked]
+    }
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, max_batch=0,
+                 throttle_rate=0.0, stall_rate=0.0, stall=30.0, retry_after=1.0, estimated_time=1.0):
+    """
+    Start the stub server on a background thread.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind; 0 picks a free port
+        latency: Mean simulated inference latency in seconds
+        jitter: Uniform +/- jitter added to the latency, in seconds
+        error_rate: Fraction of requests answered with 503 and estimated_time
+        max_batch: Largest list of inputs accepted; 0 accepts any size
+        throttle_rate: Fraction of requests answered with 429 and Retry-After
+        stall_rate: Fraction of requests held for `stall` seconds
+        stall: Seconds a stalled request is held
+        retry_after: Retry-After value sent with 429 responses, in seconds
+        estimated_time: estimated_time sent with 503 responses, in seconds
+
+    Returns:
+        The running server; its URL is http://{host}:{server.server_port}/ and
+        server.request_count counts the POSTs received
+    """
+    server = ThreadingHTTPServer((host, port), StubInferenceHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.max_batch = max_batch
+    server.throttle_rate = throttle_rate
+    server.stall_rate = stall_rate
+    server.stall = stall
+    server.retry_after = retry_after
+    server.estimated_time = estimated_time
+    server.request_count = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, name='stub-inference', daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub zero-shot inference server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help="Mean latency per request in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Uniform +/- jitter in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument('--max-batch', type=int, default=0, help="Reject batches of more inputs with 413; 0 = no limit")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="Fraction of requests held for --stall seconds")
+    parser.add_argument('--stall', type=float, default=30.0, help="Seconds a stalled request is held")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After sent with 429, seconds")
+    parser.add_argument('--estimated-time', type=float, default=1.0, help="estimated_time sent with 503, seconds")
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, args.latency, args.jitter, args.error_rate, args.max_batch,
+                          args.throttle_rate, args.stall_rate, args.stall, args.retry_after, args.estimated_time)
+    print(f"Stub inference server listening on http://{args.host}:{server.server_port}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from database import db, ClassificationCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with optional per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before the least recently used is evicted
+            ttl: Seconds an entry stays valid. None keeps entries until evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, marking it as recently used."""
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires_at, value = self._data[key]
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class ResultCache:
+    """
+    Persistent cache of document classification results.
+
+    Lookups go to an in-process LRU first and fall back to the classification_cache
+    table, so a re-uploaded document is answered without extraction or API calls.
+    The database tier requires an active Flask application context.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize the result cache.
+
+        Args:
+            maxsize: Number of results kept in the in-process LRU
+        """
+        self._memory = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+        # Lookups come from request, job and bulk-upload worker threads
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._memory)}
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached classification result.
+
+        Args:
+            key: Cache key produced by the classifier
+
+        Returns:
+            The stored result, or None on a miss
+        """
+        result = self._memory.get(key)
+        if result is not None:
+            self._count(hit=True)
+            return dict(result)
+
+        try:
+            entry = db.session.get(ClassificationCache, key)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.warning(f"Result cache lookup failed: {str(e)}")
+            self._count(hit=False)
+            return None
+
+        if entry is None:
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        result = entry.to_result()
+        self._memory.set(key, result)
+        return dict(result)
+
+    def set(self, key: str, result: Dict[str, Any], model_name: str) -> None:
+        """
+        Store a classification result in both cache tiers.
+
+        Args:
+            key: Cache key produced by the classifier
+            result: Aggregated classification result
+            model_name: Model that produced the result
+        """
+        entry = ClassificationCache.from_result(key, result, model_name)
+        self._memory.set(key, entry.to_result())
+
+        try:
+            self._upsert(entry)
+            db.session.commit()
+        except IntegrityError:
+            # Another worker stored the same key between our select and insert
+            db.session.rollback()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.warning(f"Failed to persist cached result: {str(e)}")
+
+    @staticmethod
+    def _upsert(entry: ClassificationCache) -> None:
+        """
+        Insert or replace an entry in one statement, so concurrent writers of the same
+        key (e.g. identical files in one bulk upload) don't race between a select and
+        an insert. Other databases fall back to a merge.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect not in ('postgresql', 'sqlite'):
+            db.session.merge(entry)
+            return
+
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        values = {
+            column: getattr(entry, column)
+            for column in ('cache_key', 'model_name', 'category', 'confidence', 'all_scores', 'statistics')
+        }
+        statement = insert(ClassificationCache.__table__).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=['cache_key'],
+            set_={column: statement.excluded[column] for column in values if column != 'cache_key'}
+        )
+        db.session.execute(statement)
+
+
+class WindowCache:
+    """
+    Cache of per-window inference results.
+
+    Documents that share boilerplate produce identical windows; this cache answers
+    those windows without a remote call. Entries live in a bounded in-memory LRU
+    with TTL and, optionally, in a SQLite file on disk that survives restarts and is
+    shared by every worker on the host. Safe to use from classifier worker threads.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None, disk_path: Optional[str] = None):
+        """
+        Initialize the window cache.
+
+        Args:
+            maxsize: Number of window results kept in memory
+            ttl: Seconds a result stays valid in either tier. None disables expiry
+            disk_path: Path of the SQLite file backing the on-disk tier. None disables it
+        """
+        self.ttl = ttl
+        self._memory = LRUCache(maxsize, ttl=ttl)
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS window_results "
+                "(cache_key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._disk.commit()
+
+    @staticmethod
+    def make_key(text: str, labels: List[str], model_name: str) -> str:
+        """
+        Build the cache key for a window.
+
+        Args:
+            text: Window text sent to the model
+            labels: Candidate labels of the request
+            model_name: Model answering the request
+
+        Returns:
+            SHA-256 hex key
+        """
+        key_material = '\x1f'.join([model_name] + list(labels) + [text])
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached window result, or None on a miss."""
+        result = self._memory.get(key)
+        if result is None and self._disk is not None:
+            result = self._disk_get(key)
+            if result is not None:
+                self._memory.set(key, result)
+                with self._counter_lock:
+                    self.disk_hits += 1
+
+        with self._counter_lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a window result in every enabled tier."""
+        self._memory.set(key, result)
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO window_results (cache_key, result, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result, default=float), time.time())
+                )
+                self._disk.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist window result: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters."""
+        with self._counter_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'size': len(self._memory)
+            }
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    "SELECT result, created_at FROM window_results WHERE cache_key = ?",
+                    (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Window cache disk lookup failed: {str(e)}")
+            return None
+
+        if row is None:
+            return None
+        result, created_at = row
+        if self.ttl and created_at + self.ttl <= time.time():
+            return None
+        return json.loads(result)
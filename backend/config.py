@@ -8,13 +8,97 @@ load_dotenv()
 class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str = os.getenv('DATABASE_URL', 'sqlite:///documents.db')
+    DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', '10'))  # connections kept open per process (not SQLite)
+    DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', '20'))  # extra connections opened under load
+    DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # seconds before a connection is replaced; -1 = never
+    DB_POOL_PRE_PING: bool = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    SQLITE_JOURNAL_MODE: str = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS: str = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv('SQLITE_BUSY_TIMEOUT', '30000'))  # milliseconds to wait for the write lock
+    SQLITE_CACHE_SIZE: int = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # pages, or KiB when negative
+    DB_WRITE_BATCHING: bool = os.getenv('DB_WRITE_BATCHING', 'true').lower() == 'true'
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv('DB_WRITE_BATCH_SIZE', '200'))  # documents per batched commit
+    DB_WRITE_MAX_DELAY: float = float(os.getenv('DB_WRITE_MAX_DELAY', '0'))  # seconds a document waits for others to join its commit; 0 = none
     
     # AWS settings
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
     AWS_BUCKET_NAME: str
     AWS_REGION: str
+    AWS_S3_ENDPOINT_URL: str = os.getenv('AWS_S3_ENDPOINT_URL', '')
+    S3_MULTIPART_THRESHOLD: int = int(os.getenv('S3_MULTIPART_THRESHOLD', str(8 * 1024 * 1024)))
+    S3_MULTIPART_CHUNKSIZE: int = int(os.getenv('S3_MULTIPART_CHUNKSIZE', str(8 * 1024 * 1024)))
+    S3_MAX_CONCURRENCY: int = int(os.getenv('S3_MAX_CONCURRENCY', '4'))
+    S3_UPLOAD_WORKERS: int = int(os.getenv('S3_UPLOAD_WORKERS', '8'))
     HUGGINGFACE_API_TOKEN: str
+    HUGGINGFACE_API_URL: str = os.getenv('HUGGINGFACE_API_URL', '')
+
+    # Classifier settings
+    CLASSIFIER_MAX_CONCURRENCY: int = int(os.getenv('CLASSIFIER_MAX_CONCURRENCY', '4'))
+    INFERENCE_BATCH_SIZE: int = int(os.getenv('INFERENCE_BATCH_SIZE', '1'))  # windows per request; 1 disables batching
+    INFERENCE_BATCH_MAX_BYTES: int = int(os.getenv('INFERENCE_BATCH_MAX_BYTES', '65536'))
+    INFERENCE_CONNECT_TIMEOUT: float = float(os.getenv('INFERENCE_CONNECT_TIMEOUT', '3.05'))
+    INFERENCE_READ_TIMEOUT: float = float(os.getenv('INFERENCE_READ_TIMEOUT', '30'))
+    INFERENCE_MAX_RETRIES: int = int(os.getenv('INFERENCE_MAX_RETRIES', '3'))
+    INFERENCE_BACKOFF_BASE: float = float(os.getenv('INFERENCE_BACKOFF_BASE', '0.5'))
+    INFERENCE_BACKOFF_MAX: float = float(os.getenv('INFERENCE_BACKOFF_MAX', '10'))
+    INFERENCE_RETRY_BUDGET: float = float(os.getenv('INFERENCE_RETRY_BUDGET', '60'))
+    INFERENCE_RATE_LIMIT: float = float(os.getenv('INFERENCE_RATE_LIMIT', '0'))  # requests per second across all processes; 0 disables
+    INFERENCE_RATE_BURST: int = int(os.getenv('INFERENCE_RATE_BURST', '0'))
+    INFERENCE_RATE_PROCESSES: int = int(os.getenv('INFERENCE_RATE_PROCESSES', os.getenv('WEB_CONCURRENCY', '1')))  # processes splitting the limit
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_TIMEOUT: float = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+    INFERENCE_FALLBACK: str = os.getenv('INFERENCE_FALLBACK', 'none')  # none or local
+    RESULT_CACHE_SIZE: int = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+    WINDOW_CACHE_SIZE: int = int(os.getenv('WINDOW_CACHE_SIZE', '4096'))
+    WINDOW_CACHE_TTL: float = float(os.getenv('WINDOW_CACHE_TTL', '86400'))
+    WINDOW_CACHE_PATH: str = os.getenv('WINDOW_CACHE_PATH', '')
+    CLASSIFIER_BACKEND: str = os.getenv('CLASSIFIER_BACKEND', 'remote')  # remote, local or cascade
+    LOCAL_MODEL_PATH: str = os.getenv('LOCAL_MODEL_PATH', 'local_model.npz')
+    CASCADE_MARGIN: float = float(os.getenv('CASCADE_MARGIN', '0.2'))
+    ADAPTIVE_SAMPLING: bool = os.getenv('ADAPTIVE_SAMPLING', 'false').lower() == 'true'
+    ADAPTIVE_MARGIN: float = float(os.getenv('ADAPTIVE_MARGIN', '0.3'))
+    ADAPTIVE_MIN_WINDOWS: int = int(os.getenv('ADAPTIVE_MIN_WINDOWS', '3'))
+    ADAPTIVE_MAX_WINDOWS: int = int(os.getenv('ADAPTIVE_MAX_WINDOWS', '0'))  # 0 = no budget
+    NEAR_DUPLICATE_THRESHOLD: float = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0'))  # 0 disables
+
+    # Document listing settings
+    DOCUMENT_COUNT_TTL: float = float(os.getenv('DOCUMENT_COUNT_TTL', '30'))
+
+    # Download URL settings
+    PRESIGNED_URL_EXPIRY: int = int(os.getenv('PRESIGNED_URL_EXPIRY', '60'))
+    PRESIGNED_URL_CACHE_TTL: float = float(os.getenv('PRESIGNED_URL_CACHE_TTL', '50'))  # capped at the expiry minus the minimum validity
+    PRESIGNED_URL_MIN_VALIDITY: float = float(os.getenv('PRESIGNED_URL_MIN_VALIDITY', '10'))  # seconds a served URL stays valid at least
+    PRESIGNED_URL_CACHE_SIZE: int = int(os.getenv('PRESIGNED_URL_CACHE_SIZE', '4096'))
+
+    # Upload processing settings
+    UPLOAD_MAX_BYTES: int = int(os.getenv('UPLOAD_MAX_BYTES', str(200 * 1024 * 1024)))  # per file; 0 = unlimited
+    REQUEST_MAX_BYTES: int = int(os.getenv('REQUEST_MAX_BYTES', str(1024 * 1024 * 1024)))  # per request; 0 = unlimited
+    UPLOAD_MEMORY_BUDGET: int = int(os.getenv('UPLOAD_MEMORY_BUDGET', str(8 * 1024 * 1024)))  # larger files are memory-mapped from disk
+    UPLOAD_SPOOL_DIR: str = os.getenv('UPLOAD_SPOOL_DIR', '')
+    ASYNC_UPLOADS: bool = os.getenv('ASYNC_UPLOADS', 'false').lower() == 'true'
+    JOB_WORKERS: int = int(os.getenv('JOB_WORKERS', '2'))
+
+    # ASGI serving mode (asgi.py)
+    ASGI_INFERENCE_CONCURRENCY: int = int(os.getenv('ASGI_INFERENCE_CONCURRENCY', '64'))  # window requests in flight per process
+    ASGI_OFFLOAD_WORKERS: int = int(os.getenv('ASGI_OFFLOAD_WORKERS', '32'))  # threads for parsing, S3 and cache lookups
+    ASGI_WSGI_WORKERS: int = int(os.getenv('ASGI_WSGI_WORKERS', '16'))  # threads serving the remaining Flask routes
+    ASGI_DATABASE_URL: str = os.getenv('ASGI_DATABASE_URL', '')  # async driver URL; derived from DATABASE_URL if empty
+
+    # Extracted text storage and search
+    TEXT_COMPRESSION_LEVEL: int = int(os.getenv('TEXT_COMPRESSION_LEVEL', '6'))
+    SEARCH_MAX_INDEXED_CHARS: int = int(os.getenv('SEARCH_MAX_INDEXED_CHARS', '500000'))
+
+    # Readiness checks
+    READY_CHECK_INTERVAL: int = int(os.getenv('READY_CHECK_INTERVAL', '30'))
+    READY_CHECK_TIMEOUT: int = int(os.getenv('READY_CHECK_TIMEOUT', '5'))
+
+    # Bulk upload settings
+    BULK_MAX_FILES: int = int(os.getenv('BULK_MAX_FILES', '5000'))
+    BULK_SYNC_LIMIT: int = int(os.getenv('BULK_SYNC_LIMIT', '50'))
+    BULK_WORKERS: int = int(os.getenv('BULK_WORKERS', '4'))
+    BULK_COMMIT_SIZE: int = int(os.getenv('BULK_COMMIT_SIZE', '50'))
 
     def get_database_url(self) -> str:
         """Get the database URL, converting postgres:// to postgresql:// if needed"""
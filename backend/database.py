@@ -1,10 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event, inspect, text, update
+from sqlalchemy.engine import make_url
+import json
+import logging
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
 class Document(db.Model):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Serves newest-first listing and keyset pagination on (upload_timestamp, id)
+        db.Index('ix_documents_upload_timestamp_id', 'upload_timestamp', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, index=True)
     filename = db.Column(db.String, index=True)
@@ -13,12 +26,233 @@ class Document(db.Model):
     confidence = db.Column(db.Float)
     upload_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     s3_url = db.Column(db.String)
+    # Object key in AWS_BUCKET_NAME; rows from before the column existed are backfilled by ensure_schema
+    s3_key = db.Column(db.String)
 
     def to_dict(self):
         return {
+            'id': self.id,
             'filename': self.filename,
             'classification': self.classification,
             'confidence': self.confidence,
             'upload_timestamp': self.upload_timestamp.isoformat(),
             's3_url': self.s3_url
-        } 
\ No newline at end of file
+        }
+
+
+class DocumentText(db.Model):
+    """Extracted text of a document, zlib-compressed (see search.py)."""
+    __tablename__ = "document_texts"
+
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), primary_key=True)
+    compressed_text = db.Column(db.LargeBinary, nullable=False)
+    text_length = db.Column(db.Integer, nullable=False)
+
+
+class DocumentSignature(db.Model):
+    """MinHash signature of a document and the result it was classified with (see similarity.py)."""
+    __tablename__ = "document_signatures"
+
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), primary_key=True)
+    # Classifier configuration the result belongs to; other configurations don't reuse it
+    scope = db.Column(db.String(64), nullable=False)
+    signature = db.Column(db.LargeBinary, nullable=False)
+    category = db.Column(db.String)
+    confidence = db.Column(db.Float)
+    all_scores = db.Column(db.JSON)
+
+
+class SignatureBucket(db.Model):
+    """LSH band buckets of document signatures; the primary key doubles as the lookup index."""
+    __tablename__ = "signature_buckets"
+
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), primary_key=True)
+
+
+class DocumentStatsRollup(db.Model):
+    """Hourly document counts per classification and confidence bin."""
+    __tablename__ = "document_stats_rollup"
+
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    classification = db.Column(db.String, primary_key=True)
+    confidence_bin = db.Column(db.Integer, primary_key=True)
+    document_count = db.Column(db.Integer, nullable=False, default=0)
+    confidence_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class ClassificationCache(db.Model):
+    __tablename__ = "classification_cache"
+
+    cache_key = db.Column(db.String(64), primary_key=True)
+    model_name = db.Column(db.String)
+    category = db.Column(db.String)
+    confidence = db.Column(db.Float)
+    all_scores = db.Column(db.JSON)
+    statistics = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def from_result(cls, cache_key, result, model_name):
+        # Round-trip through JSON so numpy scalars are stored as plain floats
+        plain = json.loads(json.dumps({
+            'all_scores': result['all_scores'],
+            'statistics': result.get('statistics', {})
+        }, default=float))
+        return cls(
+            cache_key=cache_key,
+            model_name=model_name,
+            category=result['category'],
+            confidence=float(result['confidence']),
+            all_scores=plain['all_scores'],
+            statistics=plain['statistics']
+        )
+
+    def to_result(self):
+        return {
+            'category': self.category,
+            'confidence': self.confidence,
+            'all_scores': self.all_scores,
+            'statistics': self.statistics,
+            'raw_result': [],
+            'cached': True
+        }
+
+
+class ReclassifyRun(db.Model):
+    """Checkpoint of a bulk reclassification run (see reclassify.py)."""
+    __tablename__ = "reclassify_runs"
+
+    id = db.Column(db.String(64), primary_key=True)
+    engine_id = db.Column(db.String)
+    last_document_id = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    changed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String, index=True, default='queued')
+    filename = db.Column(db.String)
+    file_ext = db.Column(db.String)
+    payload = db.Column(db.LargeBinary)
+    result = db.Column(db.JSON)
+    error = db.Column(db.String)
+    document_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'document_id': self.document_id,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+def s3_key_from_url(s3_url):
+    """Recover the object key from an s3_url of the form https://<bucket>.s3.amazonaws.com/<key>."""
+    return s3_url.split('.com/', 1)[-1] if s3_url else None
+
+
+def document_s3_key(s3_key, s3_url):
+    """
+    A document's object key. Rows saved before s3_key existed and not yet backfilled
+    by `flask init-db` have only s3_url, so the key is recovered from it.
+    """
+    return s3_key or s3_key_from_url(s3_url)
+
+
+def ensure_schema(batch_size=1000):
+    """
+    Add columns missing from tables that existed before the columns were added, and
+    backfill them.
+
+    Currently documents.s3_key, filled in from s3_url.
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns(Document.__tablename__)}
+    if 's3_key' not in columns:
+        db.session.execute(text(f"ALTER TABLE {Document.__tablename__} ADD COLUMN s3_key VARCHAR"))
+        db.session.commit()
+        logger.info("Added documents.s3_key")
+
+    backfilled = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Document.id, Document.s3_url)
+            .where(Document.id > last_id, Document.s3_key.is_(None), Document.s3_url.is_not(None))
+            .order_by(Document.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(update(Document), [{'id': row.id, 's3_key': s3_key_from_url(row.s3_url)} for row in rows])
+        db.session.commit()
+        backfilled += len(rows)
+        last_id = rows[-1].id
+    if backfilled:
+        logger.info(f"Backfilled s3_key of {backfilled} documents")
+
+
+def ensure_indexes():
+    """Create model indexes missing from tables that already existed before they were added."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+
+def engine_options(url):
+    """
+    Engine options for a database URL, for SQLALCHEMY_ENGINE_OPTIONS and the ASGI
+    app's async engine.
+
+    Server databases get a sized connection pool that checks connections before
+    use (managed Postgres hosts close idle ones) and replaces them periodically.
+    SQLite keeps SQLAlchemy's default pool; see configure_engine for its settings.
+    """
+    if make_url(url).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING
+    }
+
+
+def configure_engine(engine):
+    """
+    Apply per-connection settings to an engine (for an async engine, its sync_engine).
+
+    On SQLite every new connection switches to WAL, so readers no longer block the
+    writer or each other, relaxes fsyncs to one per checkpoint (synchronous=NORMAL
+    is durable against process crashes in WAL mode), and waits for the write lock
+    instead of failing with "database is locked" straight away.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
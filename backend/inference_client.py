@@ -0,0 +1,310 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.exceptions import ConnectionError, RequestException, Timeout
+
+import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting, and errors from a busy, loading or restarting endpoint
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(RequestException):
+    """Raised without contacting the endpoint while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `burst`; each request takes
+    one. One bucket is shared by every thread of the classifier, so the limit holds
+    for the whole process however many windows and documents are in flight. Buckets
+    are not shared between processes; DocumentClassifier gives each process its
+    share of INFERENCE_RATE_LIMIT (see INFERENCE_RATE_PROCESSES).
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        Initialize the bucket, full.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity. Defaults to one second's worth of tokens
+        """
+        self.rate = rate
+        self.capacity = max(1.0, float(burst or rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take a token, waiting for one to become available.
+
+        Args:
+            timeout: Longest time to wait in seconds; None waits indefinitely
+
+        Returns:
+            True if a token was taken, False if none became available within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """acquire() for coroutines: waits without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            await asyncio.sleep(wait)
+
+    def _take(self, deadline: Optional[float]) -> Optional[float]:
+        """Take a token if there is one: 0.0 if taken, else the wait for the next one, or None past the deadline."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            wait = (1.0 - self._tokens) / self.rate
+        if deadline is not None and now + wait > deadline:
+            return None
+        return wait
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failed attempts in a row the circuit opens and requests
+    fail immediately for `reset_timeout` seconds. Then a single trial request is let
+    through (half-open): success closes the circuit, failure opens it again, and a
+    neutral outcome (a 429, or an error that says nothing about the endpoint)
+    releases the trial slot so the next request probes again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return whether a request may be sent now; claims the trial slot when half-open."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Inference circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """End a trial request without a verdict on the endpoint's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Inference circuit opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class InferenceClient:
+    """
+    HTTP client for the inference endpoint with timeouts, retries, rate limiting and
+    a circuit breaker.
+
+    Every attempt has a connect/read timeout, so a stalled connection can't hold a
+    worker. Failed attempts (connection errors, timeouts, 429 and 5xx) are retried
+    with full-jitter exponential backoff; a Retry-After header, or the
+    `estimated_time` the Inference API sends while a model loads, replaces the
+    computed delay. All attempts and waits of one call fit in `retry_budget`
+    seconds: a retry that would overrun it is not attempted, which bounds tail
+    latency.
+    """
+
+    def __init__(self, session: requests.Session, url: str, timeout: Tuple[float, float] = (3.05, 30.0),
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 retry_budget: float = 60.0, rate_limiter: Optional[TokenBucket] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the client.
+
+        Args:
+            session: Session used for every request (keeps connections alive)
+            url: Endpoint URL
+            timeout: (connect, read) timeout per attempt in seconds
+            max_retries: Retries after the first attempt
+            backoff_base: Backoff cap of the first retry in seconds; doubles per retry
+            backoff_max: Largest backoff cap in seconds
+            retry_budget: Seconds one call may take including all retries and waits
+            rate_limiter: Optional bucket every attempt takes a token from
+            breaker: Optional circuit breaker consulted before and updated after each attempt
+        """
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+
+    def post(self, payload: Dict[str, Any]) -> requests.Response:
+        """
+        POST a JSON payload, retrying transient failures.
+
+        Returns:
+            The successful response
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.HTTPError: If the endpoint answers with a non-retryable error, or
+                with a retryable one after retries are exhausted
+            RequestException: If the endpoint can't be reached or keeps timing out
+        """
+        deadline = time.monotonic() + self.retry_budget
+        attempt = 0
+        while True:
+            self._check_circuit()
+            # Anything raised before the attempt has an outcome releases a claimed trial slot
+            try:
+                if self.rate_limiter is not None and not self.rate_limiter.acquire(deadline - time.monotonic()):
+                    raise RequestException("Rate limit wait exceeded the retry budget")
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (ConnectionError, Timeout) as e:
+                error, reason, retry_hint = e, 'timeout' if isinstance(e, Timeout) else 'connection', None
+            except BaseException:
+                self._release_trial()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return self._accept(response)
+                error, reason, retry_hint = self._retryable_status(response)
+
+            time.sleep(self._retry_delay(error, reason, retry_hint, attempt, deadline))
+            attempt += 1
+
+    def _check_circuit(self) -> None:
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("Inference endpoint circuit is open")
+
+    def _release_trial(self) -> None:
+        if self.breaker is not None:
+            self.breaker.release_trial()
+
+    def _accept(self, response: Any) -> Any:
+        """Return a final (non-retryable) response, raising for client errors."""
+        # Success, or a client error that retrying won't fix; neither says anything
+        # against the endpoint's health
+        if self.breaker is not None:
+            self.breaker.record_success()
+        response.raise_for_status()
+        return response
+
+    def _retryable_status(self, response: Any) -> Tuple[Exception, str, Optional[float]]:
+        """Error, metric reason and retry hint for a response with a retryable status."""
+        error = requests.HTTPError(f"{response.status_code} Error from inference endpoint", response=response)
+        return error, str(response.status_code), self._retry_hint(response)
+
+    def _retry_delay(self, error: Exception, reason: str, retry_hint: Optional[float],
+                     attempt: int, deadline: float) -> float:
+        """
+        Record a failed attempt and return how long to wait before the next one.
+
+        Raises:
+            error: If retries or the retry budget are exhausted
+        """
+        # Rate limiting is not a sign of an unhealthy endpoint, nor of a healthy one
+        if reason == '429':
+            self._release_trial()
+        elif self.breaker is not None:
+            self.breaker.record_failure()
+
+        delay = self._backoff(attempt) if retry_hint is None else retry_hint
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            logger.warning(f"Inference request failed after {attempt + 1} attempts: {str(error)}")
+            raise error
+        metrics.INFERENCE_RETRIES.inc(reason=reason)
+        logger.info(f"Inference request failed ({reason}), retrying in {delay:.2f}s")
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for a retry."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retry_hint(response: Any) -> Optional[float]:
+        """Delay requested by the endpoint via Retry-After or estimated_time, if any."""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+                except (TypeError, ValueError):
+                    pass
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if isinstance(body, dict) and isinstance(body.get('estimated_time'), (int, float)):
+            # Small jitter so workers waiting on a loading model don't return in lockstep
+            return body['estimated_time'] * random.uniform(1.0, 1.1)
+        return None
@@ -0,0 +1,276 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import db, Job
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class JobAlreadyFinished(Exception):
+    """Raised by record_success when another run of the same job recorded its result first."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Job {job_id} was already finished by another worker")
+        self.job_id = job_id
+
+
+def record_success(job: Job, result: Dict[str, Any]) -> None:
+    """
+    Mark a job succeeded in the current transaction, without committing.
+
+    Handlers call this before committing what the job wrote, so the job's result and
+    its document commit together; JobQueue records it for handlers that don't. The
+    update only applies to a job without a result yet, so a job run twice (a worker
+    that stalled past stale_after, or died after its commit) writes at most once.
+
+    Raises:
+        JobAlreadyFinished: If the job already has a result; the caller must roll back
+    """
+    finished = db.session.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status != 'succeeded', Job.document_id.is_(None))
+        .values(
+            status='succeeded',
+            result=result,
+            document_id=result.get('id'),
+            # The original is in S3 now; drop the spooled bytes
+            payload=None,
+            finished_at=datetime.utcnow()
+        )
+    )
+    if finished.rowcount != 1:
+        raise JobAlreadyFinished(job.id)
+
+
+class JobQueue:
+    """
+    Database-backed job queue with an in-process worker pool.
+
+    Jobs are rows in the jobs table, so no external broker is needed and every
+    server process sharing the database can enqueue and work off the same queue.
+    Workers claim a job with a conditional UPDATE, which keeps two processes from
+    running the same job.
+    """
+
+    def __init__(self, app, handler: Callable[[Job], Dict[str, Any]], num_workers: int = 2,
+                 poll_interval: float = 1.0, stale_after: float = 600.0, heartbeat_interval: float = 60.0,
+                 requeue_interval: float = 60.0):
+        """
+        Initialize the job queue.
+
+        Args:
+            app: Flask application whose context the workers run in
+            handler: Callable processing a claimed job and returning its JSON result
+            num_workers: Number of worker threads in this process
+            poll_interval: Seconds an idle worker waits before checking for new jobs
+            stale_after: Seconds without a heartbeat after which a running job is assumed
+                abandoned and requeued
+            heartbeat_interval: Seconds between refreshes of a running job's started_at
+            requeue_interval: Seconds between this process's checks for abandoned jobs
+        """
+        self.app = app
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self.requeue_interval = requeue_interval
+        self._next_requeue = 0.0
+        self._requeue_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker threads. Safe to call repeatedly and from several threads."""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.num_workers} job workers")
+
+    def enqueue(self, filename: str, file_ext: str, payload: bytes) -> Job:
+        """
+        Persist a new job. Must be called inside an application context.
+
+        Args:
+            filename: Sanitized original filename
+            file_ext: File extension
+            payload: Raw file bytes
+
+        Returns:
+            The queued job
+        """
+        job = Job(
+            id=uuid.uuid4().hex,
+            status='queued',
+            filename=filename,
+            file_ext=file_ext,
+            payload=payload
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._wakeup.set()
+        return job
+
+    def enqueue_many(self, entries: Iterable[Tuple[str, str, bytes]], batch_size: int = 50) -> List[str]:
+        """
+        Persist several jobs, committing them in batches. Must be called inside an
+        application context.
+
+        Args:
+            entries: (filename, file_ext, payload) tuples
+            batch_size: Number of jobs written per commit
+
+        Returns:
+            IDs of the queued jobs, in input order
+        """
+        job_ids = []
+        pending = 0
+        for filename, file_ext, payload in entries:
+            job = Job(
+                id=uuid.uuid4().hex,
+                status='queued',
+                filename=filename,
+                file_ext=file_ext,
+                payload=payload
+            )
+            db.session.add(job)
+            job_ids.append(job.id)
+            pending += 1
+            if pending >= batch_size:
+                db.session.commit()
+                self._wakeup.set()
+                pending = 0
+        if pending:
+            db.session.commit()
+        self._wakeup.set()
+        return job_ids
+
+    def _worker_loop(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    processed = self._process_next()
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+                processed = False
+
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self) -> Optional[Job]:
+        """Atomically move the oldest queued job to running."""
+        self._requeue_stale()
+
+        candidate = db.session.execute(
+            db.select(Job.id)
+            .where(Job.status == 'queued', Job.document_id.is_(None))
+            .order_by(Job.created_at)
+            .limit(1)
+        ).scalar()
+        if candidate is None:
+            return None
+
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.status == 'queued')
+            .values(status='running', started_at=datetime.utcnow())
+        )
+        db.session.commit()
+        if claimed.rowcount != 1:
+            # Another worker claimed it first
+            return None
+        return db.session.get(Job, candidate)
+
+    def _requeue_stale(self) -> None:
+        """
+        Requeue running jobs whose heartbeat stopped, at most once per requeue_interval
+        per process. Only writes when such a job exists, so idle polls don't take the
+        database write lock.
+        """
+        with self._requeue_lock:
+            now = time.monotonic()
+            if now < self._next_requeue:
+                return
+            self._next_requeue = now + self.requeue_interval
+
+        # Running jobs refresh started_at every heartbeat_interval; a job that stopped
+        # doing so lost its worker
+        stale_before = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        abandoned = (Job.status == 'running', Job.started_at < stale_before, Job.document_id.is_(None))
+        if db.session.execute(db.select(Job.id).where(*abandoned).limit(1)).scalar() is None:
+            return
+        requeued = db.session.execute(update(Job).where(*abandoned).values(status='queued'))
+        db.session.commit()
+        if requeued.rowcount:
+            logger.warning(f"Requeued {requeued.rowcount} jobs whose worker stopped")
+
+    def _process_next(self) -> bool:
+        """Run one job if available. Returns whether a job was claimed."""
+        job = self._claim()
+        if job is None:
+            return False
+
+        job_id = job.id
+        logger.info(f"Processing job {job_id} ({job.filename})")
+        stop_heartbeat = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(job_id, stop_heartbeat), name=f"job-heartbeat-{job_id[:8]}", daemon=True
+        ).start()
+        try:
+            result = self.handler(job)
+            if job.status != 'succeeded':
+                # The handler didn't record the result with its own writes
+                record_success(job, result)
+            db.session.commit()
+        except JobAlreadyFinished as e:
+            db.session.rollback()
+            logger.warning(str(e))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._record_failure(job_id, str(e))
+        finally:
+            stop_heartbeat.set()
+        return True
+
+    def _record_failure(self, job_id: str, error: str) -> None:
+        try:
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status != 'succeeded')
+                .values(status='failed', error=error, finished_at=datetime.utcnow())
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Failed to record result of job {job_id}: {str(e)}")
+
+    def _heartbeat(self, job_id: str, stop: threading.Event) -> None:
+        """Refresh a running job's started_at until stop is set, so _claim doesn't requeue it."""
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                with self.app.app_context():
+                    db.session.execute(
+                        update(Job)
+                        .where(Job.id == job_id, Job.status == 'running')
+                        .values(started_at=datetime.utcnow())
+                    )
+                    db.session.commit()
+            except SQLAlchemyError as e:
+                logger.warning(f"Heartbeat of job {job_id} failed: {str(e)}")
@@ -0,0 +1,175 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+import hashlib
+import logging
+import zlib
+
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ClassificationBackend(ABC):
+    """
+    Interface of a window-level classification engine.
+
+    Implementations return results in the same shape as the Hugging Face zero-shot
+    endpoint so DocumentClassifier can aggregate them without knowing the source.
+    This is the engine behind the local and cascade modes and the local fallback;
+    the remote model is DocumentClassifier's own inference client, not a backend.
+    """
+
+    name = "backend"
+
+    @abstractmethod
+    def query(self, text: str, labels: List[str]) -> Dict[str, Any]:
+        """
+        Classify a single window of preprocessed text.
+
+        Args:
+            text: Window text
+            labels: Candidate labels
+
+        Returns:
+            Dictionary with 'labels' and 'scores', sorted by descending score
+        """
+
+
+class HashedNgramClassifier(ClassificationBackend):
+    """
+    CPU-only linear classifier over hashed word n-grams.
+
+    Each window is turned into a sparse TF-IDF vector of hashed unigrams and bigrams
+    and scored against one L2-normalized centroid per category (a Rocchio classifier).
+    Scoring a window is a gather-and-dot over its non-zero features, so a whole
+    document classifies in milliseconds without any network calls.
+    """
+
+    name = "local"
+
+    def __init__(self, labels: List[str], centroids: np.ndarray, idf: np.ndarray, temperature: float = 10.0):
+        """
+        Initialize the classifier from trained parameters.
+
+        Args:
+            labels: Category of each centroid row
+            centroids: Array of shape (n_labels, n_features)
+            idf: Inverse document frequency per hashed feature
+            temperature: Softmax sharpness applied to cosine similarities
+        """
+        self.labels = list(labels)
+        self.centroids = centroids.astype(np.float32)
+        self.idf = idf.astype(np.float32)
+        self.temperature = temperature
+        self.n_features = idf.shape[0]
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self.fingerprint = hashlib.sha256(self.centroids.tobytes()).hexdigest()[:16]
+
+    @staticmethod
+    def _hashed_counts(text: str, n_features: int) -> Counter:
+        words = text.split()
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return Counter(zlib.crc32(gram.encode('utf-8')) % n_features for gram in grams)
+
+    def _vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (feature indices, L2-normalized TF-IDF values) for a text."""
+        counts = self._hashed_counts(text, self.n_features)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        values *= self.idf[indices]
+        norm = np.linalg.norm(values)
+        return indices, values / norm if norm > 0 else values
+
+    def query(self, text: str, labels: List[str]) -> Dict[str, Any]:
+        """
+        Classify a window against the requested labels.
+
+        Labels the model was not trained on receive a score of 0.
+        """
+        indices, values = self._vectorize(text)
+        similarities = self.centroids[:, indices] @ values
+
+        known = [self._label_index.get(label) for label in labels]
+        logits = np.array(
+            [similarities[i] * self.temperature if i is not None else -np.inf for i in known],
+            dtype=np.float64
+        )
+        if np.isfinite(logits).any():
+            logits -= logits[np.isfinite(logits)].max()
+            scores = np.exp(logits)
+            scores /= scores.sum()
+        else:
+            scores = np.full(len(labels), 1.0 / len(labels))
+
+        order = np.argsort(-scores, kind='stable')
+        return {
+            'labels': [labels[i] for i in order],
+            'scores': [float(scores[i]) for i in order]
+        }
+
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[str, str]], labels: List[str],
+              n_features: int = 2 ** 18, temperature: float = 10.0) -> "HashedNgramClassifier":
+        """
+        Fit centroids from labelled text samples.
+
+        Args:
+            samples: (preprocessed_text, label) pairs, typically one per window
+            labels: Category list; samples with other labels are ignored
+            n_features: Size of the hashed feature space
+            temperature: Softmax sharpness applied to cosine similarities
+
+        Returns:
+            Trained classifier
+        """
+        label_index = {label: i for i, label in enumerate(labels)}
+        counted = [
+            (cls._hashed_counts(text, n_features), label_index[label])
+            for text, label in samples if label in label_index
+        ]
+        if not counted:
+            raise ValueError("No training samples match the category list")
+
+        document_frequency = np.zeros(n_features, dtype=np.float64)
+        for counts, _ in counted:
+            document_frequency[list(counts.keys())] += 1
+        idf = np.log((1 + len(counted)) / (1 + document_frequency)) + 1
+
+        model = cls(labels, np.zeros((len(labels), n_features), dtype=np.float32), idf, temperature)
+        for counts, label_id in counted:
+            indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * model.idf[indices]
+            model.centroids[label_id, indices] += values / np.linalg.norm(values)
+
+        norms = np.linalg.norm(model.centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        model.centroids /= norms
+        model.fingerprint = hashlib.sha256(model.centroids.tobytes()).hexdigest()[:16]
+
+        logger.info(f"Trained local classifier on {len(counted)} samples, {n_features} features")
+        return model
+
+    def save(self, path: str) -> None:
+        """Write the model parameters to an .npz file."""
+        np.savez_compressed(
+            path,
+            labels=np.array(self.labels),
+            centroids=self.centroids,
+            idf=self.idf,
+            temperature=np.array(self.temperature)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        """Load a model written by save()."""
+        with np.load(path) as data:
+            return cls(
+                labels=[str(label) for label in data['labels']],
+                centroids=data['centroids'],
+                idf=data['idf'],
+                temperature=float(data['temperature'])
+            )
@@ -0,0 +1,277 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+import bisect
+import logging
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Latency buckets in seconds, from sub-millisecond stages up to slow remote calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for a label combination."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for a label combination."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics rendered together in the Prometheus text format.
+
+    Besides counters and histograms, collectors can be registered: callables that
+    return (labels, value) gauge samples at scrape time, for values that live
+    elsewhere (e.g. cache hit counters).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, documentation: str,
+                           collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+        """
+        Register a gauge computed at scrape time.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            collect: Callable returning (labels, value) samples
+        """
+        self._collectors.append((name, documentation, collect))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for name, documentation, collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                logger.warning(f"Metrics collector {name} failed: {str(e)}")
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'document_stage_seconds', 'Time spent per document in each processing stage', ['stage'])
+DOCUMENT_WINDOWS = registry.histogram(
+    'document_windows', 'Windows per classified document', ['engine'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+INFERENCE_REQUESTS = registry.counter(
+    'inference_requests_total', 'Remote inference API calls by outcome', ['outcome'])
+INFERENCE_RETRIES = registry.counter(
+    'inference_retries_total', 'Remote inference attempts retried, by failure reason', ['reason'])
+INFERENCE_FALLBACKS = registry.counter(
+    'inference_fallbacks_total', 'Documents classified by the local engine because the remote endpoint failed')
+INFERENCE_BATCH_WINDOWS = registry.histogram(
+    'inference_batch_windows', 'Windows sent per remote inference request', [],
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+DB_WRITE_BATCH_DOCUMENTS = registry.histogram(
+    'db_write_batch_documents', 'Documents written per batched commit', [],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint and status code', ['endpoint', 'method', 'status'])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_seconds', 'HTTP request latency by endpoint', ['endpoint'])
+
+
+class StageTimings:
+    """Thread-safe accumulator of per-stage time for one document or request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._totals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._totals)
+
+    def as_milliseconds(self) -> Dict[str, float]:
+        """Per-stage totals plus wall-clock 'total', in milliseconds."""
+        breakdown = {stage: round(seconds * 1000, 2) for stage, seconds in self.totals().items()}
+        breakdown['total'] = round((time.perf_counter() - self.started) * 1000, 2)
+        return breakdown
+
+
+# Timings of the document being processed; copied into executor threads with
+# contextvars.copy_context() so concurrent stages land in the same breakdown
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar('stage_timings', default=None)
+
+# Open stages of the current thread, used to charge each stage its exclusive time
+_local = threading.local()
+
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    """
+    Open a timing scope for one document or request.
+
+    Stages timed inside the scope (on this thread, or on executor threads running in
+    a copied context) accumulate into the yielded StageTimings. When the outermost
+    scope exits, each stage total is observed once into document_stage_seconds.
+    Nested scopes share the outer scope's timings.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        yield timings
+        return
+
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+        for stage, seconds in timings.totals().items():
+            STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Time a block as a processing stage.
+
+    Only exclusive time is charged: time spent in stages nested inside this one (for
+    example a generator pulling from another timed generator) goes to the inner
+    stage. Outside a collect_timings() scope the duration is observed directly.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    frame = [time.perf_counter(), 0.0]
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame[0]
+        if stack:
+            stack[-1][1] += elapsed
+        record_stage(stage, elapsed - frame[1])
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """
+    Charge time measured by the caller to a stage.
+
+    For coroutines, which can't use timed(): its per-thread stack of open stages
+    would interleave across tasks sharing the event loop thread.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def timed_iter(iterable: Iterable[T], stage: str) -> Iterator[T]:
+    """Yield from an iterable, charging the time spent producing each item to a stage."""
+    iterator = iter(iterable)
+    while True:
+        with timed(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
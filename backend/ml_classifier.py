@@ -1,37 +1,282 @@
 import requests
-import docx
-import PyPDF2
-from typing import Dict, Any, Optional, List, Tuple
-import io
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator
+from contextlib import contextmanager
+import codecs
 import logging
 import os
 from dotenv import load_dotenv
 from config import settings
+from inference_client import CircuitBreaker, CircuitOpenError, InferenceClient, TokenBucket
+from local_classifier import ClassificationBackend, HashedNgramClassifier
+from similarity import MinHasher, Signature
+import uploads
 import numpy as np
 from collections import Counter
 from requests.exceptions import RequestException, ConnectionError
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import re
 import string
+import tempfile
 import unicodedata
+import hashlib
+import contextvars
+import itertools
+import metrics
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+BACKEND_MODES = ('remote', 'local', 'cascade')
+FALLBACK_MODES = ('none', 'local')
+
+# Size of the blocks plain-text uploads are decoded in
+TEXT_BLOCK_SIZE = 64 * 1024
+
+# Characters that stay whitespace through every preprocessing step, so streamed
+# text can be cut at them without changing the resulting words
+_STABLE_WHITESPACE = ' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+
+
+# Preprocessing patterns, applied to the ASCII bytes left after normalization.
+# URLs and e-mail addresses never span whitespace, so they are only searched for
+# inside the tokens that contain one of their trigger strings
+_URL_PATTERN = re.compile(rb'http\S+|www\S+|https\S+')
+_EMAIL_PATTERN = re.compile(rb'\S+@\S+')
+_TRIGGERS = (b'http', b'www', b'@')
+_SPACE_RUN = re.compile(rb'  +')
+
+# Byte translation tables built from the original character classes: whitespace
+# becomes a space, and so do special characters other than word characters and
+# common punctuation
+_SPECIAL_CHARACTER = re.compile(r'[^\w\s.,!?;:()\-\'"]')
+_WHITESPACE_TABLE = bytes(32 if chr(c).isspace() else c for c in range(256))
+_SPECIAL_TABLE = bytes(32 if c < 128 and _SPECIAL_CHARACTER.match(chr(c)) else c for c in range(256))
+
+
+def _remove_urls_and_emails(data: bytes) -> bytes:
+    """
+    Remove URLs and e-mail addresses from space-separated ASCII text.
+
+    Locates trigger strings with plain substring search and applies the URL and
+    e-mail patterns only to the tokens around them.
+    """
+    next_hit = {trigger: data.find(trigger) for trigger in _TRIGGERS}
+    parts = []
+    copied = 0
+    while True:
+        hits = [position for position in next_hit.values() if position >= 0]
+        if not hits:
+            break
+        position = min(hits)
+        token_start = data.rfind(b' ', 0, position) + 1
+        token_end = data.find(b' ', position)
+        if token_end < 0:
+            token_end = len(data)
+        parts.append(data[copied:token_start])
+        parts.append(_EMAIL_PATTERN.sub(b'', _URL_PATTERN.sub(b'', data[token_start:token_end])))
+        copied = token_end
+        for trigger, hit in next_hit.items():
+            if 0 <= hit < token_end:
+                next_hit[trigger] = data.find(trigger, token_end)
+
+    if not parts:
+        return data
+    parts.append(data[copied:])
+    return b''.join(parts)
+
+
+def _window_spans(text: str, window_start: int, next_word: int, window_size: int,
+                  overlap: int) -> Tuple[List[Tuple[int, int, int]], int, int]:
+    """
+    Find the complete windows of a single-spaced text as character offsets.
+
+    Follows the rules of the word-by-word loop this replaces: a window is closed
+    when the next word would take it past window_size (counting a space after every
+    word), the next window starts with the trailing words that fit in overlap
+    characters, and the word that closed a window always joins the next one. The
+    last word that fits and the first overlap word are found with rfind/find on the
+    text instead of walking word lists.
+
+    Args:
+        text: Single-spaced text
+        window_start: Offset of the first word of the window in progress
+        next_word: Offset of the first word not yet in the window in progress
+        window_size: Maximum size of each window
+        overlap: Number of characters to overlap between windows
+
+    Returns:
+        Tuple of (closed windows as (begin, end, overlap_length), window_start and
+        next_word of the window still in progress)
+    """
+    length = len(text)
+    spans = []
+    while next_word < length:
+        if window_start == next_word:
+            # Empty window: emitted (empty) only if the next word cannot fit at all
+            word_end = text.find(' ', next_word)
+            if word_end < 0:
+                word_end = length
+            if word_end - next_word + 1 > window_size:
+                spans.append((window_start, window_start, 0))
+            next_word = word_end + 1
+            continue
+
+        limit = window_start + window_size - 1
+        if length <= limit:
+            break
+        # End of the last word that fits, i.e. the last space within the limit
+        window_end = max(text.rfind(' ', next_word - 1, limit + 1), next_word - 1)
+
+        overlap_begin = window_end + 1
+        if overlap > 0:
+            if window_end + 1 - overlap <= window_start:
+                overlap_begin = window_start
+            else:
+                space = text.find(' ', window_end - overlap, window_end)
+                if space >= 0:
+                    overlap_begin = space + 1
+        overlap_length = window_end + 1 - overlap_begin if overlap_begin <= window_end else 0
+        spans.append((window_start, window_end, overlap_length))
+
+        # The word that closed the window starts the next one, after the overlap
+        word_end = text.find(' ', window_end + 1)
+        if word_end < 0:
+            word_end = length
+        window_start = overlap_begin
+        next_word = word_end + 1
+    return spans, window_start, next_word
+
+
+@contextmanager
+def _spooled_pieces(pieces: Iterable[str]) -> Iterator[Iterator[str]]:
+    """
+    Read a stream of text pieces to the end and replay it.
+
+    Pieces are written one per line to a temporary file that stays in memory up to
+    UPLOAD_MEMORY_BUDGET characters and moves to disk beyond that, so reading a
+    document through before classifying it doesn't hold the whole text in memory.
+    Pieces must not contain newlines (preprocess_stream pieces are single-spaced).
+    """
+    with tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_MEMORY_BUDGET, mode='w+', encoding='utf-8',
+                                       newline='\n', dir=settings.UPLOAD_SPOOL_DIR or None) as spool:
+        for piece in pieces:
+            spool.write(piece)
+            spool.write('\n')
+        spool.seek(0)
+        yield (line[:-1] for line in spool)
+
+
 class DocumentClassifier:
-    def __init__(self, api_token: Optional[str] = None, model_name: str = "facebook/bart-large-mnli"):
+    def __init__(self, api_token: Optional[str] = None, model_name: str = "facebook/bart-large-mnli",
+                 max_concurrency: Optional[int] = None, result_cache: Optional[Any] = None,
+                 window_cache: Optional[Any] = None, backend: Optional[str] = None,
+                 local_engine: Optional[ClassificationBackend] = None, cascade_margin: Optional[float] = None,
+                 adaptive_sampling: Optional[bool] = None, api_url: Optional[str] = None,
+                 batch_size: Optional[int] = None, batch_max_bytes: Optional[int] = None,
+                 fallback: Optional[str] = None, similarity_index: Optional[Any] = None):
         """
         Initialize the document classifier with Hugging Face Inference API.
         
         Args:
             api_token: Hugging Face API token. If not provided, will use the one from settings
             model_name: Name of the Hugging Face model to use
+            max_concurrency: Maximum number of window requests in flight at once.
+                If not provided, will use CLASSIFIER_MAX_CONCURRENCY from settings
+            result_cache: Optional cache with get(key)/set(key, result, model_name), consulted
+                by process_document before classifying
+            window_cache: Optional cache with get(key)/set(key, result), consulted before
+                each window is sent to the API
+            backend: 'remote' (Hugging Face only), 'local' (local engine only) or 'cascade'
+                (local engine, falling back to remote when its top-label margin is low).
+                If not provided, will use CLASSIFIER_BACKEND from settings
+            local_engine: Engine used by the local and cascade modes. If not provided, a
+                HashedNgramClassifier is loaded from LOCAL_MODEL_PATH
+            cascade_margin: Minimum lead of the local top label over the runner-up for the
+                cascade to skip the remote model. If not provided, will use CASCADE_MARGIN
+            adaptive_sampling: Score remote windows from the middle outward and stop once the
+                leading category is clear (see ADAPTIVE_* settings). If not provided, will use
+                ADAPTIVE_SAMPLING from settings
+            api_url: Inference endpoint to post windows to. If not provided, will use
+                HUGGINGFACE_API_URL from settings, or the hosted Inference API URL of model_name
+            batch_size: Maximum windows sent in one API request; 1 sends each window on its
+                own. If not provided, will use INFERENCE_BATCH_SIZE from settings
+            batch_max_bytes: Maximum total window text per batched request, in bytes. If not
+                provided, will use INFERENCE_BATCH_MAX_BYTES from settings
+            fallback: 'local' classifies with the local engine when the remote endpoint fails
+                or its circuit is open; 'none' lets the error propagate. If not provided, will
+                use INFERENCE_FALLBACK from settings
+            similarity_index: Optional index with find(signature) returning the result of a
+                stored near-duplicate document, consulted by process_document before any
+                window is classified
         """
+        self.backend = backend or settings.CLASSIFIER_BACKEND
+        if self.backend not in BACKEND_MODES:
+            raise ValueError(f"Unknown classifier backend: {self.backend}. Supported backends are: {', '.join(BACKEND_MODES)}")
+
+        self.fallback = fallback or settings.INFERENCE_FALLBACK
+        if self.fallback not in FALLBACK_MODES:
+            raise ValueError(f"Unknown inference fallback: {self.fallback}. Supported fallbacks are: {', '.join(FALLBACK_MODES)}")
+
+        self.local_engine = local_engine
+        if self.local_engine is None and (self.backend != 'remote' or self.fallback == 'local'):
+            self.local_engine = HashedNgramClassifier.load(settings.LOCAL_MODEL_PATH)
+        self.cascade_margin = settings.CASCADE_MARGIN if cascade_margin is None else cascade_margin
+
+        self.adaptive_sampling = settings.ADAPTIVE_SAMPLING if adaptive_sampling is None else adaptive_sampling
+        self.adaptive_margin = settings.ADAPTIVE_MARGIN
+        self.adaptive_min_windows = max(1, settings.ADAPTIVE_MIN_WINDOWS)
+        self.adaptive_max_windows = settings.ADAPTIVE_MAX_WINDOWS
+
         self.api_token = api_token or settings.HUGGINGFACE_API_TOKEN
-        if not self.api_token:
+        if not self.api_token and self.backend != 'local':
             raise ValueError("Hugging Face API token is required. Please provide it or set HUGGINGFACE_API_TOKEN in your .env file.")
         
-        self.api_url = f"https://api-inference.huggingface.co/models/{model_name}"
+        self.api_url = api_url or settings.HUGGINGFACE_API_URL or f"https://api-inference.huggingface.co/models/{model_name}"
         self.headers = {"Authorization": f"Bearer {self.api_token}"}
+        self.model_name = model_name
+
+        # Keep-alive session shared by all window requests. The connection pool is
+        # sized to the concurrency limit so every in-flight request reuses a socket.
+        self.max_concurrency = max(1, max_concurrency or settings.CLASSIFIER_MAX_CONCURRENCY)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Timeouts, retries, rate limiting and circuit breaking for every API call
+        rate_limiter = None
+        if settings.INFERENCE_RATE_LIMIT > 0:
+            # The bucket is per process; each of the processes sharing the limit gets an equal share
+            processes = max(1, settings.INFERENCE_RATE_PROCESSES)
+            rate_limiter = TokenBucket(settings.INFERENCE_RATE_LIMIT / processes,
+                                       settings.INFERENCE_RATE_BURST / processes or None)
+        self.client = InferenceClient(
+            self.session,
+            self.api_url,
+            timeout=(settings.INFERENCE_CONNECT_TIMEOUT, settings.INFERENCE_READ_TIMEOUT),
+            max_retries=settings.INFERENCE_MAX_RETRIES,
+            backoff_base=settings.INFERENCE_BACKOFF_BASE,
+            backoff_max=settings.INFERENCE_BACKOFF_MAX,
+            retry_budget=settings.INFERENCE_RETRY_BUDGET,
+            rate_limiter=rate_limiter,
+            breaker=CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_TIMEOUT)
+        )
+
+        self.batch_size = max(1, batch_size or settings.INFERENCE_BATCH_SIZE)
+        self.batch_max_bytes = batch_max_bytes or settings.INFERENCE_BATCH_MAX_BYTES
+
+        self.result_cache = result_cache
+        self.window_cache = window_cache
+        self.similarity_index = similarity_index
+
+        # Shared across documents so the in-flight bound holds for concurrent uploads too
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix='classifier'
+        )
         
         # Predefined categories
         self._categories = [
@@ -42,14 +287,27 @@ class DocumentClassifier:
             "General Article",
             "Other"
         ]
-        logger.info(f"Initialized DocumentClassifier with model: {model_name}")
+        logger.info(f"Initialized DocumentClassifier with model: {model_name}, backend: {self.backend}")
 
     @property
     def categories(self) -> List[str]:
         """Get the list of available categories."""
         return self._categories.copy()
 
-    def extract_text_from_file(self, file_content: bytes, file_type: str) -> str:
+    @property
+    def engine_id(self) -> str:
+        """Identify the engine configuration producing results, for cache keys."""
+        remote_id = self.model_name
+        if self.adaptive_sampling:
+            remote_id += f":adaptive:{self.adaptive_margin}:{self.adaptive_min_windows}:{self.adaptive_max_windows}"
+        if self.backend == 'remote':
+            return remote_id
+        local_id = f"{self.local_engine.name}:{getattr(self.local_engine, 'fingerprint', '')}"
+        if self.backend == 'local':
+            return local_id
+        return f"cascade:{local_id}:{remote_id}:{self.cascade_margin}"
+
+    def extract_text_from_file(self, file_content: uploads.UploadContent, file_type: str) -> str:
         """
         Extract text content from different file types.
         
@@ -60,37 +318,64 @@ class DocumentClassifier:
         Returns:
             Extracted text as string
             
+        Raises:
+            ValueError: If file type is not supported
+            IOError: If file content cannot be read
+        """
+        return ''.join(self.iter_text_from_file(file_content, file_type))
+
+    def iter_text_from_file(self, file_content: uploads.UploadContent, file_type: str) -> Iterator[str]:
+        """
+        Extract text incrementally: page by page for PDF, paragraph by paragraph
+        for DOCX and in fixed-size blocks for TXT.
+
+        Parsers read the content through a file object, so a memory-mapped upload
+        is parsed in place rather than copied into memory.
+        
+        Args:
+            file_content: Raw bytes of the file, or a memory-mapped file (see uploads.py)
+            file_type: File extension (e.g., '.txt', '.pdf', '.docx')
+            
+        Yields:
+            Consecutive pieces of the extracted text
+            
         Raises:
             ValueError: If file type is not supported
             IOError: If file content cannot be read
         """
         try:
             if file_type.lower() == '.txt':
+                decoder = codecs.getincrementaldecoder('utf-8')()
                 try:
-                    return file_content.decode('utf-8')
+                    with uploads.open_content(file_content) as stream:
+                        for block in iter(lambda: stream.read(TEXT_BLOCK_SIZE), b''):
+                            yield decoder.decode(block)
+                    yield decoder.decode(b'', final=True)
                 except UnicodeDecodeError:
                     logger.error("Failed to decode text file as UTF-8")
                     raise IOError("Failed to read text file. Please ensure it is UTF-8 encoded.")
             
             elif file_type.lower() == '.docx':
+                # Parsers are imported on first use; they are the slowest imports at startup
+                import docx
+
                 try:
-                    doc_stream = io.BytesIO(file_content)
-                    doc = docx.Document(doc_stream)
-                    return ' '.join([paragraph.text for paragraph in doc.paragraphs])
+                    doc = docx.Document(uploads.open_content(file_content))
                 except Exception as e:
                     logger.error(f"Error reading DOCX file: {str(e)}")
                     raise IOError("Failed to read DOCX file. Please ensure it is a valid Word document.")
+                for i, paragraph in enumerate(doc.paragraphs):
+                    yield paragraph.text if i == 0 else ' ' + paragraph.text
             
             elif file_type.lower() == '.pdf':
+                import PyPDF2
+
                 try:
-                    pdf_stream = io.BytesIO(file_content)
-                    pdf_reader = PyPDF2.PdfReader(pdf_stream)
+                    pdf_reader = PyPDF2.PdfReader(uploads.open_content(file_content))
                     if len(pdf_reader.pages) == 0:
                         raise ValueError("PDF file is empty")
-                    text = ''
                     for page in pdf_reader.pages:
-                        text += page.extract_text() + ' '
-                    return text
+                        yield page.extract_text() + ' '
                 except Exception as e:
                     logger.error(f"Error reading PDF file: {str(e)}")
                     raise IOError("Failed to read PDF file. Please ensure it is a valid PDF document.")
@@ -113,47 +398,49 @@ class DocumentClassifier:
         Returns:
             List of tuples containing (window_text, start_pos, end_pos)
         """
-        words = text.split()
-        windows = []
-        current_window = []
-        current_length = 0
-        start_pos = 0
-        
-        for i, word in enumerate(words):
-            word_length = len(word) + 1  # +1 for space
-            if current_length + word_length > window_size:
-                # Add current window to windows list with position info
-                window_text = ' '.join(current_window)
-                end_pos = start_pos + len(window_text)
-                windows.append((window_text, start_pos, end_pos))
-                
-                # Calculate overlap
-                overlap_words = []
-                overlap_length = 0
-                overlap_start = len(current_window) - 1
-                
-                while overlap_start >= 0 and overlap_length < overlap:
-                    word = current_window[overlap_start]
-                    if overlap_length + len(word) + 1 > overlap:
-                        break
-                    overlap_words.insert(0, word)
-                    overlap_length += len(word) + 1
-                    overlap_start -= 1
-                
-                current_window = overlap_words
-                current_length = overlap_length
-                start_pos = end_pos - overlap_length
-            
-            current_window.append(word)
-            current_length += word_length
+        return list(self.iter_sliding_windows([text], window_size, overlap))
+
+    def iter_sliding_windows(self, pieces: Iterable[str], window_size: int = 1024,
+                             overlap: int = 200) -> Iterator[Tuple[str, int, int]]:
+        """
+        Split a stream of text pieces into overlapping windows as the pieces arrive.
         
-        # Add the last window if it's not empty
-        if current_window:
-            window_text = ' '.join(current_window)
-            end_pos = start_pos + len(window_text)
-            windows.append((window_text, start_pos, end_pos))
+        Pieces must be cut at whitespace (as produced by preprocess_stream); each
+        window is yielded as soon as it is complete. Windows are located as offsets
+        into the single-spaced text and sliced out only when yielded.
         
-        return windows
+        Args:
+            pieces: Consecutive pieces of text
+            window_size: Maximum size of each window
+            overlap: Number of characters to overlap between windows
+            
+        Yields:
+            Tuples containing (window_text, start_pos, end_pos)
+        """
+        # Single-spaced text from the start of the window in progress onward
+        buffer = ''
+        next_word = 0
+        start_pos = 0
+
+        for piece in pieces:
+            # preprocess_stream pieces are already single-spaced; anything else is normalized
+            if not piece.isprintable() or '  ' in piece or piece[:1] == ' ' or piece[-1:] == ' ':
+                piece = ' '.join(piece.split())
+            if not piece:
+                continue
+            buffer = f"{buffer} {piece}" if buffer else piece
+
+            spans, window_start, next_word = _window_spans(buffer, 0, next_word, window_size, overlap)
+            for begin, end, overlap_length in spans:
+                end_pos = start_pos + (end - begin)
+                yield (buffer[begin:end], start_pos, end_pos)
+                start_pos = end_pos - overlap_length
+            buffer = buffer[window_start:]
+            next_word -= window_start
+
+        # Emit the last window if it's not empty
+        if buffer:
+            yield (buffer, start_pos, start_pos + len(buffer))
 
     def query_api(self, text: str) -> Dict[str, Any]:
         """
@@ -170,58 +457,21 @@ class DocumentClassifier:
             ValueError: If response is invalid
         """
         try:
-            if not text.strip():
-                raise ValueError("Empty text provided for classification")
-
-            payload = {
-                "inputs": text,
-                "parameters": {
-                    "candidate_labels": self._categories
-                }
-            }
+            payload = self._api_payload(text)
             
             # Log the request (without sensitive data)
             logger.info(f"Making request to Hugging Face API for text of length {len(text)}")
             
-            response = requests.post(
-                self.api_url, 
-                headers=self.headers, 
-                json=payload,
-            )
+            response = self.client.post(payload)
             
             # Log the response status
             logger.info(f"Received response with status code: {response.status_code}")
             
             response.raise_for_status()
+            return self._parse_api_response(response)
             
-            try:
-                result = response.json()
-                # Log the response structure (without sensitive data)
-                logger.debug(f"Response type: {type(result)}, Structure: {list(result.keys()) if isinstance(result, dict) else 'list'}")
-                
-                # Handle different response formats
-                if isinstance(result, dict):
-                    if 'sequence' in result and 'labels' in result and 'scores' in result:
-                        # This is the expected format from BART-large-mnli
-                        return {
-                            'labels': result['labels'],
-                            'scores': result['scores']
-                        }
-                    elif 'labels' in result and 'scores' in result:
-                        # Direct format with labels and scores
-                        return result
-                elif isinstance(result, list) and len(result) > 0:
-                    # List format (sometimes returned by the API)
-                    return result[0]
-                
-                logger.error(f"Unexpected response format: {result}")
-                raise ValueError("Invalid response format from Hugging Face API")
-                
-            except ValueError as e:
-                logger.error(f"Failed to parse JSON response: {str(e)}")
-                logger.error(f"Raw response: {response.text[:200]}...")  # Log first 200 chars of response
-                raise ValueError("Failed to parse API response")
-            
+        except CircuitOpenError:
+            raise
         except ( ConnectionError, requests.exceptions.HTTPError) as e:
             logger.error(f"Hugging Face API error: {str(e)}")
             raise RequestException("Issue with Hugging Face API. Please try again.")
@@ -229,70 +479,382 @@ class DocumentClassifier:
             logger.error(f"Unexpected error while querying Hugging Face API: {str(e)}")
             raise RequestException("Issue with Hugging Face API. Please try again.")
 
-    def aggregate_results(self, window_results: List[Tuple[Dict[str, Any], int, int]]) -> Dict[str, Any]:
+    def _api_payload(self, text: str) -> Dict[str, Any]:
+        """Request body classifying one text against the categories."""
+        if not text.strip():
+            raise ValueError("Empty text provided for classification")
+        return {
+            "inputs": text,
+            "parameters": {
+                "candidate_labels": self._categories
+            }
+        }
+
+    @staticmethod
+    def _parse_api_response(response: Any) -> Dict[str, Any]:
+        """Labels and scores from a single-text API response."""
+        try:
+            result = response.json()
+            # Log the response structure (without sensitive data)
+            logger.debug(f"Response type: {type(result)}, Structure: {list(result.keys()) if isinstance(result, dict) else 'list'}")
+            
+            # Handle different response formats
+            if isinstance(result, dict):
+                if 'sequence' in result and 'labels' in result and 'scores' in result:
+                    # This is the expected format from BART-large-mnli
+                    return {
+                        'labels': result['labels'],
+                        'scores': result['scores']
+                    }
+                elif 'labels' in result and 'scores' in result:
+                    # Direct format with labels and scores
+                    return result
+            elif isinstance(result, list) and len(result) > 0:
+                # List format (sometimes returned by the API)
+                return result[0]
+            
+            logger.error(f"Unexpected response format: {result}")
+            raise ValueError("Invalid response format from Hugging Face API")
+            
+        except ValueError as e:
+            logger.error(f"Failed to parse JSON response: {str(e)}")
+            logger.error(f"Raw response: {response.text[:200]}...")  # Log first 200 chars of response
+            raise ValueError("Failed to parse API response")
+
+    def query_api_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
         """
-        Aggregate results from multiple windows using a weighted voting system.
+        Query the Hugging Face Inference API for several texts in one request.
+        
+        The texts are sent as a list of inputs; the zero-shot pipeline answers with
+        one result per input, in order.
         
         Args:
-            window_results: List of tuples containing (result, start_pos, end_pos)
+            texts: Texts to classify
             
         Returns:
-            Aggregated classification result with detailed statistics
+            One result dictionary (labels and scores) per text
+            
+        Raises:
+            RequestException: If API request fails
+            ValueError: If response is invalid
         """
-        # Initialize score tracking
-        category_scores = {category: [] for category in self._categories}
-        category_weights = {category: [] for category in self._categories}
+        payload = self._api_batch_payload(texts)
+        logger.info(f"Making batched request to Hugging Face API for {len(texts)} texts")
+
+        try:
+            response = self.client.post(payload)
+            logger.info(f"Received response with status code: {response.status_code}")
+        except (ConnectionError, requests.exceptions.HTTPError) as e:
+            logger.error(f"Hugging Face API error: {str(e)}")
+            raise RequestException("Issue with Hugging Face API. Please try again.")
+        return self._parse_api_batch_response(response, len(texts))
+
+    def _api_batch_payload(self, texts: List[str]) -> Dict[str, Any]:
+        """Request body classifying several texts in one request."""
+        if not texts or not all(text.strip() for text in texts):
+            raise ValueError("Empty text provided for classification")
+        return {
+            "inputs": texts,
+            "parameters": {
+                "candidate_labels": self._categories
+            }
+        }
+
+    @staticmethod
+    def _parse_api_batch_response(response: Any, count: int) -> List[Dict[str, Any]]:
+        """One result per text from a batched API response, in order."""
+        try:
+            result = response.json()
+        except ValueError:
+            logger.error(f"Raw response: {response.text[:200]}...")
+            raise ValueError("Failed to parse API response")
+
+        if not isinstance(result, list) or len(result) != count:
+            raise ValueError(f"Expected {count} results from a batched request")
+        results = []
+        for item in result:
+            if not isinstance(item, dict) or 'labels' not in item or 'scores' not in item:
+                raise ValueError("Invalid response format from Hugging Face API")
+            results.append({'labels': item['labels'], 'scores': item['scores']})
+        return results
+
+    def query_windows(self, windows: Iterable[Tuple[str, int, int]]) -> List[Tuple[Dict[str, Any], int, int]]:
+        """
+        Classify windows concurrently, bounded by max_concurrency.
         
-        # Process each window's results
-        for result, start_pos, end_pos in window_results:
-            window_length = end_pos - start_pos
+        Windows are consumed lazily, so a streamed document is classified while it is
+        still being extracted. At most twice max_concurrency windows are held at once.
+        
+        Args:
+            windows: Iterable of tuples containing (window_text, start_pos, end_pos)
             
-            # Calculate window weight based on length and position
-            # Windows in the middle of the document get higher weights
-            position_weight = 1.0 - abs(start_pos - (window_results[-1][2] / 2)) / (window_results[-1][2] / 2)
-            length_weight = window_length / max(r[2] - r[1] for r in window_results)
-            window_weight = (position_weight + length_weight) / 2
+        Returns:
+            List of tuples containing (result, start_pos, end_pos) in window order
+        """
+        if self.batch_size > 1:
+            return self._query_windows_batched(windows)
+
+        if self.max_concurrency == 1:
+            return [
+                (self._query_window(window_text), start_pos, end_pos)
+                for window_text, start_pos, end_pos in windows
+            ]
+
+        window_results = []
+        pending = deque()
+        try:
+            for window_text, start_pos, end_pos in windows:
+                pending.append((self._submit(self._query_window, window_text), start_pos, end_pos))
+                if len(pending) >= 2 * self.max_concurrency:
+                    future, start, end = pending.popleft()
+                    window_results.append((future.result(), start, end))
+            while pending:
+                future, start, end = pending.popleft()
+                window_results.append((future.result(), start, end))
+        except BaseException:
+            for future, _, _ in pending:
+                future.cancel()
+            raise
+
+        return window_results
+
+    def _query_windows_batched(self, windows: Iterable[Tuple[str, int, int]]) -> List[Tuple[Dict[str, Any], int, int]]:
+        """query_windows for batch_size > 1: each task sends one batch of windows."""
+        window_results = []
+        pending = deque()
+        try:
+            for batch in self._batches(windows):
+                pending.append((self._submit(self._query_batch, [text for text, _, _ in batch]), batch))
+                if len(pending) >= 2 * self.max_concurrency:
+                    future, batch = pending.popleft()
+                    window_results.extend((result, start, end) for result, (_, start, end) in zip(future.result(), batch))
+            while pending:
+                future, batch = pending.popleft()
+                window_results.extend((result, start, end) for result, (_, start, end) in zip(future.result(), batch))
+        except BaseException:
+            for future, _ in pending:
+                future.cancel()
+            raise
+
+        return window_results
+
+    def _batches(self, windows: Iterable[Tuple[str, int, int]]) -> Iterator[List[Tuple[str, int, int]]]:
+        """Group consecutive windows into batches within batch_size and batch_max_bytes."""
+        batch = []
+        batch_bytes = 0
+        for window in windows:
+            size = len(window[0].encode('utf-8'))
+            if batch and (len(batch) >= self.batch_size or batch_bytes + size > self.batch_max_bytes):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(window)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def query_windows_adaptive(self, windows: Iterable[Tuple[str, int, int]]) -> Tuple[List[Tuple[Dict[str, Any], int, int]], int, int]:
+        """
+        Classify windows in priority order until the winning category is clear.
+        
+        Windows are scored from the middle of the document outward, matching the
+        position weighting in aggregate_results, in rounds of max_concurrency. After
+        each round the scored windows are aggregated; scoring stops once the weighted
+        median of the best category leads the runner-up by adaptive_margin, or once
+        adaptive_max_windows have been scored. The windows are materialized first,
+        since their order depends on the document length.
+        
+        Args:
+            windows: Iterable of tuples containing (window_text, start_pos, end_pos)
             
-            # Store scores and weights for each category
-            for label, score in zip(result['labels'], result['scores']):
-                category_scores[label].append(score)
-                category_weights[label].append(window_weight)
+        Returns:
+            Tuple of (scored window results in document order, total number of windows,
+            document length)
+        """
+        windows = list(windows)
+        if not windows:
+            return [], 0, 0
+
+        document_length = windows[-1][2]
+        scored = {}
+        for round_indices in self._adaptive_rounds(windows):
+            round_windows = [windows[i] for i in round_indices]
+            if self.batch_size > 1:
+                # Rounds keep their size so the stopping point doesn't depend on batching
+                futures = [self._submit(self._query_batch, [text for text, _, _ in batch])
+                           for batch in self._batches(round_windows)]
+                round_results = [result for future in futures for result in future.result()]
+            else:
+                futures = [self._submit(self._query_window, text) for text, _, _ in round_windows]
+                round_results = [future.result() for future in futures]
+            scored.update(zip(round_indices, round_results))
+            if self._adaptive_done(scored, windows):
+                break
+
+        window_results = [(scored[i], windows[i][1], windows[i][2]) for i in sorted(scored)]
+        return window_results, len(windows), document_length
+
+    def _adaptive_rounds(self, windows: List[Tuple[str, int, int]]) -> Iterator[List[int]]:
+        """Window indices to score per adaptive round: middle outward, max_concurrency at a time, within the budget."""
+        middle = windows[-1][2] / 2
+        order = sorted(range(len(windows)), key=lambda i: abs(windows[i][1] - middle))
+        budget = len(windows)
+        if self.adaptive_max_windows > 0:
+            budget = min(budget, self.adaptive_max_windows)
+        for round_start in range(0, budget, self.max_concurrency):
+            yield order[round_start:min(round_start + self.max_concurrency, budget)]
+
+    def _adaptive_done(self, scored: Dict[int, Dict[str, Any]], windows: List[Tuple[str, int, int]]) -> bool:
+        """Whether the windows scored so far settle the winning category."""
+        if len(scored) < self.adaptive_min_windows or len(scored) == len(windows):
+            return False
+        partial = self.aggregate_results(
+            [(scored[i], windows[i][1], windows[i][2]) for i in sorted(scored)],
+            document_length=windows[-1][2]
+        )
+        lead = self._top_margin(partial['all_scores'])
+        if lead >= self.adaptive_margin:
+            logger.info(f"Stopping after {len(scored)}/{len(windows)} windows, lead {lead:.3f}")
+            return True
+        return False
+
+    @staticmethod
+    def _top_margin(all_scores: Dict[str, float]) -> float:
+        """Lead of the best category's score over the runner-up."""
+        ranked = sorted(all_scores.values(), reverse=True)
+        return ranked[0] - ranked[1] if len(ranked) > 1 else ranked[0]
+
+    def _submit(self, fn, *args):
+        """Run fn on the executor in a copy of the caller's context, so stage timings follow it."""
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def _query_window(self, text: str) -> Dict[str, Any]:
+        """Query the API for one window, going through the window cache if configured."""
+        if self.window_cache is None:
+            return self._call_api(text)
+
+        key = self.window_cache.make_key(text, self._categories, self.model_name)
+        result = self.window_cache.get(key)
+        if result is None:
+            result = self._call_api(text)
+            self.window_cache.set(key, result)
+        return result
+
+    def _query_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Query the API for a batch of windows; cached windows are left out of the request."""
+        if self.window_cache is None:
+            return self._call_api_batch(texts)
+
+        keys = [self.window_cache.make_key(text, self._categories, self.model_name) for text in texts]
+        results = [self.window_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            fetched = self._call_api_batch([texts[i] for i in missing])
+            for i, result in zip(missing, fetched):
+                results[i] = result
+                self.window_cache.set(keys[i], result)
+        return results
+
+    def _call_api_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Call query_api_batch, recording its latency and outcome.
+
+        If the batched request fails (e.g. the endpoint does not accept list inputs or
+        rejects the payload size), the windows are retried one request each.
+        """
+        if len(texts) == 1:
+            return [self._call_api(texts[0])]
+
+        with metrics.timed('query_api'):
+            try:
+                results = self.query_api_batch(texts)
+            except CircuitOpenError:
+                metrics.INFERENCE_REQUESTS.inc(outcome='circuit_open')
+                raise
+            except (RequestException, ValueError) as e:
+                metrics.INFERENCE_REQUESTS.inc(outcome='error')
+                logger.warning(f"Batched request of {len(texts)} windows failed, retrying one by one: {str(e)}")
+                results = None
+        if results is None:
+            return [self._call_api(text) for text in texts]
+        metrics.INFERENCE_REQUESTS.inc(outcome='success')
+        metrics.INFERENCE_BATCH_WINDOWS.observe(len(texts))
+        return results
+
+    def _call_api(self, text: str) -> Dict[str, Any]:
+        """Call query_api, recording its latency and outcome."""
+        with metrics.timed('query_api'):
+            try:
+                result = self.query_api(text)
+            except CircuitOpenError:
+                metrics.INFERENCE_REQUESTS.inc(outcome='circuit_open')
+                raise
+            except Exception:
+                metrics.INFERENCE_REQUESTS.inc(outcome='error')
+                raise
+        metrics.INFERENCE_REQUESTS.inc(outcome='success')
+        metrics.INFERENCE_BATCH_WINDOWS.observe(1)
+        return result
+
+    def aggregate_results(self, window_results: List[Tuple[Dict[str, Any], int, int]],
+                          document_length: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Aggregate results from multiple windows using a weighted voting system.
+        
+        Scores are gathered into a categories x windows matrix with one weight per
+        window, and every statistic is computed for all categories in one batched pass.
         
-        # Calculate weighted statistics for each category
+        Args:
+            window_results: List of tuples containing (result, start_pos, end_pos)
+            document_length: End position of the document, used for position weights.
+                Defaults to the end of the last window; pass it when only a subset of
+                windows was scored
+            
+        Returns:
+            Aggregated classification result with detailed statistics
+        """
+        num_categories = len(self._categories)
+        category_index = {category: i for i, category in enumerate(self._categories)}
+
+        # Score matrix: one row per category, one column per window; NaN where a
+        # window did not score a category
+        scores = np.full((num_categories, len(window_results)), np.nan)
+        for column, (result, _, _) in enumerate(window_results):
+            for label, score in zip(result['labels'], result['scores']):
+                scores[category_index[label], column] = score
+
         category_stats = {}
+        if window_results:
+            if document_length is None:
+                document_length = window_results[-1][2]
+            starts = np.array([r[1] for r in window_results], dtype=np.float64)
+            ends = np.array([r[2] for r in window_results], dtype=np.float64)
+
+            # Calculate window weight based on length and position
+            # Windows in the middle of the document get higher weights
+            window_lengths = ends - starts
+            position_weights = 1.0 - np.abs(starts - (document_length / 2)) / (document_length / 2)
+            length_weights = window_lengths / window_lengths.max()
+            weights = (position_weights + length_weights) / 2
+
+            present = ~np.isnan(scores)
+            complete = present.all(axis=1)
+
+            # Categories scored by every window share the weight vector: one batched pass
+            if complete.any():
+                rows = np.flatnonzero(complete)
+                for row, stats in zip(rows, self._weighted_stats(scores[rows], weights)):
+                    category_stats[self._categories[row]] = stats
+
+            # Categories missing from some windows are computed over their own columns
+            for row in np.flatnonzero(~complete & present.any(axis=1)):
+                mask = present[row]
+                category_stats[self._categories[row]] = self._weighted_stats(
+                    scores[row:row + 1, mask], weights[mask]
+                )[0]
+
         for category in self._categories:
-            scores = np.array(category_scores[category])
-            weights = np.array(category_weights[category])
-            
-            if len(scores) > 0:
-                # Weighted mean
-                weighted_mean = np.average(scores, weights=weights)
-                
-                # Weighted median
-                sorted_idx = np.argsort(scores)
-                sorted_weights = weights[sorted_idx]
-                cumsum = np.cumsum(sorted_weights)
-                median_idx = np.searchsorted(cumsum, cumsum[-1] / 2)
-                weighted_median = scores[sorted_idx[median_idx]]
-                
-                # Confidence interval
-                q25_idx = np.searchsorted(cumsum, cumsum[-1] * 0.25)
-                q75_idx = np.searchsorted(cumsum, cumsum[-1] * 0.75)
-                q25 = scores[sorted_idx[q25_idx]]
-                q75 = scores[sorted_idx[q75_idx]]
-                
-                category_stats[category] = {
-                    'weighted_mean': weighted_mean,
-                    'weighted_median': weighted_median,
-                    'confidence_interval': {
-                        'lower': q25,
-                        'upper': q75,
-                        'range': q75 - q25
-                    },
-                    'num_windows': len(scores),
-                    'std_dev': np.std(scores) if len(scores) > 1 else 0
-                }
-            else:
+            if category not in category_stats:
                 category_stats[category] = {
                     'weighted_mean': 0,
                     'weighted_median': 0,
@@ -300,6 +862,7 @@ class DocumentClassifier:
                     'num_windows': 0,
                     'std_dev': 0
                 }
+        category_stats = {category: category_stats[category] for category in self._categories}
         
         # Find the best category using weighted median
         best_category = max(
@@ -315,12 +878,71 @@ class DocumentClassifier:
             'raw_result': window_results
         }
 
-    def preprocess_text(self, text: str) -> str:
+    @staticmethod
+    def _weighted_stats(scores: np.ndarray, weights: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Compute weighted statistics for each row of a score matrix.
+        
+        Args:
+            scores: Array of shape (categories, windows) without missing values
+            weights: Weight of each window
+            
+        Returns:
+            One statistics dictionary per row
+        """
+        num_windows = scores.shape[1]
+        rows = np.arange(scores.shape[0])
+
+        # Weighted mean; reductions run along the contiguous window axis so the
+        # summation order matches np.average on a single category
+        scores = np.ascontiguousarray(scores)
+        weighted_means = (scores * weights).sum(axis=1) / weights.sum()
+
+        # Weighted median and quartiles from the weight CDF of each sorted row
+        sorted_idx = np.argsort(scores, axis=1)
+        cumsum = np.cumsum(weights[sorted_idx], axis=1)
+        total = cumsum[:, -1:]
+        sorted_scores = np.take_along_axis(scores, sorted_idx, axis=1)
+
+        def quantile(fraction):
+            # Equivalent to np.searchsorted(cumsum, total * fraction) on each row
+            position = (cumsum < total * fraction).sum(axis=1)
+            return sorted_scores[rows, position]
+
+        weighted_medians = quantile(0.5)
+        q25 = quantile(0.25)
+        q75 = quantile(0.75)
+        std_devs = np.std(scores, axis=1)
+
+        return [
+            {
+                'weighted_mean': weighted_means[i],
+                'weighted_median': weighted_medians[i],
+                'confidence_interval': {
+                    'lower': q25[i],
+                    'upper': q75[i],
+                    'range': q75[i] - q25[i]
+                },
+                'num_windows': num_windows,
+                'std_dev': std_devs[i] if num_windows > 1 else 0
+            }
+            for i in rows
+        ]
+
+    def preprocess_text(self, text: str, collapse_whitespace: bool = False) -> str:
         """
         Preprocess text before classification.
         
+        Lowercases, folds Unicode to ASCII (NFKD, skipped for text that is already
+        ASCII), removes URLs and e-mail addresses, collapses whitespace and replaces
+        special characters with spaces. URLs and e-mail addresses are only searched
+        for in the tokens that can contain them, and the character-level steps run as
+        byte translations over the ASCII text.
+        
         Args:
             text: Raw text content
+            collapse_whitespace: Also collapse the spaces left where special characters
+                were replaced, returning the words separated by single spaces
             
         Returns:
             Preprocessed text
@@ -329,27 +951,59 @@ class DocumentClassifier:
         text = text.lower()
         
         # Normalize unicode characters
-        text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
-        
-        # Remove URLs
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+        if not text.isascii():
+            text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
         
-        # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
+        data = text.encode('ascii').translate(_WHITESPACE_TABLE)
         
-        # Replace multiple newlines with single newline
-        text = re.sub(r'\n+', '\n', text)
+        # Remove URLs and email addresses
+        data = _remove_urls_and_emails(data)
         
-        # Replace multiple spaces with single space
-        text = re.sub(r'\s+', ' ', text)
+        if collapse_whitespace:
+            # Whitespace and special characters both just separate words here
+            return _SPACE_RUN.sub(b' ', data.translate(_SPECIAL_TABLE)).strip().decode('ascii')
+
+        # Replace runs of whitespace with a single space
+        data = _SPACE_RUN.sub(b' ', data)
         
         # Remove special characters but keep periods, commas, and other important punctuation
-        text = re.sub(r'[^\w\s.,!?;:()\-\'"]', ' ', text)
+        data = data.translate(_SPECIAL_TABLE)
         
         # Remove extra whitespace
-        text = text.strip()
+        return data.strip().decode('ascii')
+
+    def preprocess_stream(self, chunks: Iterable[str], min_segment: int = 4096) -> Iterator[str]:
+        """
+        Preprocess a stream of text chunks incrementally.
+        
+        Chunks are buffered and cut at whitespace that survives preprocessing. Every
+        preprocessing step acts within whitespace-delimited tokens, so the words of the
+        yielded pieces are exactly the words of preprocess_text() on the whole text.
+        Pieces are single-spaced (see preprocess_text's collapse_whitespace).
         
-        return text
+        Args:
+            chunks: Consecutive pieces of raw text
+            min_segment: Minimum number of characters preprocessed at once
+            
+        Yields:
+            Preprocessed pieces of text
+        """
+        pending = ''
+        for chunk in chunks:
+            pending += chunk
+            if len(pending) < min_segment:
+                continue
+            cut = max(pending.rfind(c) for c in _STABLE_WHITESPACE)
+            if cut < 0:
+                continue
+            segment, pending = pending[:cut + 1], pending[cut + 1:]
+            processed = self.preprocess_text(segment, collapse_whitespace=True)
+            if processed:
+                yield processed
+
+        processed = self.preprocess_text(pending, collapse_whitespace=True)
+        if processed:
+            yield processed
 
     def classify_document(self, text: str) -> Dict[str, Any]:
         """
@@ -361,36 +1015,133 @@ class DocumentClassifier:
         Returns:
             Dictionary containing classification results
         """
-        try:
-            # Preprocess the entire text
-            preprocessed_text = self.preprocess_text(text)
-            
-            # Split text into windows with position information
+        # Preprocess the entire text
+        with metrics.timed('preprocess'):
+            preprocessed_text = self.preprocess_text(text, collapse_whitespace=True)
+        
+        # Split text into windows with position information
+        with metrics.timed('window'):
             windows = self.create_sliding_windows(preprocessed_text)
-            logger.info(f"Split document into {len(windows)} windows")
-            
-            # Classify each window and store results with position info
-            window_results = []
-            for window_text, start_pos, end_pos in windows:
-                # Send window text directly to API since it's already preprocessed
-                result = self.query_api(window_text)
-                window_results.append((result, start_pos, end_pos))
-            
-            # Aggregate results using weighted voting
-            final_result = self.aggregate_results(window_results)
-            return final_result
+        logger.info(f"Split document into {len(windows)} windows")
+        return self._classify_windows(windows)
+
+    def _classify_windows(self, windows: Iterable[Tuple[str, int, int]]) -> Dict[str, Any]:
+        """Classify a (possibly streamed) sequence of windows with the configured backend."""
+        try:
+            if self.backend == 'remote':
+                return self._classify_remote_with_fallback(windows)
+
+            # The cascade may need the windows twice
+            if self.backend == 'cascade':
+                windows = list(windows)
+
+            local_result = self._classify_local(windows)
+            if self.backend == 'local':
+                return local_result
+
+            margin = self._top_margin(local_result['all_scores'])
+            if margin >= self.cascade_margin:
+                logger.info(f"Local engine margin {margin:.3f} >= {self.cascade_margin}, skipping remote model")
+                return local_result
+
+            logger.info(f"Local engine margin {margin:.3f} < {self.cascade_margin}, falling back to remote model")
+            try:
+                return self._classify_remote(windows)
+            except RequestException as e:
+                if self.fallback != 'local':
+                    raise
+                logger.warning(f"Inference endpoint unavailable ({str(e)}), keeping the local result")
+                metrics.INFERENCE_FALLBACKS.inc()
+                local_result['fallback'] = True
+                return local_result
             
         except Exception as e:
             logger.error(f"Error classifying document: {str(e)}")
             raise
 
-    def process_document(self, file_content: bytes, file_type: str) -> Dict[str, Any]:
+    def _classify_local(self, windows: Iterable[Tuple[str, int, int]]) -> Dict[str, Any]:
+        """Classify windows with the local engine and aggregate the results."""
+        # Local engine answers every window in-process
+        with metrics.timed('local_inference'):
+            local_results = [
+                (self.local_engine.query(window_text, self._categories), start_pos, end_pos)
+                for window_text, start_pos, end_pos in windows
+            ]
+        with metrics.timed('aggregate'):
+            local_result = self.aggregate_results(local_results)
+        local_result['engine'] = 'local'
+        metrics.DOCUMENT_WINDOWS.observe(len(local_results), engine='local')
+        return local_result
+
+    def _classify_remote_with_fallback(self, windows: Iterable[Tuple[str, int, int]]) -> Dict[str, Any]:
+        """
+        Classify windows remotely, falling back to the local engine if fallback is 'local'.
+
+        With the circuit open the endpoint isn't tried at all. Otherwise windows are
+        kept as they are consumed, so a request failing partway through the document
+        can hand all of them to the local engine.
+        """
+        if self.fallback != 'local':
+            return self._classify_remote(windows)
+        if self.client.breaker.state == CircuitBreaker.OPEN:
+            return self._classify_fallback(windows, "circuit open")
+
+        windows = iter(windows)
+        consumed = []
+
+        def recording():
+            for window in windows:
+                consumed.append(window)
+                yield window
+
+        try:
+            return self._classify_remote(recording())
+        except RequestException as e:
+            return self._classify_fallback(itertools.chain(consumed, windows), str(e))
+
+    def _classify_fallback(self, windows: Iterable[Tuple[str, int, int]], reason: str) -> Dict[str, Any]:
+        logger.warning(f"Inference endpoint unavailable ({reason}), classifying with the local engine")
+        metrics.INFERENCE_FALLBACKS.inc()
+        result = self._classify_local(windows)
+        result['fallback'] = True
+        return result
+
+    def _classify_remote(self, windows: Iterable[Tuple[str, int, int]]) -> Dict[str, Any]:
+        """Classify windows with the Hugging Face model and aggregate the results."""
+        if self.adaptive_sampling:
+            window_results, total_windows, document_length = self.query_windows_adaptive(windows)
+            with metrics.timed('aggregate'):
+                final_result = self.aggregate_results(window_results, document_length=document_length or None)
+        else:
+            # Classify each window and store results with position info
+            window_results = self.query_windows(windows)
+            total_windows = len(window_results)
+            with metrics.timed('aggregate'):
+                final_result = self.aggregate_results(window_results)
+        return self._remote_result(final_result, len(window_results), total_windows)
+
+    def _remote_result(self, final_result: Dict[str, Any], windows_scored: int, total_windows: int) -> Dict[str, Any]:
+        """Annotate an aggregated remote result with its engine and sampling counts."""
+        logger.info(f"Classified {windows_scored} of {total_windows} windows")
+        metrics.DOCUMENT_WINDOWS.observe(total_windows, engine='remote')
+
+        final_result['engine'] = 'remote'
+        final_result['sampling'] = {
+            'windows_total': total_windows,
+            'windows_scored': windows_scored,
+            'windows_skipped': total_windows - windows_scored
+        }
+        return final_result
+
+    def process_document(self, file_content: uploads.UploadContent, file_type: str, text_sink: Optional[Any] = None) -> Dict[str, Any]:
         """
         Process the document and return detailed classification results.
         
         Args:
-            file_content: Raw bytes of the file
+            file_content: Raw bytes of the file, or a memory-mapped file (see uploads.py)
             file_type: File extension
+            text_sink: Optional object whose write(piece) receives the extracted text as it
+                is parsed. Text is extracted for it even when the result comes from cache
             
         Returns:
             Dictionary containing classification results
@@ -400,15 +1151,143 @@ class DocumentClassifier:
             IOError: If file cannot be read
             RequestException: If classification service fails
         """
+        with metrics.collect_timings():
+            return self._process_document(file_content, file_type, text_sink)
+
+    def _process_document(self, file_content: uploads.UploadContent, file_type: str, text_sink: Optional[Any] = None) -> Dict[str, Any]:
         try:
-            # Extract text from the document
-            text = self.extract_text_from_file(file_content, file_type)
-            
-            # Classify the text
-            results = self.classify_document(text)
-            
-            return results
+            # Identical bytes were classified before: skip extraction entirely
+            raw_key, cached = self._cached_raw_result(file_content, file_type, text_sink)
+            if cached is not None:
+                return cached
+
+            # Stream extraction -> preprocessing -> windows, hashing the normalized words on
+            # the way so re-saved copies of a document share a key
+            text_hasher = hashlib.sha256()
+            min_hasher = MinHasher() if self.similarity_index is not None else None
+            pieces = self._normalized_pieces(file_content, file_type, text_sink, text_hasher, min_hasher)
+
+            if self.result_cache is None and min_hasher is None:
+                # Nothing to look up: the first windows are classified while later pages are parsed
+                windows = metrics.timed_iter(self.iter_sliding_windows(pieces), 'window')
+                return self._store_results(raw_key, text_hasher, self._classify_windows(windows), None)
+
+            # The text key and the signature cover the whole text, so the text is read
+            # through (and spooled) before any window is sent
+            with _spooled_pieces(pieces) as spooled:
+                cached = self._cached_text_result(raw_key, text_hasher)
+                if cached is not None:
+                    return cached
+                signature = None
+                if min_hasher is not None:
+                    signature, similar = self._near_duplicate(min_hasher)
+                    if similar is not None:
+                        return similar
+                windows = metrics.timed_iter(self.iter_sliding_windows(spooled), 'window')
+                results = self._classify_windows(windows)
+
+            return self._store_results(raw_key, text_hasher, results, signature)
             
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def _cached_raw_result(self, file_content: uploads.UploadContent, file_type: str,
+                           text_sink: Optional[Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Result cache key of the raw content and its cached result, if any; a hit still feeds text_sink."""
+        raw_key = self._result_cache_key('raw', uploads.content_sha256(file_content))
+        cached = self._get_cached_result(raw_key)
+        if cached is not None:
+            logger.info("Returning cached classification for identical file content")
+            if text_sink is not None:
+                extracted = metrics.timed_iter(self.iter_text_from_file(file_content, file_type), 'extract')
+                for _ in self._tee_text(extracted, text_sink):
+                    pass
+        return raw_key, cached
+
+    def _normalized_pieces(self, file_content: uploads.UploadContent, file_type: str, text_sink: Optional[Any],
+                           text_hasher: Any, min_hasher: Optional[MinHasher]) -> Iterator[str]:
+        """Extract and preprocess text, feeding each piece to the hashers on the way."""
+        extracted = metrics.timed_iter(self.iter_text_from_file(file_content, file_type), 'extract')
+        if text_sink is not None:
+            extracted = self._tee_text(extracted, text_sink)
+        for piece in metrics.timed_iter(self.preprocess_stream(extracted), 'preprocess'):
+            text_hasher.update(piece.encode('utf-8'))
+            text_hasher.update(b' ')
+            if min_hasher is not None:
+                with metrics.timed('similarity'):
+                    min_hasher.update(piece)
+            yield piece
+
+    def _near_duplicate(self, min_hasher: MinHasher) -> Tuple[Optional[Signature], Optional[Dict[str, Any]]]:
+        """Signature of the text fed to min_hasher, and the result of a stored near duplicate if there is one."""
+        signature = min_hasher.signature(self._result_cache_key('similarity', ''))
+        similar = self._find_similar(signature)
+        if similar is not None:
+            logger.info(
+                f"Reusing classification of near-duplicate document "
+                f"{similar['near_duplicate']['document_id']} "
+                f"(similarity {similar['near_duplicate']['similarity']})"
+            )
+            similar['signature'] = signature
+        return signature, similar
+
+    def _cached_text_result(self, raw_key: str, text_hasher: Any) -> Optional[Dict[str, Any]]:
+        """Cached result for the normalized text fed to text_hasher, also stored under the raw key."""
+        cached = self._get_cached_result(self._result_cache_key('text', text_hasher.hexdigest()))
+        if cached is not None:
+            logger.info("Returning cached classification for identical document text")
+            self._set_cached_result(raw_key, cached)
+        return cached
+
+    def _store_results(self, raw_key: str, text_hasher: Any, results: Dict[str, Any],
+                       signature: Optional[Signature]) -> Dict[str, Any]:
+        """Cache a fresh result under the raw and text keys; attach the signature for indexing."""
+        # Fallback results stand in for the configured engine only until it recovers
+        if not results.get('fallback'):
+            text_key = self._result_cache_key('text', text_hasher.hexdigest())
+            self._set_cached_result(raw_key, results)
+            self._set_cached_result(text_key, results)
+            if signature is not None:
+                # Only the saved document gets indexed, not the cached copies
+                results = dict(results, signature=signature)
+        return results
+
+    @staticmethod
+    def _tee_text(pieces: Iterable[str], text_sink: Any) -> Iterator[str]:
+        """Pass extracted text through, writing each piece to text_sink."""
+        for piece in pieces:
+            with metrics.timed('store_text'):
+                text_sink.write(piece)
+            yield piece
+
+    def _result_cache_key(self, kind: str, digest: str) -> str:
+        """
+        Build a result cache key that is invalidated by model or category changes.
+        
+        Args:
+            kind: What the digest was computed over ('raw' bytes or normalized 'text')
+            digest: Hex digest of the content
+            
+        Returns:
+            SHA-256 hex key
+        """
+        key_material = '\x1f'.join([kind, digest, self.engine_id] + self._categories)
+        return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+    def _get_cached_result(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.result_cache is None:
+            return None
+        with metrics.timed('cache'):
+            return self.result_cache.get(key)
+
+    def _find_similar(self, signature: Optional[Signature]) -> Optional[Dict[str, Any]]:
+        if signature is None:
+            return None
+        with metrics.timed('similarity'):
+            return self.similarity_index.find(signature)
+
+    def _set_cached_result(self, key: str, result: Dict[str, Any]) -> None:
+        if self.result_cache is not None:
+            with metrics.timed('cache'):
+                self.result_cache.set(key, result, self.engine_id)
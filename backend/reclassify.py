@@ -0,0 +1,216 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+
+from sqlalchemy import func, update
+
+from config import settings
+from database import db, Document, DocumentText, ReclassifyRun, document_s3_key
+import search
+import services
+import stats
+import uploads
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _create_worker_classifier():
+    from caching import WindowCache
+    from ml_classifier import DocumentClassifier
+
+    # No result cache: it would answer with the results being replaced, and it
+    # needs an application context the workers don't have
+    return DocumentClassifier(
+        window_cache=WindowCache(
+            maxsize=settings.WINDOW_CACHE_SIZE,
+            ttl=settings.WINDOW_CACHE_TTL or None,
+            disk_path=settings.WINDOW_CACHE_PATH or None
+        )
+    )
+
+
+# One classifier per worker process (or shared by the worker threads)
+_classifier = services.Lazy(_create_worker_classifier)
+
+
+def classify_task(document_id: int, filename: str, s3_key: str,
+                  compressed_text: Optional[bytes]) -> Tuple[int, Optional[str], Optional[float], Optional[bytes], int, Optional[str]]:
+    """
+    Reclassify one document. Runs on a worker thread or process.
+
+    Uses the stored text when there is one; otherwise downloads the original from S3
+    and extracts it, returning the compressed text so it can be stored.
+
+    Returns:
+        Tuple of (document id, category, confidence, newly extracted compressed text,
+        its length, error message)
+    """
+    try:
+        classifier = _classifier.get()
+        if compressed_text is not None:
+            result = classifier.classify_document(search.CompressedText(compressed_text, 0).text())
+            return document_id, result['category'], float(result['confidence']), None, 0, None
+
+        response = services.get_s3_client().get_object(Bucket=settings.AWS_BUCKET_NAME, Key=s3_key)
+        text_compressor = search.TextCompressor()
+        # Large originals are spooled to disk and memory-mapped, like large uploads
+        with uploads.load_upload(response['Body'], response.get('ContentLength')) as file_content:
+            result = classifier.process_document(
+                file_content, os.path.splitext(filename)[1].lower(), text_sink=text_compressor
+            )
+        extracted_text = text_compressor.finish()
+        return document_id, result['category'], float(result['confidence']), extracted_text.data, extracted_text.length, None
+    except Exception as e:
+        return document_id, None, None, None, 0, str(e)
+
+
+def default_run_id() -> str:
+    """Name runs after the classifier configuration, so a changed model or category list starts a new run."""
+    classifier = _classifier.get()
+    material = '\x1f'.join([classifier.engine_id] + classifier.categories)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def format_progress(progress: Dict[str, Any]) -> str:
+    """One-line summary of a progress report: counts, throughput and ETA."""
+    return (
+        f"{progress['processed']}/{progress['total']} documents ({progress['percent']:.1f}%), "
+        f"{progress['changed']} changed, {progress['failed']} failed, "
+        f"{progress['rate']:.1f} docs/s, ETA {_format_duration(progress['eta_seconds'])}"
+    )
+
+
+def _log_progress(progress: Dict[str, Any]) -> None:
+    logger.info(format_progress(progress))
+
+
+def reclassify_documents(batch_size: int = 100, workers: int = 4, processes: bool = False,
+                         run_id: Optional[str] = None, restart: bool = False,
+                         progress: Callable[[Dict[str, Any]], None] = _log_progress) -> ReclassifyRun:
+    """
+    Reclassify stored documents with the current classifier, resuming an interrupted run.
+
+    Documents are read in id order, batch_size at a time, and classified on a pool of
+    worker threads (or processes, for the CPU-bound local engine). Each batch is
+    written back in one transaction: bulk classification updates, stats rollup
+    corrections, any newly extracted text and the run's checkpoint. A run stopped
+    at any point therefore resumes after the last committed batch. Documents that
+    fail to classify keep their classification and are counted as failed.
+
+    Must be called inside an application context.
+
+    Args:
+        batch_size: Documents per batch and transaction
+        workers: Worker threads or processes
+        processes: Use worker processes instead of threads
+        run_id: Checkpoint name. Defaults to a hash of the classifier configuration
+        restart: Discard the checkpoint and start from the first document
+        progress: Called after every batch with processed, total, percent, changed,
+            failed, rate (documents per second) and eta_seconds
+
+    Returns:
+        The run's checkpoint row
+    """
+    ReclassifyRun.__table__.create(bind=db.engine, checkfirst=True)
+    run_id = run_id or default_run_id()
+
+    run = db.session.get(ReclassifyRun, run_id)
+    if run is None or restart:
+        if run is not None:
+            db.session.delete(run)
+            db.session.flush()
+        run = ReclassifyRun(id=run_id, engine_id=_classifier.get().engine_id, last_document_id=0,
+                            processed=0, changed=0, failed=0, started_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.commit()
+    elif run.finished_at is not None:
+        logger.info(f"Reclassification run {run_id} already finished; pass restart to run it again")
+        return run
+    else:
+        logger.info(f"Resuming reclassification run {run_id} after document {run.last_document_id}")
+
+    remaining = db.session.scalar(db.select(func.count(Document.id)).where(Document.id > run.last_document_id))
+    total = run.processed + remaining
+    session_processed = 0
+    started = time.perf_counter()
+
+    executor: Executor
+    if processes:
+        # Spawned, not forked: the parent's client and executor threads don't survive a fork
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reclassify')
+
+    with executor:
+        while True:
+            rows = db.session.execute(
+                db.select(Document.id, Document.filename, Document.s3_key, Document.s3_url, Document.classification,
+                          Document.confidence, Document.upload_timestamp, DocumentText.compressed_text)
+                .outerjoin(DocumentText, DocumentText.document_id == Document.id)
+                .where(Document.id > run.last_document_id)
+                .order_by(Document.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            results = executor.map(
+                classify_task,
+                *zip(*[(row.id, row.filename, document_s3_key(row.s3_key, row.s3_url), row.compressed_text)
+                       for row in rows])
+            )
+
+            updates = []
+            new_texts = []
+            for row, (document_id, category, confidence, text_data, text_length, error) in zip(rows, results):
+                if error is not None:
+                    logger.error(f"Failed to reclassify document {document_id}: {error}")
+                    run.failed += 1
+                    continue
+                if text_data is not None:
+                    new_texts.append((document_id, search.CompressedText(text_data, text_length)))
+                if category == row.classification and confidence == row.confidence:
+                    continue
+                updates.append({'id': document_id, 'classification': category, 'confidence': confidence})
+                stats.record_document(row.classification, row.confidence, row.upload_timestamp, delta=-1)
+                stats.record_document(category, confidence, row.upload_timestamp)
+                if category != row.classification:
+                    run.changed += 1
+
+            if updates:
+                # Bulk UPDATE by primary key: one executemany per batch
+                db.session.execute(update(Document), updates)
+            search.store_texts(new_texts)
+            run.last_document_id = rows[-1].id
+            run.processed += len(rows)
+            run.updated_at = datetime.utcnow()
+            db.session.commit()
+
+            session_processed += len(rows)
+            rate = session_processed / (time.perf_counter() - started)
+            progress({
+                'processed': run.processed,
+                'total': total,
+                'percent': 100.0 * run.processed / total if total else 100.0,
+                'changed': run.changed,
+                'failed': run.failed,
+                'rate': rate,
+                'eta_seconds': (total - run.processed) / rate if rate else 0.0
+            })
+
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Reclassification run {run_id} finished: {run.processed} documents, "
+                f"{run.changed} changed, {run.failed} failed")
+    return run
@@ -0,0 +1,972 @@
+from flask import Blueprint, Response, current_app, g, request, jsonify
+from datetime import datetime, timedelta, UTC
+import os
+from werkzeug.utils import secure_filename
+from botocore.exceptions import ClientError
+import base64
+import contextvars
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import db, Document, Job, document_s3_key
+from config import settings
+from caching import LRUCache
+import jobs
+import metrics
+import search
+import services
+import stats
+import uploads
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('api', __name__)
+
+ALLOWED_EXTENSIONS = ['.txt', '.docx', '.pdf']
+
+# Worker pool for bulk uploads; each entry is stored and classified on its own thread
+bulk_executor = ThreadPoolExecutor(max_workers=settings.BULK_WORKERS, thread_name_prefix='bulk')
+
+# S3 uploads run here while the request thread classifies the same bytes
+s3_executor = ThreadPoolExecutor(max_workers=settings.S3_UPLOAD_WORKERS, thread_name_prefix='s3-upload')
+
+# Total document count shared by paginated listings; refreshed after the TTL
+# and dropped whenever this process commits a new document
+document_count_cache = LRUCache(maxsize=1, ttl=settings.DOCUMENT_COUNT_TTL)
+
+# Presigned download URLs by S3 key, so re-rendered history pages cost no signing
+# work. Entries expire PRESIGNED_URL_CACHE_TTL seconds after signing, but always at
+# least PRESIGNED_URL_MIN_VALIDITY seconds before the URL itself does, so a served
+# URL has that much validity left; with no room for both, nothing is cached
+presigned_url_cache_ttl = min(settings.PRESIGNED_URL_CACHE_TTL,
+                              settings.PRESIGNED_URL_EXPIRY - settings.PRESIGNED_URL_MIN_VALIDITY)
+presigned_url_cache = LRUCache(
+    maxsize=settings.PRESIGNED_URL_CACHE_SIZE if presigned_url_cache_ttl > 0 else 0,
+    ttl=presigned_url_cache_ttl
+)
+
+# Most documents per batch download URL request
+MAX_DOWNLOAD_URL_BATCH = 100
+
+
+@bp.route('/categories/', methods=['GET'])
+def get_categories():
+    """Get the list of available document categories."""
+    try:
+        categories = services.get_classifier().categories
+        return jsonify(categories), 200
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error getting categories: {error_message}")
+        return jsonify({'error': error_message}), 500
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Job workers start with the first request rather than at import, so CLI
+    # commands (e.g. init-db on an empty database) don't spin them up
+    current_app.extensions['job_queue'].start()
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    started = g.get('request_started')
+    if started is not None:
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+
+def _cache_samples():
+    # Don't construct the classifier just to report that its caches are empty
+    classifier = services.classifier.peek()
+    if classifier is None:
+        return
+    caches = (
+        ('result', classifier.result_cache),
+        ('window', classifier.window_cache),
+        ('near_duplicate', classifier.similarity_index)
+    )
+    for name, cache in caches:
+        if cache is None:
+            continue
+        cache_stats = cache.stats()
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        yield {'cache': name, 'kind': 'hits'}, cache_stats['hits']
+        yield {'cache': name, 'kind': 'misses'}, cache_stats['misses']
+        yield {'cache': name, 'kind': 'hit_ratio'}, cache_stats['hits'] / lookups if lookups else 0
+
+
+metrics.registry.register_collector('classifier_cache', 'Classification cache hits, misses and hit ratio', _cache_samples)
+
+
+def _circuit_samples():
+    classifier = services.classifier.peek()
+    if classifier is None:
+        return
+    state = classifier.client.breaker.state
+    for name in ('closed', 'open', 'half_open'):
+        yield {'state': name}, 1 if state == name else 0
+
+
+metrics.registry.register_collector('inference_circuit_state', 'Inference circuit breaker state (1 = current)', _circuit_samples)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose counters and latency histograms in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/ready', methods=['GET'])
+def get_readiness():
+    """
+    Report whether the database, S3 and the inference endpoint are reachable.
+
+    Checks run in the background and results are cached for READY_CHECK_INTERVAL
+    seconds, so this never blocks on a slow dependency. Until the first round
+    finishes the service reports not ready.
+    """
+    status = current_app.extensions['readiness'].status()
+    status['startup_ms'] = current_app.config.get('STARTUP_MS')
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get hit/miss counters of the classification caches."""
+    classifier = services.get_classifier()
+    cache_stats = {
+        'results': classifier.result_cache.stats(),
+        'windows': classifier.window_cache.stats()
+    }
+    if classifier.similarity_index is not None:
+        cache_stats['near_duplicates'] = classifier.similarity_index.stats()
+    return jsonify(cache_stats), 200
+
+
+@bp.route('/upload/', methods=['POST'])
+def upload_document():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+
+    file = request.files['file']
+    error = upload_file_error(file.filename)
+    if error:
+        return jsonify({'error': error}), 400
+    file_ext = os.path.splitext(file.filename)[1].lower()
+
+    try:
+        # Reject oversized files before reading any of their content
+        size = uploads.stream_size(file.stream)
+        uploads.check_size(size)
+
+        # Files above the memory budget are processed from a memory-mapped file
+        with uploads.load_upload(file.stream, size) as file_content:
+            # Check if file is empty
+            if uploads.is_blank(file_content):
+                return jsonify({'error': EMPTY_FILE_ERROR}), 400
+
+            filename = secure_filename(file.filename)
+            run_async, include_timings = upload_options(request.args)
+
+            # Async mode: persist the bytes and let the job workers do the rest
+            if run_async:
+                response_data, headers = enqueue_upload(filename, file_ext, file_content)
+                return jsonify(response_data), 202, headers
+
+            response_data = process_upload(filename, file_ext, file_content, include_timings=include_timings)
+            return jsonify(response_data), 201
+
+    except Exception as e:
+        if isinstance(e, SQLAlchemyError):
+            db.session.rollback()
+        response_data, status_code = upload_error_response(e)
+        return jsonify(response_data), status_code
+
+
+# The upload steps below are shared by the route above and the ASGI app (asgi.py)
+
+EMPTY_FILE_ERROR = 'File is empty. Please upload a file with content.'
+
+# Errors after which an upload's document is not recorded, so its original is deleted from S3
+UNRECORDED_ERRORS = (SQLAlchemyError, jobs.JobAlreadyFinished)
+
+
+def upload_file_error(filename):
+    """The 400 error for an uploaded file's name (missing, or an unsupported type), or None."""
+    if not filename:
+        return 'No file selected'
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        return f'File type not allowed. Supported types: {", ".join(ALLOWED_EXTENSIONS)}'
+    return None
+
+
+def upload_options(args):
+    """
+    Read the upload route's query parameters.
+
+    Returns:
+        Tuple of (queue the upload as a job, include per-stage timings)
+    """
+    async_param = args.get('async')
+    run_async = settings.ASYNC_UPLOADS if async_param is None else async_param.lower() in ('1', 'true')
+    include_timings = args.get('timings', '').lower() in ('1', 'true')
+    return run_async, include_timings
+
+
+def enqueue_upload(filename, file_ext, file_content):
+    """
+    Queue an upload as a job. Must be called inside an application context.
+
+    Returns:
+        Tuple of (202 response payload, response headers)
+    """
+    job_queue = current_app.extensions['job_queue']
+    job_queue.start()
+    # Job payloads are stored in the database, so this reads a mapped file into memory
+    job = job_queue.enqueue(filename, file_ext, bytes(file_content))
+    logger.info(f"Queued upload job {job.id} for {filename}")
+    status_url = f"/jobs/{job.id}"
+    return {'job_id': job.id, 'status': job.status, 'status_url': status_url}, {'Location': status_url}
+
+
+def upload_error_response(error):
+    """
+    Map an error raised while processing an upload to its response.
+
+    Returns:
+        Tuple of (response payload, status code)
+    """
+    error_message = str(error)
+    if isinstance(error, uploads.UploadTooLarge):
+        return {'error': error_message}, 413
+    if isinstance(error, ClientError):
+        logger.error(f"AWS S3 Error: {error_message}")
+        return {'error': f'AWS S3 Error: {error_message}'}, 500
+    if isinstance(error, SQLAlchemyError):
+        logger.error(f"Database error: {error_message}")
+        return {'error': 'Failed to save document to database'}, 500
+    logger.error(f"Error: {error_message}")
+    return {'error': error_message}, 500
+
+
+@bp.route('/upload/bulk', methods=['POST'])
+def bulk_upload_documents():
+    """
+    Ingest many documents in one request.
+
+    Accepts several files under 'files' or a single ZIP archive. Archive entries are
+    read straight out of the uploaded stream, never extracted to disk. Entries are
+    uploaded and classified in parallel and recorded in batched commits. Batches
+    larger than BULK_SYNC_LIMIT (or any batch with ?async=true) are queued as jobs.
+    """
+    files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+
+    archive = None
+    try:
+        if len(files) == 1 and os.path.splitext(files[0].filename)[1].lower() == '.zip':
+            try:
+                archive = zipfile.ZipFile(files[0].stream)
+            except zipfile.BadZipFile:
+                return jsonify({'error': 'Invalid ZIP archive'}), 400
+            entries, rejected = _archive_entries(archive)
+        else:
+            entries, rejected = _file_entries(files)
+
+        if len(entries) + len(rejected) > settings.BULK_MAX_FILES:
+            return jsonify({'error': f'Too many files. At most {settings.BULK_MAX_FILES} are accepted per request.'}), 400
+        if not entries:
+            return jsonify({'error': 'No supported files found', 'rejected': rejected}), 400
+
+        async_param = request.args.get('async')
+        run_async = len(entries) > settings.BULK_SYNC_LIMIT if async_param is None else async_param.lower() in ('1', 'true')
+        if run_async:
+            job_ids = current_app.extensions['job_queue'].enqueue_many(
+                ((filename, file_ext, _read_entry(open_entry)) for filename, file_ext, _, open_entry in entries),
+                batch_size=settings.BULK_COMMIT_SIZE
+            )
+            logger.info(f"Queued {len(job_ids)} bulk upload jobs")
+            return jsonify({
+                'status': 'queued',
+                'total': len(job_ids),
+                'jobs': [
+                    {'filename': filename, 'job_id': job_id, 'status_url': f"/jobs/{job_id}"}
+                    for (filename, _, _, _), job_id in zip(entries, job_ids)
+                ],
+                'rejected': rejected
+            }), 202
+
+        results = _process_bulk(entries)
+        succeeded = sum(1 for result in results if result['status'] == 'created')
+        return jsonify({
+            'status': 'success',
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results,
+            'rejected': rejected
+        }), 200
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error: {str(e)}")
+        return jsonify({'error': 'Failed to save documents to database'}), 500
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error: {error_message}")
+        return jsonify({'error': error_message}), 500
+    finally:
+        if archive is not None:
+            archive.close()
+
+
+def _file_entries(files):
+    """Split uploaded files into accepted (filename, file_ext, size, open) entries and rejections."""
+    entries, rejected = [], []
+    for file in files:
+        filename = secure_filename(file.filename)
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            rejected.append({'filename': file.filename, 'error': 'File type not allowed'})
+            continue
+        size = uploads.stream_size(file.stream)
+        try:
+            uploads.check_size(size)
+        except uploads.UploadTooLarge as e:
+            rejected.append({'filename': file.filename, 'error': str(e)})
+            continue
+        entries.append((filename, file_ext, size, lambda file=file: file.stream))
+    return entries, rejected
+
+
+def _archive_entries(archive):
+    """Split ZIP members into accepted (filename, file_ext, size, open) entries and rejections."""
+    entries, rejected = [], []
+    for info in archive.infolist():
+        basename = os.path.basename(info.filename)
+        # Skip directories and metadata written by archivers (e.g. __MACOSX/, .DS_Store)
+        if info.is_dir() or not basename or basename.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        filename = secure_filename(basename)
+        file_ext = os.path.splitext(filename)[1].lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            rejected.append({'filename': info.filename, 'error': 'File type not allowed'})
+            continue
+        # Rejected by the declared size here, and by the actual size while being read
+        try:
+            uploads.check_size(info.file_size)
+        except uploads.UploadTooLarge as e:
+            rejected.append({'filename': info.filename, 'error': str(e)})
+            continue
+        # ZipFile serializes reads on the shared stream, so members can be read from worker threads
+        entries.append((filename, file_ext, info.file_size, lambda info=info: archive.open(info)))
+    return entries, rejected
+
+
+def _read_entry(open_entry):
+    with open_entry() as stream:
+        return stream.read()
+
+
+def _bulk_worker(app, filename, file_ext, size, open_entry):
+    with app.app_context(), metrics.collect_timings(), open_entry() as stream:
+        # Archive members' sizes are only declared; copy them to disk if they may be large
+        with uploads.load_upload(stream, size) as file_content:
+            if uploads.is_blank(file_content):
+                raise ValueError('File is empty')
+            return store_and_classify(filename, file_ext, file_content)
+
+
+def _process_bulk(entries):
+    """
+    Store, classify and record bulk upload entries.
+
+    Returns:
+        Per-file results, in input order
+    """
+    results = [None] * len(entries)
+    pending = []
+
+    def flush():
+        try:
+            saved = save_documents([
+                (filename, s3_key, s3_url, classification, extracted_text)
+                for _, filename, s3_key, s3_url, classification, extracted_text in pending
+            ])
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Database error: {str(e)}")
+            for index, filename, s3_key, _, _, _ in pending:
+                delete_s3_object(s3_key)
+                results[index] = {'filename': filename, 'status': 'failed', 'error': 'Failed to save document to database'}
+        else:
+            for (index, filename, _, _, classification, _), document_data in zip(pending, saved):
+                results[index] = {'filename': filename, 'status': 'created', 'document': upload_response(document_data, classification)}
+        pending.clear()
+
+    app = current_app._get_current_object()
+    futures = {
+        bulk_executor.submit(_bulk_worker, app, filename, file_ext, size, open_entry): (index, filename)
+        for index, (filename, file_ext, size, open_entry) in enumerate(entries)
+    }
+    for future in as_completed(futures):
+        index, filename = futures[future]
+        try:
+            s3_key, s3_url, classification, extracted_text = future.result()
+        except Exception as e:
+            logger.error(f"Bulk upload of {filename} failed: {str(e)}")
+            results[index] = {'filename': filename, 'status': 'failed', 'error': str(e)}
+            continue
+        pending.append((index, filename, s3_key, s3_url, classification, extracted_text))
+        if len(pending) >= settings.BULK_COMMIT_SIZE:
+            flush()
+    if pending:
+        flush()
+
+    logger.info(f"Bulk upload finished: {len(entries)} files")
+    return results
+
+
+def process_upload(filename, file_ext, file_content, include_timings=False, job=None):
+    """
+    Store a document in S3, classify it and record it in the database.
+
+    Used by the synchronous upload route and by the job workers.
+
+    Args:
+        include_timings: Add a per-stage timing breakdown (milliseconds) to the response
+        job: The upload job being run, whose result commits together with the document
+
+    Returns:
+        Upload response payload
+    """
+    with metrics.collect_timings() as timings:
+        s3_key, s3_url, classification, extracted_text = store_and_classify(filename, file_ext, file_content)
+        entry = (filename, s3_key, s3_url, classification, extracted_text)
+        try:
+            if job is None:
+                response_data = upload_response(save_documents([entry])[0], classification)
+            else:
+                response_data = save_job_document(job, entry)
+        except UNRECORDED_ERRORS:
+            # Don't leave an original in S3 that no document points to
+            delete_s3_object(s3_key)
+            raise
+        if include_timings:
+            response_data['timings'] = timings.as_milliseconds()
+    return response_data
+
+
+def store_and_classify(filename, file_ext, file_content):
+    """
+    Upload a document to S3 and classify it concurrently.
+
+    The upload runs on s3_executor while the calling thread classifies; both read
+    the same immutable bytes (or memory-mapped file), so the original is never copied. If either branch
+    fails the other is undone: a finished upload is deleted, and a failed upload
+    discards the classification.
+
+    Touches the database only through the classifier's result cache, so it can run
+    on worker threads that hold their own application context.
+
+    Returns:
+        Tuple of (S3 key, S3 URL, classification result, compressed extracted text)
+    """
+    s3_key = begin_upload(filename)
+    upload = s3_executor.submit(
+        contextvars.copy_context().run,
+        upload_original,
+        uploads.open_content(file_content),
+        settings.AWS_BUCKET_NAME,
+        s3_key,
+        Config=services.get_s3_transfer_config()
+    )
+
+    # Extracted text is compressed as the classifier parses it, for storage and search
+    text_compressor = search.TextCompressor()
+    try:
+        # Classify document using ML
+        classification = services.get_classifier().process_document(
+            file_content,
+            file_ext,
+            text_sink=text_compressor
+        )
+    except BaseException:
+        discard_upload(s3_key, upload.exception())
+        raise
+
+    # Raises the upload error, if any; the classification is simply dropped
+    upload.result()
+    return stored_upload(s3_key, classification, text_compressor)
+
+
+def begin_upload(filename):
+    """
+    Choose the S3 key for a new upload's original. The random part keeps keys unique
+    when uploads with the same name arrive together, such as entries of a bulk ZIP
+    from different folders.
+    """
+    s3_key = f"documents/{datetime.now(UTC).timestamp()}_{uuid.uuid4().hex}_{filename}"
+    logger.info(f"Attempting to upload to S3: {s3_key}")
+    return s3_key
+
+
+def discard_upload(s3_key, upload_error):
+    """Undo the S3 side of an upload whose classification failed, once its S3 upload has finished."""
+    if upload_error is not None:
+        logger.error(f"S3 upload of {s3_key} failed: {str(upload_error)}")
+    else:
+        delete_s3_object(s3_key)
+
+
+def stored_upload(s3_key, classification, text_compressor):
+    """
+    store_and_classify's result for an upload whose original is in S3 and whose
+    classification is done.
+    """
+    s3_url = f"https://{settings.AWS_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+    logger.info(f"Successfully uploaded to S3: {s3_url}")
+    logger.info(
+        f"Classification: {classification['category']}, Confidence: {classification['confidence']}")
+    return s3_key, s3_url, classification, text_compressor.finish()
+
+
+def upload_original(fileobj, bucket, s3_key, Config=None):
+    with metrics.timed('s3_upload'):
+        services.get_s3_client().upload_fileobj(fileobj, bucket, s3_key, Config=Config)
+
+
+def delete_s3_object(s3_key):
+    """Best-effort removal of an uploaded original whose document was not recorded."""
+    try:
+        services.get_s3_client().delete_object(Bucket=settings.AWS_BUCKET_NAME, Key=s3_key)
+        logger.info(f"Rolled back S3 upload: {s3_key}")
+    except ClientError as e:
+        logger.error(f"Failed to roll back S3 upload {s3_key}: {str(e)}")
+
+
+def save_documents(entries):
+    """
+    Record classified documents and their stats rollup in a single commit.
+
+    With DB_WRITE_BATCHING the commit is the write buffer's, shared with the
+    documents of other requests saved at the same time; a failed batch is retried
+    per request, so an error still only affects the entries that caused it.
+
+    Args:
+        entries: (filename, S3 key, S3 URL, classification, compressed extracted text) tuples
+
+    Returns:
+        Serialized documents, in input order
+    """
+    with metrics.timed('db_commit'):
+        if settings.DB_WRITE_BATCHING:
+            # Committed by the write buffer's flusher, together with other requests' documents
+            document_data = current_app.extensions['write_buffer'].write(entries)
+        else:
+            document_data = add_documents(db.session, entries)
+            db.session.commit()
+    document_count_cache.clear()
+    return document_data
+
+
+def save_job_document(job, entry):
+    """
+    Record an upload job's document and mark the job succeeded in one commit.
+
+    A job run twice (its worker stalled past the queue's stale_after, or died after
+    this commit) records at most one document: the second run finds the job
+    finished, and its transaction is rolled back.
+
+    Returns:
+        Upload response payload, also stored as the job's result
+
+    Raises:
+        JobAlreadyFinished: If another run of the job recorded its document first
+    """
+    with metrics.timed('db_commit'):
+        try:
+            document_data = add_documents(db.session, [entry])[0]
+            response_data = upload_response(document_data, entry[3])
+            jobs.record_success(job, response_data)
+            db.session.commit()
+        except BaseException:
+            db.session.rollback()
+            raise
+    document_count_cache.clear()
+    return response_data
+
+
+def add_documents(session, entries):
+    """
+    Add classified documents with their stats rollup, text and signatures to a
+    session, without committing.
+
+    The write buffer runs this for batches of requests (see write_buffer.py), and
+    the ASGI app on an async session's synchronous facade (see asgi.py).
+
+    Returns:
+        Serialized documents, in input order
+    """
+    documents = []
+    for filename, s3_key, s3_url, classification, _ in entries:
+        document = Document(
+            filename=filename,
+            content="",  # Extracted text is stored compressed in document_texts
+            classification=classification['category'],
+            confidence=classification['confidence'],
+            s3_url=s3_url,
+            s3_key=s3_key
+        )
+        session.add(document)
+        documents.append(document)
+    session.flush()
+    stats.record_documents(
+        ((document.classification, document.confidence, document.upload_timestamp) for document in documents),
+        session=session
+    )
+    search.store_texts(((document.id, entry[-1]) for document, entry in zip(documents, entries)), session=session)
+    similarity_index = services.get_classifier().similarity_index
+    if similarity_index is not None:
+        similarity_index.add(((document.id, entry[3]) for document, entry in zip(documents, entries)), session=session)
+    # Serialize before the commit expires the rows, which would reload each one
+    return [document.to_dict() for document in documents]
+
+
+def upload_response(document_data, classification):
+    """Build the upload response payload for a stored document."""
+    # Include all_scores in the response
+    response_data = dict(document_data)
+    response_data['all_scores'] = classification['all_scores']
+    response_data['cached'] = classification.get('cached', False)
+    if 'sampling' in classification:
+        response_data['sampling'] = classification['sampling']
+    if classification.get('fallback'):
+        response_data['fallback'] = True
+    if 'near_duplicate' in classification:
+        response_data['near_duplicate'] = classification['near_duplicate']
+    return response_data
+
+
+def run_upload_job(job):
+    """Job queue handler: process a queued upload like a synchronous one."""
+    return process_upload(job.filename, job.file_ext, job.payload, job=job)
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status of an upload job, including its result once finished."""
+    try:
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict()), 200
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error fetching job: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve job from database'}), 500
+
+
+def presigned_download_url(s3_key):
+    """
+    Return a presigned GET URL for an S3 object and when it expires, reusing a
+    recently signed one.
+
+    Returns:
+        Tuple of (URL, expiry as an aware datetime)
+    """
+    cached = presigned_url_cache.get(s3_key)
+    if cached is not None:
+        return cached
+    expires_at = datetime.now(UTC) + timedelta(seconds=settings.PRESIGNED_URL_EXPIRY)
+    presigned_url = services.get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': settings.AWS_BUCKET_NAME,
+            'Key': s3_key
+        },
+        ExpiresIn=settings.PRESIGNED_URL_EXPIRY
+    )
+    presigned_url_cache.set(s3_key, (presigned_url, expires_at))
+    return presigned_url, expires_at
+
+
+@bp.route('/documents/<int:document_id>/download', methods=['GET'])
+def get_download_url(document_id):
+    try:
+        # Get document from database
+        document = Document.query.get_or_404(document_id)
+
+        presigned_url, _ = presigned_download_url(document_s3_key(document.s3_key, document.s3_url))
+        
+        return jsonify({
+            'download_url': presigned_url
+        }), 200
+        
+    except ClientError as e:
+        error_message = str(e)
+        logger.error(f"AWS S3 Error generating download URL: {error_message}")
+        return jsonify({'error': f'AWS S3 Error: {error_message}'}), 500
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error generating download URL: {error_message}")
+        return jsonify({'error': error_message}), 500
+
+
+@bp.route('/documents/download-urls', methods=['GET'])
+def get_download_urls():
+    """
+    Presigned download URLs for many documents in one call.
+
+    Query parameters:
+        ids: Document ids, repeated (?ids=1&ids=2) or comma-separated (?ids=1,2);
+            at most MAX_DOWNLOAD_URL_BATCH
+
+    URLs come from the same cache as the single-document endpoint. Each carries its
+    expiry; ids without a document are listed under 'missing'.
+    """
+    try:
+        try:
+            ids = list(dict.fromkeys(
+                int(value) for param in request.args.getlist('ids') for value in param.split(',') if value.strip()
+            ))
+        except ValueError:
+            raise ValueError('ids must be integers')
+        if not ids:
+            raise ValueError('At least one document id is required')
+        if len(ids) > MAX_DOWNLOAD_URL_BATCH:
+            raise ValueError(f'At most {MAX_DOWNLOAD_URL_BATCH} document ids are accepted per request')
+
+        rows = db.session.execute(
+            db.select(Document.id, Document.s3_key, Document.s3_url).where(Document.id.in_(ids))
+        ).all()
+        download_urls = {}
+        for row in rows:
+            presigned_url, expires_at = presigned_download_url(document_s3_key(row.s3_key, row.s3_url))
+            download_urls[str(row.id)] = {
+                'download_url': presigned_url,
+                'expires_at': expires_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+            }
+        return jsonify({
+            'download_urls': download_urls,
+            'missing': [document_id for document_id in ids if str(document_id) not in download_urls]
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        error_message = str(e)
+        logger.error(f"AWS S3 Error generating download URLs: {error_message}")
+        return jsonify({'error': f'AWS S3 Error: {error_message}'}), 500
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error getting download URLs: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve documents from database'}), 500
+
+
+@bp.route('/documents/', methods=['GET'])
+def get_documents():
+    """
+    List documents, newest first.
+
+    Supports page/limit offset pagination and, for deep listings, keyset pagination:
+    pass cursor= (empty for the first page) and follow nextCursor from each response.
+    """
+    try:
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 10))
+        cursor = request.args.get('cursor')
+        
+        # Validate pagination parameters
+        if page < 1:
+            return jsonify({'error': 'Page number must be greater than 0'}), 400
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+        
+        # Get total count of documents
+        total_documents = _total_documents()
+        total_pages = (total_documents + limit - 1) // limit  # Ceiling division
+        
+        query = Document.query.order_by(Document.upload_timestamp.desc(), Document.id.desc())
+        if cursor is None:
+            # Calculate skip value for pagination
+            skip = (page - 1) * limit
+            documents = query.offset(skip).limit(limit).all()
+            next_cursor = None
+        else:
+            # Keyset pagination: seek past the last row of the previous page via the
+            # (upload_timestamp, id) index instead of scanning skipped rows
+            if cursor:
+                last_timestamp, last_id = _decode_cursor(cursor)
+                query = query.filter(
+                    db.tuple_(Document.upload_timestamp, Document.id) < (last_timestamp, last_id)
+                )
+            documents = query.limit(limit + 1).all()
+            next_cursor = _encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+            documents = documents[:limit]
+        
+        # Convert documents to JSON format
+        documents_json = [{
+            'id': doc.id,
+            'filename': doc.filename,
+            'classification': doc.classification,
+            'confidence': round(doc.confidence * 100, 2),
+            'upload_timestamp': doc.upload_timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            's3_url': doc.s3_url
+        } for doc in documents]
+        
+        response = {
+            'documents': documents_json,
+            'totalPages': total_pages
+        }
+        if cursor is not None:
+            response['nextCursor'] = next_cursor
+        return jsonify(response), 200
+        
+    except ValueError as e:
+        error_message = str(e)
+        logger.error(f"Invalid pagination parameters: {error_message}")
+        return jsonify({'error': error_message}), 400
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error getting documents: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve documents from database'}), 500
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error getting documents: {error_message}")
+        return jsonify({'error': error_message}), 500
+
+
+@bp.route('/documents/search', methods=['GET'])
+def search_documents():
+    """
+    Full-text search over the extracted text of documents, best matches first.
+
+    Query parameters:
+        q: Words to search for; documents must contain all of them
+        classification: Only return documents in this category (repeatable)
+        page: Page number (default: 1)
+        limit: Results per page, 1-100 (default: 10)
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        classifications = request.args.getlist('classification')
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 10))
+
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        if page < 1:
+            return jsonify({'error': 'Page number must be greater than 0'}), 400
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+
+        results, has_more = search.search_documents(query, classifications, page, limit)
+        return jsonify({
+            'documents': results,
+            'page': page,
+            'hasMore': has_more
+        }), 200
+
+    except ValueError as e:
+        error_message = str(e)
+        logger.error(f"Invalid search parameters: {error_message}")
+        return jsonify({'error': error_message}), 400
+    except search.SearchUnsupported as e:
+        return jsonify({'error': str(e)}), 501
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error searching documents: {str(e)}")
+        return jsonify({'error': 'Failed to search documents'}), 500
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error searching documents: {error_message}")
+        return jsonify({'error': error_message}), 500
+
+
+def _total_documents():
+    """Return the cached total document count, recounting after the TTL expires."""
+    total = document_count_cache.get('documents')
+    if total is None:
+        total = Document.query.count()
+        document_count_cache.set('documents', total)
+    return total
+
+
+def _encode_cursor(document):
+    """Encode the keyset position of a document as an opaque cursor."""
+    position = f"{document.upload_timestamp.isoformat()}|{document.id}"
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor into (upload_timestamp, id)."""
+    try:
+        timestamp, document_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(document_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+@bp.route('/documents/stats', methods=['GET'])
+def get_documents_stats():
+    """
+    Get aggregated document statistics from the stats rollup.
+
+    Query parameters:
+        start: ISO date/time, inclusive (optional)
+        end: ISO date/time, exclusive (optional)
+        granularity: Timeline bucket size: hour, day, week or month (default: day)
+    """
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in stats.GRANULARITIES:
+            return jsonify({'error': f'Granularity must be one of: {", ".join(stats.GRANULARITIES)}'}), 400
+
+        start = _parse_datetime_arg('start')
+        end = _parse_datetime_arg('end')
+        if start and end and start >= end:
+            return jsonify({'error': 'start must be before end'}), 400
+
+        return jsonify({
+            'status': 'success',
+            **stats.query_stats(start, end, granularity)
+        }), 200
+        
+    except ValueError as e:
+        error_message = str(e)
+        logger.error(f"Invalid stats parameters: {error_message}")
+        return jsonify({'error': error_message}), 400
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error fetching document stats: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve document statistics from database'}), 500
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error fetching document stats: {error_message}")
+        return jsonify({'error': error_message}), 500
+
+
+def _parse_datetime_arg(name):
+    """Parse an ISO 8601 query parameter into a naive UTC datetime."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}: expected an ISO 8601 date or date-time')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+    return parsed
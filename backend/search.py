@@ -0,0 +1,310 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import re
+import time
+import zlib
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import db, Document, DocumentText
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SEARCH_DIALECTS = ('sqlite', 'postgresql')
+
+# SQLite: contentless FTS5 table keyed by document id; the text itself lives
+# compressed in document_texts, so the index stores only its token lists
+SQLITE_SEARCH_TABLE = 'document_search'
+# Postgres: tsvector column on document_texts with a GIN index
+POSTGRES_SEARCH_COLUMN = 'search_vector'
+POSTGRES_SEARCH_CONFIG = 'english'
+
+_TOKEN = re.compile(r'\w+')
+
+# Seconds before a missing text table or search index is looked for again
+_READY_RECHECK = 60.0
+_ready = False
+_ready_checked_at = 0.0
+
+
+class SearchUnsupported(RuntimeError):
+    """Raised when full-text search is used on a database other than SQLite or Postgres."""
+
+    def __init__(self, dialect: str):
+        super().__init__(f"Full-text search is not supported on {dialect}")
+
+
+class CompressedText:
+    """zlib-compressed UTF-8 text plus its length in characters."""
+
+    def __init__(self, data: bytes, length: int):
+        self.data = data
+        self.length = length
+
+    def text(self) -> str:
+        return zlib.decompress(self.data).decode('utf-8')
+
+
+class TextCompressor:
+    """
+    Compresses text incrementally as it is written.
+
+    Extracted text is fed in piece by piece while the document is classified, so
+    only the compressed form is ever held in full.
+    """
+
+    def __init__(self, level: Optional[int] = None):
+        self._compressor = zlib.compressobj(settings.TEXT_COMPRESSION_LEVEL if level is None else level)
+        self._chunks: List[bytes] = []
+        self.length = 0
+
+    def write(self, piece: str) -> None:
+        self.length += len(piece)
+        chunk = self._compressor.compress(piece.encode('utf-8'))
+        if chunk:
+            self._chunks.append(chunk)
+
+    def finish(self) -> CompressedText:
+        self._chunks.append(self._compressor.flush())
+        return CompressedText(b''.join(self._chunks), self.length)
+
+
+def _dialect(session: Optional[Session] = None) -> str:
+    return (session or db.session).get_bind().dialect.name
+
+
+def ensure_search_index() -> None:
+    """Create the full-text index for the configured database, if supported and missing."""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} "
+            "USING fts5(content, content='', tokenize='unicode61 remove_diacritics 2')"
+        ))
+    elif dialect == 'postgresql':
+        db.session.execute(text(
+            f"ALTER TABLE {DocumentText.__tablename__} ADD COLUMN IF NOT EXISTS {POSTGRES_SEARCH_COLUMN} tsvector"
+        ))
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{DocumentText.__tablename__}_{POSTGRES_SEARCH_COLUMN} "
+            f"ON {DocumentText.__tablename__} USING GIN ({POSTGRES_SEARCH_COLUMN})"
+        ))
+    else:
+        logger.warning(f"Full-text search is not supported on {dialect}; extracted text is stored without an index")
+    db.session.commit()
+
+
+def _storage_ready(session: Optional[Session] = None) -> bool:
+    """
+    Whether the text table and search index exist (i.e. `flask init-db` has run).
+
+    Until they do, uploads skip storing text instead of failing. The answer is
+    cached; a negative one is re-checked every minute.
+    """
+    global _ready, _ready_checked_at
+    if _ready or time.monotonic() - _ready_checked_at < _READY_RECHECK:
+        return _ready
+    _ready_checked_at = time.monotonic()
+
+    inspector = inspect((session or db.session).get_bind())
+    ready = inspector.has_table(DocumentText.__tablename__)
+    dialect = _dialect(session)
+    if ready and dialect == 'sqlite':
+        ready = inspector.has_table(SQLITE_SEARCH_TABLE)
+    elif ready and dialect == 'postgresql':
+        columns = inspector.get_columns(DocumentText.__tablename__)
+        ready = any(column['name'] == POSTGRES_SEARCH_COLUMN for column in columns)
+    if not ready:
+        logger.warning("Document text table or search index missing; run `flask init-db` to enable search")
+    _ready = ready
+    return ready
+
+
+def store_texts(entries: Iterable[Tuple[int, CompressedText]], session: Optional[Session] = None) -> None:
+    """
+    Store and index extracted document text in the caller's session.
+
+    Runs before the caller's commit, so text and index entries commit together
+    with their documents.
+
+    Args:
+        entries: (document_id, compressed text) pairs
+        session: Session to run in. Defaults to db.session
+    """
+    session = session or db.session
+    entries = [(document_id, compressed) for document_id, compressed in entries if compressed is not None]
+    if not entries or not _storage_ready(session):
+        return
+
+    session.add_all(
+        DocumentText(document_id=document_id, compressed_text=compressed.data, text_length=compressed.length)
+        for document_id, compressed in entries
+    )
+    session.flush()
+    _index(
+        [(document_id, compressed.text()[:settings.SEARCH_MAX_INDEXED_CHARS]) for document_id, compressed in entries],
+        session
+    )
+
+
+def _index(entries: Sequence[Tuple[int, str]], session: Optional[Session] = None) -> None:
+    session = session or db.session
+    dialect = _dialect(session)
+    params = [{'document_id': document_id, 'content': content} for document_id, content in entries]
+    if dialect == 'sqlite':
+        session.execute(
+            text(f"INSERT INTO {SQLITE_SEARCH_TABLE} (rowid, content) VALUES (:document_id, :content)"),
+            params
+        )
+    elif dialect == 'postgresql':
+        session.execute(
+            text(
+                f"UPDATE {DocumentText.__tablename__} "
+                f"SET {POSTGRES_SEARCH_COLUMN} = to_tsvector('{POSTGRES_SEARCH_CONFIG}', :content) "
+                "WHERE document_id = :document_id"
+            ),
+            params
+        )
+
+
+def rebuild_search_index(batch_size: int = 500) -> int:
+    """
+    Rebuild the full-text index from the stored texts.
+
+    Returns:
+        Number of documents indexed
+    """
+    dialect = _dialect()
+    if dialect not in SEARCH_DIALECTS:
+        raise SearchUnsupported(dialect)
+    if dialect == 'sqlite':
+        # Contentless FTS5 tables can't delete rows individually; start over
+        db.session.execute(text(f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}"))
+    ensure_search_index()
+
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(DocumentText.document_id, DocumentText.compressed_text, DocumentText.text_length)
+            .where(DocumentText.document_id > last_id)
+            .order_by(DocumentText.document_id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        _index([
+            (document_id, CompressedText(data, length).text()[:settings.SEARCH_MAX_INDEXED_CHARS])
+            for document_id, data, length in rows
+        ])
+        db.session.commit()
+        count += len(rows)
+        last_id = rows[-1][0]
+    logger.info(f"Rebuilt search index from {count} documents")
+    return count
+
+
+def parse_query(query: str) -> List[str]:
+    """Split a search query into lowercase word tokens."""
+    return _TOKEN.findall(query.lower())
+
+
+def search_documents(query: str, classifications: Optional[Sequence[str]] = None,
+                     page: int = 1, limit: int = 10) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Find documents whose text matches every word of a query, best matches first.
+
+    Ranking is BM25 on SQLite and ts_rank_cd on Postgres. Only one page of rows is
+    fetched (plus one to tell whether more exist), and only that page's texts are
+    decompressed for snippets.
+
+    Args:
+        query: Words to search for
+        classifications: Only return documents in these categories
+        page: 1-based page number
+        limit: Results per page
+
+    Returns:
+        Tuple of (results in rank order, whether another page exists)
+    """
+    tokens = parse_query(query)
+    if not tokens:
+        raise ValueError('Search query must contain at least one word')
+
+    dialect = _dialect()
+    params: Dict[str, Any] = {'limit': limit + 1, 'offset': (page - 1) * limit}
+    filters = ''
+    if classifications:
+        filters = ' AND d.classification IN :classifications'
+        params['classifications'] = list(classifications)
+
+    if dialect == 'sqlite':
+        # Quote every token so user input can't form FTS5 syntax
+        params['match'] = ' '.join(f'"{token}"' for token in tokens)
+        statement = text(
+            f"SELECT d.id, bm25({SQLITE_SEARCH_TABLE}) AS rank FROM {SQLITE_SEARCH_TABLE} "
+            f"JOIN documents d ON d.id = {SQLITE_SEARCH_TABLE}.rowid "
+            f"WHERE {SQLITE_SEARCH_TABLE} MATCH :match{filters} "
+            "ORDER BY rank, d.id DESC LIMIT :limit OFFSET :offset"
+        )
+    elif dialect == 'postgresql':
+        # Quoted lexemes joined with & so every word is required, as on SQLite
+        params['query'] = ' & '.join(f"'{token}'" for token in tokens)
+        statement = text(
+            f"SELECT d.id, ts_rank_cd(t.{POSTGRES_SEARCH_COLUMN}, q) AS rank "
+            f"FROM {DocumentText.__tablename__} t JOIN documents d ON d.id = t.document_id, "
+            f"to_tsquery('{POSTGRES_SEARCH_CONFIG}', :query) q "
+            f"WHERE t.{POSTGRES_SEARCH_COLUMN} @@ q{filters} "
+            "ORDER BY rank DESC, d.id DESC LIMIT :limit OFFSET :offset"
+        )
+    else:
+        raise SearchUnsupported(dialect)
+    if classifications:
+        statement = statement.bindparams(bindparam('classifications', expanding=True))
+
+    rows = db.session.execute(statement, params).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], False
+
+    ids = [row[0] for row in rows]
+    documents = {document.id: document for document in Document.query.filter(Document.id.in_(ids))}
+    texts = dict(db.session.execute(
+        db.select(DocumentText.document_id, DocumentText.compressed_text).where(DocumentText.document_id.in_(ids))
+    ).all())
+
+    results = []
+    for document_id, rank in rows:
+        document = documents[document_id]
+        compressed = texts.get(document_id)
+        results.append({
+            'id': document.id,
+            'filename': document.filename,
+            'classification': document.classification,
+            'confidence': round(document.confidence * 100, 2),
+            'upload_timestamp': document.upload_timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            's3_url': document.s3_url,
+            # BM25 is lower-is-better; report higher-is-better on both databases
+            'rank': round(-rank if dialect == 'sqlite' else rank, 6),
+            'snippet': make_snippet(zlib.decompress(compressed).decode('utf-8'), tokens) if compressed else ''
+        })
+    return results, has_more
+
+
+def make_snippet(content: str, tokens: Sequence[str], width: int = 200) -> str:
+    """Return about `width` characters of text around the first occurrence of a query word."""
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(token) for token in tokens) + r')', re.IGNORECASE)
+    match = pattern.search(content)
+    center = match.start() if match else 0
+    start = max(0, center - width // 3)
+    end = min(len(content), start + width)
+    snippet = ' '.join(content[start:end].split())
+    if start > 0:
+        snippet = '…' + snippet
+    if end < len(content):
+        snippet += '…'
+    return snippet
@@ -0,0 +1,230 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from config import settings
+from database import db
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class Lazy(Generic[T]):
+    """
+    Thread-safe lazily constructed singleton.
+
+    The factory runs on the first get(), so importing the application does not pay
+    for clients (or the heavy libraries behind them) that a process may never use.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Return the instance, constructing it on first use."""
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+    def peek(self) -> Optional[T]:
+        """Return the instance if it has been constructed, without constructing it."""
+        return self._value
+
+
+def _create_s3_client():
+    import boto3
+
+    return boto3.client(
+        's3',
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION,
+        # Point at a local S3 stand-in (MinIO, moto server, LocalStack) when set
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL or None
+    )
+
+
+def _create_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+
+    # Multipart settings for large originals; parts are sent in parallel
+    return TransferConfig(
+        multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=settings.S3_MAX_CONCURRENCY
+    )
+
+
+def create_classifier(classifier_class: Optional[type] = None):
+    """Build the configured classifier with its caches; classifier_class defaults to DocumentClassifier."""
+    from caching import ResultCache, WindowCache
+    from similarity import SimilarityIndex
+
+    if classifier_class is None:
+        from ml_classifier import DocumentClassifier
+        classifier_class = DocumentClassifier
+
+    similarity_index = None
+    if settings.NEAR_DUPLICATE_THRESHOLD > 0:
+        similarity_index = SimilarityIndex(threshold=settings.NEAR_DUPLICATE_THRESHOLD)
+    return classifier_class(
+        result_cache=ResultCache(maxsize=settings.RESULT_CACHE_SIZE),
+        window_cache=WindowCache(
+            maxsize=settings.WINDOW_CACHE_SIZE,
+            ttl=settings.WINDOW_CACHE_TTL or None,
+            disk_path=settings.WINDOW_CACHE_PATH or None
+        ),
+        similarity_index=similarity_index
+    )
+
+
+s3_client = Lazy(_create_s3_client)
+s3_transfer_config = Lazy(_create_transfer_config)
+classifier = Lazy(create_classifier)
+
+
+def get_s3_client():
+    return s3_client.get()
+
+
+def get_s3_transfer_config():
+    return s3_transfer_config.get()
+
+
+def get_classifier():
+    return classifier.get()
+
+
+def check_database() -> None:
+    """Run a trivial query. Must be called inside an application context."""
+    db.session.execute(text('SELECT 1'))
+    db.session.rollback()
+
+
+def check_storage() -> None:
+    """Check that the upload bucket is reachable with the configured credentials."""
+    get_s3_client().head_bucket(Bucket=settings.AWS_BUCKET_NAME)
+
+
+def check_classifier() -> None:
+    """Construct the classifier and, for remote inference, check the endpoint answers."""
+    classifier = get_classifier()
+    if classifier.backend == 'local':
+        return
+    if classifier.client.breaker.state == 'open':
+        raise RuntimeError("Inference circuit breaker is open")
+    # Any HTTP answer means the endpoint is reachable (no inference is run), except
+    # gateway errors and 503, which the Inference API also sends while a model loads
+    response = classifier.session.head(classifier.api_url, timeout=settings.READY_CHECK_TIMEOUT)
+    if response.status_code in (502, 503, 504):
+        raise RuntimeError(f"Inference endpoint returned {response.status_code}")
+
+
+class ReadinessProbe:
+    """
+    Dependency checks for the readiness endpoint, run off the request path.
+
+    status() returns the latest results at once and, when they are older than the
+    check interval, starts a new round in the background. Checks run concurrently,
+    so a slow dependency delays only its own result, and one that does not answer
+    within the timeout is reported as failing. The first round also warms up the
+    lazily constructed clients.
+    """
+
+    def __init__(self, app, interval: float = 30.0, timeout: float = 5.0):
+        """
+        Initialize the probe.
+
+        Args:
+            app: Flask application whose context the database check runs in
+            interval: Seconds before results are refreshed
+            timeout: Seconds a check may take before it counts as failed
+        """
+        self.app = app
+        self.interval = interval
+        self.timeout = timeout
+        self.checks: Dict[str, Callable[[], None]] = {
+            'database': self._in_app_context(check_database),
+            'storage': check_storage,
+            'classifier': check_classifier
+        }
+        self._results: Optional[Dict[str, Dict[str, Any]]] = None
+        self._checked_at: Optional[datetime] = None
+        self._checked_monotonic = 0.0
+        self._running = False
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.checks), thread_name_prefix='readiness')
+
+    def _in_app_context(self, check: Callable[[], None]) -> Callable[[], None]:
+        def run():
+            with self.app.app_context():
+                check()
+        return run
+
+    @staticmethod
+    def _run_check(check: Callable[[], None]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            check()
+            error = None
+        except Exception as e:
+            error = str(e)
+        result = {'ok': error is None, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+        if error is not None:
+            result['error'] = error
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Return the latest check results, refreshing them in the background if stale.
+
+        Returns:
+            Dictionary with 'ready', 'checks' (per dependency) and 'checked_at'
+        """
+        with self._lock:
+            stale = self._results is None or time.monotonic() - self._checked_monotonic >= self.interval
+            if stale and not self._running:
+                self._running = True
+                threading.Thread(target=self._refresh, name='readiness-refresh', daemon=True).start()
+            results = self._results
+
+        if results is None:
+            return {'ready': False, 'checks': {}, 'checked_at': None}
+        return {
+            'ready': all(result['ok'] for result in results.values()),
+            'checks': results,
+            'checked_at': self._checked_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+        }
+
+    def _refresh(self) -> None:
+        try:
+            futures = {name: self._executor.submit(self._run_check, check) for name, check in self.checks.items()}
+            wait(futures.values(), timeout=self.timeout)
+
+            results = {}
+            for name, future in futures.items():
+                if not future.done():
+                    results[name] = {'ok': False, 'error': f"No answer within {self.timeout:g}s"}
+                else:
+                    results[name] = future.result()
+                if not results[name]['ok']:
+                    logger.warning(f"Readiness check {name} failed: {results[name]['error']}")
+
+            with self._lock:
+                self._results = results
+                self._checked_at = datetime.utcnow()
+                self._checked_monotonic = time.monotonic()
+        finally:
+            with self._lock:
+                self._running = False
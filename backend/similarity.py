@@ -0,0 +1,262 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import func, inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database import db, DocumentSignature, SignatureBucket
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Words per shingle
+SHINGLE_SIZE = 5
+# Hash functions per signature; BANDS * ROWS_PER_BAND must equal it
+NUM_PERMUTATIONS = 128
+# LSH banding: documents sharing all rows of any one band become candidates. With
+# 16 bands of 8 rows a pair at Jaccard similarity 0.9 is found with probability
+# 1 - (1 - 0.9 ** 8) ** 16 > 0.9999, one at 0.5 with about 0.06
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+# Candidates whose signatures are compared, most shared bands first
+MAX_CANDIDATES = 20
+
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SHIFT = np.uint64(32)
+_SHINGLE_MULTIPLIER = np.uint64(1000003)
+# Shingle hashes processed per numpy block, bounding memory on long documents
+_BLOCK_SIZE = 8192
+
+# Fixed seed: stored signatures are only comparable if every process permutes alike
+_generator = np.random.RandomState(1)
+_PERMUTATION_A = _generator.randint(0, 1 << 63, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERMUTATION_B = _generator.randint(0, 1 << 63, NUM_PERMUTATIONS, dtype=np.uint64)
+
+# Seconds before missing signature tables are looked for again
+_READY_RECHECK = 60.0
+_ready = False
+_ready_checked_at = 0.0
+
+
+class Signature:
+    """MinHash signature of a document, scoped to the classifier configuration that produced its result."""
+
+    def __init__(self, values: np.ndarray, scope: str):
+        self.values = values
+        self.scope = scope
+
+    def similarity(self, other: np.ndarray) -> float:
+        """Estimate the Jaccard similarity of the two documents' shingle sets."""
+        return float(np.mean(self.values == other))
+
+    def buckets(self) -> List[int]:
+        """LSH bucket of each band, as signed 64-bit integers."""
+        buckets = []
+        for band in range(BANDS):
+            rows = self.values[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+            digest = hashlib.blake2b(
+                self.scope.encode('ascii') + bytes([band]) + rows.tobytes(), digest_size=8
+            ).digest()
+            buckets.append(int.from_bytes(digest, 'big', signed=True))
+        return buckets
+
+    def to_bytes(self) -> bytes:
+        return self.values.astype('<u4').tobytes()
+
+    @staticmethod
+    def values_from_bytes(data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype='<u4').astype(np.uint64)
+
+
+class MinHasher:
+    """
+    Builds a MinHash signature over word shingles of text fed in piece by piece.
+
+    Pieces are treated as joined by single spaces, so shingles span piece
+    boundaries and the signature doesn't depend on how the text was split.
+    """
+
+    def __init__(self):
+        self._minimums = np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+        # Word hashes of the last SHINGLE_SIZE - 1 words, which start shingles ending in the next piece
+        self._carry = np.empty(0, dtype=np.uint64)
+        self._blocks: List[np.ndarray] = []
+        self._pending = 0
+        self.shingles = 0
+
+    def update(self, piece: str) -> None:
+        words = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in piece.split()), dtype=np.uint64)
+        words = np.concatenate((self._carry, words))
+        count = len(words) - SHINGLE_SIZE + 1
+        if count > 0:
+            # Polynomial hash of each run of SHINGLE_SIZE word hashes, vectorized over the piece
+            hashes = np.zeros(count, dtype=np.uint64)
+            for offset in range(SHINGLE_SIZE):
+                hashes = (hashes * _SHINGLE_MULTIPLIER + words[offset:offset + count]) & _MAX_HASH
+            self._blocks.append(hashes)
+            self._pending += count
+        self._carry = words[-(SHINGLE_SIZE - 1):]
+        if self._pending >= _BLOCK_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._blocks:
+            return
+        hashes = np.concatenate(self._blocks)
+        self._blocks = []
+        self._pending = 0
+        self.shingles += len(hashes)
+        for start in range(0, len(hashes), _BLOCK_SIZE):
+            block = hashes[start:start + _BLOCK_SIZE]
+            # Multiply-shift hashing: the top 32 bits of (a * x + b) mod 2^64 (odd a), one
+            # row per permutation; avoids a 64-bit modulo per shingle and permutation
+            permuted = np.multiply.outer(_PERMUTATION_A, block)
+            permuted += _PERMUTATION_B[:, None]
+            permuted >>= _SHIFT
+            np.minimum(self._minimums, permuted.min(axis=1), out=self._minimums)
+
+    def signature(self, scope: str) -> Optional[Signature]:
+        """
+        Return the signature of the text seen so far.
+
+        A document shorter than one shingle has no signature.
+        """
+        self._flush()
+        if not self.shingles:
+            return None
+        return Signature(self._minimums.copy(), scope)
+
+
+def _storage_ready(session: Optional[Session] = None) -> bool:
+    """Whether the signature tables exist; a negative answer is re-checked every minute."""
+    global _ready, _ready_checked_at
+    if _ready or time.monotonic() - _ready_checked_at < _READY_RECHECK:
+        return _ready
+    _ready_checked_at = time.monotonic()
+
+    inspector = inspect((session or db.session).get_bind())
+    ready = inspector.has_table(DocumentSignature.__tablename__) and inspector.has_table(SignatureBucket.__tablename__)
+    if not ready:
+        logger.warning("Document signature tables missing; run `flask init-db` to enable near-duplicate detection")
+    _ready = ready
+    return ready
+
+
+class SimilarityIndex:
+    """
+    Finds stored documents that are near duplicates of a new one.
+
+    Signatures live in document_signatures together with the result they were
+    classified with; their LSH band buckets live in signature_buckets, indexed, so a
+    lookup reads only the documents sharing a bucket instead of scanning the corpus.
+    Requires an active Flask application context.
+    """
+
+    def __init__(self, threshold: float = 0.9):
+        """
+        Initialize the index.
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity for a stored document's
+                result to be reused
+        """
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def find(self, signature: Signature) -> Optional[Dict[str, Any]]:
+        """
+        Look up the most similar stored document at or above the threshold.
+
+        Args:
+            signature: Signature of the new document
+
+        Returns:
+            A result dict reusing the stored document's classification, with
+            near_duplicate set to its document id and similarity, or None
+        """
+        try:
+            if not _storage_ready():
+                return None
+            candidates = db.session.execute(
+                db.select(SignatureBucket.document_id)
+                .where(SignatureBucket.bucket.in_(signature.buckets()))
+                .group_by(SignatureBucket.document_id)
+                .order_by(func.count().desc())
+                .limit(MAX_CANDIDATES)
+            ).scalars().all()
+            if not candidates:
+                self.misses += 1
+                return None
+            entries = db.session.execute(
+                db.select(DocumentSignature)
+                .where(DocumentSignature.document_id.in_(candidates), DocumentSignature.scope == signature.scope)
+            ).scalars().all()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.warning(f"Near-duplicate lookup failed: {str(e)}")
+            self.misses += 1
+            return None
+
+        best, best_similarity = None, 0.0
+        for entry in entries:
+            similarity = signature.similarity(Signature.values_from_bytes(entry.signature))
+            if similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        if best is None or best_similarity < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return {
+            'category': best.category,
+            'confidence': best.confidence,
+            'all_scores': best.all_scores,
+            'statistics': {},
+            'raw_result': [],
+            'cached': True,
+            'near_duplicate': {'document_id': best.document_id, 'similarity': round(best_similarity, 4)}
+        }
+
+    def add(self, entries: Iterable[Tuple[int, Dict[str, Any]]], session: Optional[Session] = None) -> None:
+        """
+        Store the signatures of newly saved documents in the caller's session.
+
+        Runs before the caller's commit, so signatures commit together with their
+        documents. Results without a signature (cache hits, fallback results, text
+        too short to shingle) are skipped.
+
+        Args:
+            entries: (document_id, classification result) pairs
+            session: Session to run in. Defaults to db.session
+        """
+        session = session or db.session
+        entries = [(document_id, result) for document_id, result in entries if result.get('signature') is not None]
+        if not entries or not _storage_ready(session):
+            return
+
+        for document_id, result in entries:
+            signature = result['signature']
+            # Round-trip through JSON so numpy scalars are stored as plain floats
+            all_scores = json.loads(json.dumps(result['all_scores'], default=float))
+            session.add(DocumentSignature(
+                document_id=document_id,
+                scope=signature.scope,
+                signature=signature.to_bytes(),
+                category=result['category'],
+                confidence=float(result['confidence']),
+                all_scores=all_scores
+            ))
+            session.add_all(
+                SignatureBucket(bucket=bucket, document_id=document_id) for bucket in set(signature.buckets())
+            )
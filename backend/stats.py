@@ -0,0 +1,237 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+import logging
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import db, Document, DocumentStatsRollup
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+CONFIDENCE_BINS = 10
+
+
+def confidence_bin(confidence: float) -> int:
+    """Map a 0-1 confidence to its histogram bin (10% wide)."""
+    return min(max(int(confidence * CONFIDENCE_BINS), 0), CONFIDENCE_BINS - 1)
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    """Truncate a timestamp to the start of its hour."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def truncate(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its bucket."""
+    timestamp = hour_bucket(timestamp)
+    if granularity == 'hour':
+        return timestamp
+    timestamp = timestamp.replace(hour=0)
+    if granularity == 'week':
+        return timestamp - timedelta(days=timestamp.weekday())
+    if granularity == 'month':
+        return timestamp.replace(day=1)
+    return timestamp
+
+
+def record_document(classification: str, confidence: float, timestamp: datetime, delta: int = 1,
+                    session: Optional[Session] = None) -> None:
+    """
+    Add a document to (or, with delta=-1, remove it from) the stats rollup.
+
+    Runs in the caller's session so the rollup commits together with the document.
+
+    Args:
+        classification: Document category
+        confidence: Classification confidence (0-1)
+        timestamp: Upload timestamp
+        delta: +1 to count the document, -1 to uncount it
+        session: Session to run in. Defaults to db.session
+    """
+    record_documents([(classification, confidence, timestamp)], delta=delta, session=session)
+
+
+def record_documents(documents: Iterable[Tuple[str, float, datetime]], delta: int = 1,
+                     session: Optional[Session] = None) -> None:
+    """
+    Add documents to (or, with delta=-1, remove them from) the stats rollup.
+
+    Documents sharing a rollup row are summed first, so a batch costs one upsert
+    per row it touches, sent as a single executemany.
+
+    Args:
+        documents: (classification, confidence, upload timestamp) tuples
+        delta: +1 to count the documents, -1 to uncount them
+        session: Session to run in. Defaults to db.session
+    """
+    session = session or db.session
+    totals = {}
+    for classification, confidence, timestamp in documents:
+        key = (hour_bucket(timestamp), classification, confidence_bin(confidence))
+        document_count, confidence_sum = totals.get(key, (0, 0.0))
+        totals[key] = (document_count + delta, confidence_sum + delta * confidence)
+    if not totals:
+        return
+    rows = [
+        {
+            'bucket_start': bucket_start,
+            'classification': classification,
+            'confidence_bin': bin_index,
+            'document_count': document_count,
+            'confidence_sum': confidence_sum
+        }
+        for (bucket_start, classification, bin_index), (document_count, confidence_sum) in totals.items()
+    ]
+    key_columns = ['bucket_start', 'classification', 'confidence_bin']
+
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        # Table-level insert: one statement compiled once and executed with every row's parameters
+        statement = insert(DocumentStatsRollup.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={
+                'document_count': DocumentStatsRollup.document_count + statement.excluded.document_count,
+                'confidence_sum': DocumentStatsRollup.confidence_sum + statement.excluded.confidence_sum
+            }
+        )
+        session.execute(statement, rows)
+        return
+
+    for values in rows:
+        updated = session.execute(
+            update(DocumentStatsRollup)
+            .where(*[getattr(DocumentStatsRollup, column) == values[column] for column in key_columns])
+            .values(
+                document_count=DocumentStatsRollup.document_count + values['document_count'],
+                confidence_sum=DocumentStatsRollup.confidence_sum + values['confidence_sum']
+            )
+        )
+        if updated.rowcount == 0:
+            session.add(DocumentStatsRollup(**values))
+
+
+def rebuild_rollups(batch_size: int = 1000) -> int:
+    """
+    Recompute the stats rollup from the documents table.
+
+    Returns:
+        Number of documents counted
+    """
+    db.session.query(DocumentStatsRollup).delete()
+
+    totals = {}
+    count = 0
+    rows = db.session.execute(
+        db.select(Document.classification, Document.confidence, Document.upload_timestamp)
+        .execution_options(yield_per=batch_size)
+    )
+    for classification, confidence, timestamp in rows:
+        key = (hour_bucket(timestamp), classification, confidence_bin(confidence))
+        document_count, confidence_sum = totals.get(key, (0, 0.0))
+        totals[key] = (document_count + 1, confidence_sum + confidence)
+        count += 1
+
+    db.session.add_all(
+        DocumentStatsRollup(
+            bucket_start=bucket_start,
+            classification=classification,
+            confidence_bin=bin_index,
+            document_count=document_count,
+            confidence_sum=confidence_sum
+        )
+        for (bucket_start, classification, bin_index), (document_count, confidence_sum) in totals.items()
+    )
+    db.session.commit()
+    logger.info(f"Rebuilt stats rollup from {count} documents into {len(totals)} rows")
+    return count
+
+
+def query_stats(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                granularity: str = 'day') -> Dict[str, Any]:
+    """
+    Aggregate the stats rollup for a date range.
+
+    Cost depends on the number of hourly rollup rows in the range, not on the number
+    of documents.
+
+    Args:
+        start: Inclusive lower bound on upload time
+        end: Exclusive upper bound on upload time
+        granularity: Timeline bucket size, one of GRANULARITIES
+
+    Returns:
+        Totals, per-classification breakdown, confidence histogram and timeline
+    """
+    filters = [DocumentStatsRollup.document_count != 0]
+    if start is not None:
+        filters.append(DocumentStatsRollup.bucket_start >= hour_bucket(start))
+    if end is not None:
+        filters.append(DocumentStatsRollup.bucket_start < end)
+
+    count = func.sum(DocumentStatsRollup.document_count)
+    confidence_sum = func.sum(DocumentStatsRollup.confidence_sum)
+
+    by_classification = db.session.execute(
+        db.select(DocumentStatsRollup.classification, count, confidence_sum)
+        .where(*filters)
+        .group_by(DocumentStatsRollup.classification)
+        .order_by(DocumentStatsRollup.classification)
+    ).all()
+
+    histogram = dict(db.session.execute(
+        db.select(DocumentStatsRollup.confidence_bin, count)
+        .where(*filters)
+        .group_by(DocumentStatsRollup.confidence_bin)
+    ).all())
+
+    # Hourly buckets are folded into the requested granularity here
+    timeline = {}
+    for bucket_start, classification, bucket_count in db.session.execute(
+        db.select(DocumentStatsRollup.bucket_start, DocumentStatsRollup.classification, count)
+        .where(*filters)
+        .group_by(DocumentStatsRollup.bucket_start, DocumentStatsRollup.classification)
+    ):
+        bucket = timeline.setdefault(truncate(bucket_start, granularity), {})
+        bucket[classification] = bucket.get(classification, 0) + bucket_count
+
+    total_documents = sum(row[1] for row in by_classification)
+    total_confidence = sum(row[2] for row in by_classification)
+
+    return {
+        'granularity': granularity,
+        'start': start.strftime('%Y-%m-%dT%H:%M:%SZ') if start else None,
+        'end': end.strftime('%Y-%m-%dT%H:%M:%SZ') if end else None,
+        'total_documents': total_documents,
+        'average_confidence': round(total_confidence / total_documents * 100, 2) if total_documents else 0,
+        'by_classification': [
+            {
+                'classification': classification,
+                'count': classification_count,
+                'average_confidence': round(classification_confidence / classification_count * 100, 2)
+            }
+            for classification, classification_count, classification_confidence in by_classification
+            if classification_count
+        ],
+        'confidence_histogram': [
+            {
+                'lower': bin_index * 100 // CONFIDENCE_BINS,
+                'upper': (bin_index + 1) * 100 // CONFIDENCE_BINS,
+                'count': histogram.get(bin_index, 0)
+            }
+            for bin_index in range(CONFIDENCE_BINS)
+        ],
+        'timeline': [
+            {
+                'bucket': bucket_start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'count': sum(counts.values()),
+                'by_classification': counts
+            }
+            for bucket_start, counts in sorted(timeline.items())
+        ]
+    }
@@ -0,0 +1,58 @@
+"""
+Train the local hashed n-gram classifier from the bundled Dataset/ files.
+
+Usage:
+    python train_local_model.py --dataset ../Dataset --output local_model.npz
+
+Labels are read from a JSON manifest mapping file names to categories
+(Dataset/labels.json by default). Files missing from the manifest are skipped.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+from config import settings
+from local_classifier import HashedNgramClassifier
+from ml_classifier import DocumentClassifier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local document classifier")
+    parser.add_argument('--dataset', default=os.path.join('..', 'Dataset'), help="Directory of training documents")
+    parser.add_argument('--labels', default=None, help="JSON manifest of file name -> category (default: <dataset>/labels.json)")
+    parser.add_argument('--output', default=settings.LOCAL_MODEL_PATH, help="Where to write the trained model")
+    parser.add_argument('--features', type=int, default=2 ** 18, help="Size of the hashed feature space")
+    args = parser.parse_args()
+
+    labels_path = args.labels or os.path.join(args.dataset, 'labels.json')
+    with open(labels_path) as f:
+        manifest = json.load(f)
+
+    # Reuse the serving pipeline so training windows match inference windows exactly
+    classifier = DocumentClassifier(backend='remote')
+    samples = []
+    for filename, label in sorted(manifest.items()):
+        path = os.path.join(args.dataset, filename)
+        file_ext = os.path.splitext(filename)[1].lower()
+        if not os.path.exists(path):
+            logger.warning(f"Skipping missing file: {filename}")
+            continue
+        with open(path, 'rb') as f:
+            text = classifier.extract_text_from_file(f.read(), file_ext)
+        windows = classifier.create_sliding_windows(classifier.preprocess_text(text))
+        samples.extend((window_text, label) for window_text, _, _ in windows)
+        logger.info(f"{filename}: {len(windows)} windows labelled '{label}'")
+
+    start = time.perf_counter()
+    model = HashedNgramClassifier.train(samples, classifier.categories, n_features=args.features)
+    model.save(args.output)
+    logger.info(f"Saved model to {args.output} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+import hashlib
+import io
+import logging
+import mmap
+import os
+import tempfile
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Bytes copied per read when spooling a stream to disk or hashing a mapped file
+COPY_BLOCK_SIZE = 1024 * 1024
+# Bytes (or pages' worth) read through a MappedReader between releases of the mapping's resident pages
+RELEASE_INTERVAL = 8 * 1024 * 1024
+
+# Upload content as the pipeline sees it: bytes, or a read-only map of a spooled file
+UploadContent = Union[bytes, mmap.mmap]
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds UPLOAD_MAX_BYTES."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File is too large. The limit is {limit} bytes.")
+        self.limit = limit
+
+
+def release_pages(content: UploadContent) -> None:
+    """
+    Drop a mapped upload's pages from the process's resident set.
+
+    The file stays mapped and the pages stay in the page cache; touching them again
+    faults them back in. A no-op for bytes and where madvise is unavailable.
+    """
+    if isinstance(content, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+        content.madvise(mmap.MADV_DONTNEED)
+
+
+class MappedReader(io.RawIOBase):
+    """
+    Seekable read-only file object over a memory-mapped upload.
+
+    Each reader keeps its own position, so the S3 upload and the parsers can read
+    the same mapping concurrently. Every RELEASE_INTERVAL bytes read, the mapping's
+    resident pages are released, so reading a file end to end doesn't grow the
+    process's resident set by the file size.
+    """
+
+    def __init__(self, mapped: mmap.mmap):
+        self._mapped = mapped
+        self._position = 0
+        self._unreleased = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        # Slicing copies, but holds no buffer export that would stop the map from closing
+        count = max(0, min(len(buffer), len(self._mapped) - self._position))
+        buffer[:count] = self._mapped[self._position:self._position + count]
+        self._position += count
+        # Count whole pages: small scattered reads (PDF parsing) still fault in a page each
+        self._unreleased += max(count, mmap.PAGESIZE)
+        if self._unreleased >= RELEASE_INTERVAL:
+            release_pages(self._mapped)
+            self._unreleased = 0
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._mapped)
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+
+def open_content(content: UploadContent) -> BinaryIO:
+    """Open upload content as a binary file object with its own position, without copying it."""
+    if isinstance(content, mmap.mmap):
+        # Unbuffered: parsers seek around a lot, and a buffer would be refilled on every seek
+        return MappedReader(content)
+    # BytesIO over bytes shares the buffer until written to, so this is not a copy
+    return io.BytesIO(content)
+
+
+def content_sha256(content: UploadContent) -> str:
+    """Hex SHA-256 of upload content; mapped files are hashed block by block."""
+    if not isinstance(content, mmap.mmap):
+        return hashlib.sha256(content).hexdigest()
+    hasher = hashlib.sha256()
+    with open_content(content) as reader:
+        for block in iter(lambda: reader.read(COPY_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def is_blank(content: UploadContent) -> bool:
+    """Whether upload content is empty or whitespace only."""
+    if not isinstance(content, mmap.mmap):
+        return not content.strip()
+    with open_content(content) as reader:
+        for block in iter(lambda: reader.read(COPY_BLOCK_SIZE), b''):
+            if block.strip():
+                return False
+    return True
+
+
+def stream_size(stream: BinaryIO) -> int:
+    """Size of a seekable stream in bytes; leaves it positioned at the start."""
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def check_size(size: Optional[int]) -> None:
+    """Reject an upload whose (declared) size exceeds UPLOAD_MAX_BYTES."""
+    if settings.UPLOAD_MAX_BYTES and size is not None and size > settings.UPLOAD_MAX_BYTES:
+        raise UploadTooLarge(settings.UPLOAD_MAX_BYTES)
+
+
+@contextmanager
+def load_upload(stream: BinaryIO, size: Optional[int] = None) -> Iterator[UploadContent]:
+    """
+    Load an upload within the per-file memory budget.
+
+    Uploads up to UPLOAD_MEMORY_BUDGET bytes are read into memory. Larger ones are
+    memory-mapped from disk instead: from the stream's own file when it has one
+    (Werkzeug spools large request files to a temporary file), otherwise from a
+    temporary file the stream is copied to block by block. Either way the content
+    is never held in memory as a whole.
+
+    Args:
+        stream: Binary stream positioned at the start of the upload
+        size: Size in bytes if known; unknown sizes are spooled
+
+    Yields:
+        bytes, or a read-only mmap valid until the context exits
+
+    Raises:
+        UploadTooLarge: If the upload exceeds UPLOAD_MAX_BYTES
+    """
+    check_size(size)
+    if size is not None and size <= settings.UPLOAD_MEMORY_BUDGET:
+        yield stream.read()
+        return
+
+    spooled = None
+    try:
+        try:
+            fileno = stream.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            spooled = tempfile.TemporaryFile(dir=settings.UPLOAD_SPOOL_DIR or None)
+            copied = 0
+            for block in iter(lambda: stream.read(COPY_BLOCK_SIZE), b''):
+                copied += len(block)
+                # Declared sizes (e.g. of archive members) can't be trusted
+                check_size(copied)
+                spooled.write(block)
+            spooled.flush()
+            fileno = spooled.fileno()
+
+        if os.fstat(fileno).st_size == 0:
+            # Empty files can't be mapped
+            yield b''
+            return
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        logger.info(f"Processing {len(mapped)}-byte upload from a memory-mapped file")
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+    finally:
+        if spooled is not None:
+            spooled.close()
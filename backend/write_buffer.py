@@ -0,0 +1,128 @@
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List, Sequence
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from database import db
+import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that groups the rows of concurrent requests into shared commits.
+
+    Requests hand their entries to submit() and wait on the returned future, while
+    one flusher thread writes everything queued in a single transaction: one
+    commit (and on SQLite one write lock, one WAL sync) for many requests instead
+    of one each. An entry waits at most max_delay for others to join its batch,
+    plus the commit in progress when it arrived.
+
+    If a batched commit fails, each request's entries are retried in a commit of
+    their own, so one bad request does not fail the others.
+    """
+
+    def __init__(self, app, writer: Callable[[Session, Sequence[Any]], List[Any]],
+                 batch_size: int = 200, max_delay: float = 0.005):
+        """
+        Initialize the buffer.
+
+        Args:
+            app: Flask application whose context the flusher runs in
+            writer: Adds entries to a session without committing and returns one
+                result per entry, in order
+            batch_size: Most entries written per commit
+            max_delay: Seconds the oldest queued entry waits for more to arrive
+        """
+        self.app = app
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._pending = deque()
+        self._pending_entries = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, entries: Sequence[Any]) -> Future:
+        """
+        Queue entries for the next commit.
+
+        Returns:
+            Future resolving to the writer's results for these entries once they are
+            committed, or raising the commit's exception
+        """
+        future = Future()
+        entries = list(entries)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name='write-buffer', daemon=True)
+                self._thread.start()
+            self._pending.append((time.monotonic(), entries, future))
+            self._pending_entries += len(entries)
+            self._condition.notify()
+        return future
+
+    def write(self, entries: Sequence[Any]) -> List[Any]:
+        """Queue entries and wait until they are committed. Returns the writer's results."""
+        return self.submit(entries).result()
+
+    def _flush_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                with self.app.app_context():
+                    self._flush(batch)
+            except Exception as e:
+                logger.error(f"Write buffer flush failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _next_batch(self):
+        """Wait for entries, then until batch_size are queued or the oldest has waited max_delay."""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][0] + self.max_delay
+            while self._pending_entries < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = []
+            size = 0
+            # A request's entries are never split; one larger than batch_size goes alone
+            while self._pending and (not batch or size + len(self._pending[0][1]) <= self.batch_size):
+                _, entries, future = self._pending.popleft()
+                batch.append((entries, future))
+                size += len(entries)
+            self._pending_entries -= size
+            return batch
+
+    def _flush(self, batch) -> None:
+        entries = [entry for request_entries, _ in batch for entry in request_entries]
+        try:
+            results = self.writer(db.session, entries)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logger.warning(f"Batched commit of {len(entries)} entries failed, retrying them per request: {str(e)}")
+            for item in batch:
+                self._flush([item])
+            return
+
+        metrics.DB_WRITE_BATCH_DOCUMENTS.observe(len(entries))
+        offset = 0
+        for request_entries, future in batch:
+            future.set_result(results[offset:offset + len(request_entries)])
+            offset += len(request_entries)
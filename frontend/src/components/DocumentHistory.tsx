@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { FileText } from 'lucide-react';
-import { getDocuments, getDownloadUrl, Document } from '../lib/api';
+import { getDocuments, getDownloadUrl, getDownloadUrls, Document, DownloadUrl } from '../lib/api';
 import { toast } from 'sonner';
 import {
   Card,
@@ -26,7 +26,10 @@ const DocumentHistory = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [retryCount, setRetryCount] = useState(0);
+  const [downloadUrls, setDownloadUrls] = useState<Record<number, DownloadUrl>>({});
   const MAX_RETRIES = 3;
+  // Don't hand out a prefetched URL this close to its expiry
+  const DOWNLOAD_URL_MARGIN_MS = 5000;
 
   useEffect(() => {
     fetchDocuments();
@@ -52,6 +55,7 @@ const DocumentHistory = () => {
 
       setDocuments(response.documents);
       setTotalPages(response.totalPages);
+      prefetchDownloadUrls(response.documents);
       
       // Reset retry count on success
       setRetryCount(0);
@@ -79,9 +83,24 @@ const DocumentHistory = () => {
     }
   };
 
+  const prefetchDownloadUrls = async (pageDocuments: Document[]) => {
+    if (pageDocuments.length === 0) {
+      return;
+    }
+    try {
+      // One request for the whole page; downloads fall back to the single endpoint
+      setDownloadUrls(await getDownloadUrls(pageDocuments.map(doc => doc.id)));
+    } catch (err) {
+      console.error('Error prefetching download URLs:', err);
+    }
+  };
+
   const handleDownload = async (documentId: number, filename: string) => {
     try {
-      const downloadUrl = await getDownloadUrl(documentId);
+      const prefetched = downloadUrls[documentId];
+      const downloadUrl = prefetched && new Date(prefetched.expires_at).getTime() - Date.now() > DOWNLOAD_URL_MARGIN_MS
+        ? prefetched.download_url
+        : await getDownloadUrl(documentId);
       window.open(downloadUrl, '_blank');
     } catch (err) {
       toast.error('Failed to download document');
@@ -5,7 +5,7 @@ import { ChartPie, TrendingUp, FileText } from 'lucide-react';
 import { DocumentStats as DocumentStatsType, getDocumentStats } from '../lib/api';
 
 const DocumentStats = () => {
-  const [stats, setStats] = useState<DocumentStatsType[]>([]);
+  const [stats, setStats] = useState<DocumentStatsType | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [retryCount, setRetryCount] = useState(0);
@@ -19,26 +19,11 @@ const DocumentStats = () => {
         const data = await getDocumentStats();
         
         // Validate data format
-        if (!Array.isArray(data)) {
+        if (!data || !Array.isArray(data.by_classification) || typeof data.total_documents !== 'number') {
           throw new Error('Invalid data format received from server');
         }
 
-        // Validate each stat entry
-        const validStats = data.filter(stat => {
-          return (
-            typeof stat.classification === 'string' &&
-            typeof stat.confidence === 'number' &&
-            !isNaN(stat.confidence) &&
-            stat.confidence >= 0 &&
-            stat.confidence <= 100
-          );
-        });
-
-        if (validStats.length === 0 && data.length > 0) {
-          throw new Error('No valid statistics data available');
-        }
-
-        setStats(validStats);
+        setStats(data);
         setRetryCount(0);
       } catch (err: any) {
         let errorMessage = 'Failed to fetch document statistics';
@@ -49,8 +34,6 @@ const DocumentStats = () => {
           errorMessage = 'Request timed out. Please try again.';
         } else if (err.message.includes('Invalid data format')) {
           errorMessage = 'Server returned invalid data format. Please try again later.';
-        } else if (err.message.includes('No valid statistics')) {
-          errorMessage = 'No valid statistics data available.';
         }
 
         setError(errorMessage);
@@ -69,46 +52,18 @@ const DocumentStats = () => {
     fetchStats();
   }, []);
 
-  // Calculate document type distribution with error handling
-  const typeDistribution = useMemo(() => {
-    try {
-      return stats.reduce((acc, doc) => {
-        if (doc.classification) {
-          acc[doc.classification] = (acc[doc.classification] || 0) + 1;
-        }
-        return acc;
-      }, {} as Record<string, number>);
-    } catch (err) {
-      console.error('Error calculating type distribution:', err);
-      return {};
-    }
-  }, [stats]);
-
+  // Document type distribution, aggregated server-side
   const distributionData = useMemo(() => {
-    try {
-      return Object.entries(typeDistribution).map(([classification, count]) => ({
-        classification,
-        count,
-      }));
-    } catch (err) {
-      console.error('Error formatting distribution data:', err);
-      return [];
-    }
-  }, [typeDistribution]);
-
-  // Calculate average confidence with error handling
-  const avgConfidence = useMemo(() => {
-    try {
-      if (stats.length === 0) return 0;
-      const validStats = stats.filter(doc => !isNaN(doc.confidence));
-      if (validStats.length === 0) return 0;
-      return validStats.reduce((sum, doc) => sum + doc.confidence, 0) / validStats.length;
-    } catch (err) {
-      console.error('Error calculating average confidence:', err);
-      return 0;
-    }
+    if (!stats) return [];
+    return stats.by_classification.map(({ classification, count }) => ({
+      classification,
+      count,
+    }));
   }, [stats]);
 
+  const totalDocuments = stats?.total_documents ?? 0;
+  const avgConfidence = stats?.average_confidence ?? 0;
+
   if (loading) {
     return (
       <div className="flex items-center justify-center p-4">
@@ -150,7 +105,7 @@ const DocumentStats = () => {
           <FileText className="h-4 w-4 text-gray-600" />
         </CardHeader>
         <CardContent>
-          <div className="text-2xl font-bold text-gray-900">{stats.length}</div>
+          <div className="text-2xl font-bold text-gray-900">{totalDocuments}</div>
           <p className="text-xs text-gray-500">Documents processed</p>
         </CardContent>
       </Card>
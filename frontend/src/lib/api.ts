@@ -10,10 +10,21 @@ export interface Document {
   s3_url: string;
 }
 
-export interface DocumentStats {
+export interface ClassificationStats {
   classification: string;
-  confidence: number;
-  upload_timestamp: string;
+  count: number;
+  average_confidence: number;
+}
+
+export interface DocumentStats {
+  granularity: 'hour' | 'day' | 'week' | 'month';
+  start: string | null;
+  end: string | null;
+  total_documents: number;
+  average_confidence: number;
+  by_classification: ClassificationStats[];
+  confidence_histogram: { lower: number; upper: number; count: number }[];
+  timeline: { bucket: string; count: number; by_classification: Record<string, number> }[];
 }
 
 export const getCategories = async (): Promise<string[]> => {
@@ -64,11 +75,28 @@ export async function getDownloadUrl(documentId: number): Promise<string> {
   return data.download_url;
 }
 
-export async function getDocumentStats(): Promise<DocumentStats[]> {
+export interface DownloadUrl {
+  download_url: string;
+  expires_at: string;
+}
+
+export async function getDownloadUrls(documentIds: number[]): Promise<Record<number, DownloadUrl>> {
+  const params = new URLSearchParams();
+  documentIds.forEach(id => params.append('ids', String(id)));
+  const response = await fetch(`${API_BASE_URL}/documents/download-urls?${params}`);
+
+  if (!response.ok) {
+    throw new Error('Failed to get download URLs');
+  }
+
+  const data = await response.json();
+  return data.download_urls;
+}
+
+export async function getDocumentStats(): Promise<DocumentStats> {
   const response = await fetch(`${API_BASE_URL}/documents/stats`);
   if (!response.ok) {
     throw new Error('Failed to fetch document statistics');
   }
-  const data = await response.json();
-  return data.data;
+  return response.json();
 } 
\ No newline at end of file